@@ -48,9 +48,25 @@ def create_app():
     # Initialize services on startup
     with app.app_context():
         try:
-            from app.services.startup_service import initialize_virtual_serial_devices
+            from app.services.startup_service import start_hardware
             from app.services.photo_service import PhotoService
-            initialize_virtual_serial_devices()
+            from app.services.scale_monitor import ScaleMonitor
+            from app.services.tare_service import TareService
+            from app.services.scale_detection_service import ScaleDetectionService
+            from app.services.print_spooler import PrintSpooler
+            from app.services.printer_monitor import PrinterMonitor
+            from app.services.camera_hub import CameraHub
+            from app.services.camera_monitor import CameraMonitor
+            ScaleMonitor.configure(app.config)
+            TareService.configure(app.config)
+            ScaleDetectionService.configure(app.config)
+            PrintSpooler.configure(app.config)
+            PrinterMonitor.configure(app.config)
+            CameraHub.configure(app.config)
+            CameraMonitor.configure(app.config)
+            PrintSpooler.start(app)
+            # Returns immediately; one process brings up the scales in the background
+            start_hardware(app)
             PhotoService.init_upload_directory()
         except Exception as e:
             app.logger.error(f"Failed to initialize services: {e}")
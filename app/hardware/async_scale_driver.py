@@ -0,0 +1,291 @@
+import asyncio
+import threading
+import time
+import logging
+from typing import Optional, Callable
+from app.hardware.scale_protocols import get_protocol, get_terminator
+
+logger = logging.getLogger(__name__)
+
+class AsyncScaleConnection:
+    """One USR-TCP232-410S scale served by an AsyncScaleHub event loop"""
+
+    # Bytes taken per read; enough to drain several seconds of a continuously streaming indicator
+    READ_SIZE = 65536
+
+    # Longest run of input without a terminator before the framing is considered wrong
+    MAX_FRAME = 4096
+
+    def __init__(self, hub: 'AsyncScaleHub', ip: str, port: int, callback: Optional[Callable] = None,
+                 protocol: str = None, framing: str = None, group: 'AsyncScaleGroup' = None):
+        self.hub = hub
+        self.group = group
+        self.ip = ip
+        self.port = port
+        self.callback = callback
+        self.protocol = get_protocol(protocol)
+        self.terminator = get_terminator(self.protocol, framing)
+        self.connected = False
+        self.running = True
+        self.last_update = None
+        self.sample_tick = 0
+        self._writer = None
+        self._task = None
+
+    async def run(self):
+        """Connect, poll and reconnect until disconnected"""
+        failures = 0
+        while self.running:
+            try:
+                reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.ip, self.port), timeout=self.hub.connect_timeout
+                )
+                self.connected = True
+                failures = 0
+                logger.info(f"Connected to scale at {self.ip}:{self.port}")
+                await self._poll(reader)
+            except asyncio.CancelledError:
+                break
+            except (asyncio.TimeoutError, asyncio.LimitOverrunError, ConnectionError, OSError, ValueError) as e:
+                logger.error("Scale connection error: %s", str(e)[:100].replace('\n', ' ').replace('\r', ' '))
+            finally:
+                self._close()
+
+            if self.running:
+                # First retry is immediate; repeated failures back off up to the hub maximum
+                delay = min(self.hub.reconnect_delay * failures, self.hub.max_reconnect_delay)
+                failures += 1
+                if delay:
+                    await asyncio.sleep(delay)
+
+    async def _poll(self, reader: asyncio.StreamReader):
+        buffer = bytearray()
+        loop = asyncio.get_running_loop()
+        # A W whose reply has not arrived yet; another is only sent once it answers or times out
+        pending_since = None
+        while self.running:
+            if self.group:
+                # Grouped scales are asked for weight together on the group's clock
+                self.sample_tick = await self.group.wait_tick()
+            if pending_since is None or loop.time() - pending_since >= self.hub.read_timeout:
+                self._writer.write(b'W\r\n')
+                await self._writer.drain()
+                pending_since = loop.time()
+
+            # Take everything buffered so far; an indicator that streams on its own would otherwise
+            # queue frames faster than one per poll and the reading would fall further and further behind
+            weight_data = None
+            deadline = pending_since + self.hub.read_timeout
+            while weight_data is None and loop.time() < deadline:
+                try:
+                    chunk = await asyncio.wait_for(reader.read(self.READ_SIZE), timeout=deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    raise ConnectionResetError("Scale closed the connection")
+                buffer += chunk
+                weight_data = self._newest_frame(buffer)
+
+            if weight_data:
+                pending_since = None
+                self.last_update = time.time()
+                if self.callback:
+                    self.callback(weight_data)
+
+            if not self.group:
+                await asyncio.sleep(self.hub.poll_interval)
+
+    def _newest_frame(self, buffer: bytearray) -> Optional[dict]:
+        """Consume every complete frame in buffer and return the newest one that parses"""
+        end = buffer.rfind(self.terminator)
+        if end < 0:
+            if len(buffer) > self.MAX_FRAME:
+                raise ValueError(f"No frame terminator in {len(buffer)} bytes; check the scale's framing")
+            return None
+        frames = bytes(buffer[:end]).split(self.terminator)
+        del buffer[:end + len(self.terminator)]
+        for frame in reversed(frames):
+            # Frames keep their leading spaces and STX; fixed-width formats depend on them
+            weight_data = self.protocol.parse(frame.decode('ascii', errors='ignore'))
+            if weight_data:
+                return weight_data
+        return None
+
+    def _close(self):
+        self.connected = False
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    def send(self, command: bytes) -> bool:
+        """Queue a raw command for the scale from any thread"""
+        if not self.connected:
+            return False
+        self.hub.loop.call_soon_threadsafe(self._write, command)
+        return True
+
+    def _write(self, command: bytes):
+        if self._writer:
+            self._writer.write(command)
+
+    def tare(self) -> bool:
+        """Send tare command to zero the scale"""
+        return self.send(b'T\r\n')
+
+    def disconnect(self):
+        """Stop polling and close the connection"""
+        self.running = False
+        if self._task:
+            self.hub.loop.call_soon_threadsafe(self._task.cancel)
+
+class AsyncScaleGroup:
+    """Several scales on one hub sampled on a shared clock and reported together.
+
+    Every poll interval the group releases all member connections in the same
+    loop iteration, so each sends W within microseconds of the others. Once
+    every member has answered for a tick, and the answers arrived within
+    `window` seconds of each other, the callback receives the member readings
+    in member order. A tick with a missing or late member is dropped rather
+    than summed from mismatched samples.
+    """
+
+    def __init__(self, hub: 'AsyncScaleHub', members: list, callback: Optional[Callable] = None,
+                 window: float = 0.05):
+        self.hub = hub
+        self.callback = callback
+        self.window = window
+        self.running = True
+        self.tick = 0
+        self.synced = 0
+        self.skipped = 0
+        self.connections = [
+            AsyncScaleConnection(hub, ip, port, lambda data, index=index: self._member_reading(index, data),
+                                 protocol, framing, group=self)
+            for index, (ip, port, protocol, framing) in enumerate(members)
+        ]
+        self._samples = {}
+        self._tick_event = None
+        self._task = None
+
+    @property
+    def connected(self) -> bool:
+        return all(connection.connected for connection in self.connections)
+
+    async def run(self):
+        """Start the members and drive the shared sampling clock until disconnected"""
+        self._tick_event = asyncio.Event()
+        for connection in self.connections:
+            connection._task = asyncio.get_running_loop().create_task(connection.run())
+        try:
+            while self.running:
+                await asyncio.sleep(self.hub.poll_interval)
+                self.tick += 1
+                event, self._tick_event = self._tick_event, asyncio.Event()
+                event.set()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for connection in self.connections:
+                connection.running = False
+                connection._task.cancel()
+
+    async def wait_tick(self) -> int:
+        """Wait for the next sampling tick and return its number"""
+        await self._tick_event.wait()
+        return self.tick
+
+    def _member_reading(self, index: int, weight_data: dict):
+        tick = self.connections[index].sample_tick
+        samples = self._samples.setdefault(tick, {})
+        samples[index] = (time.monotonic(), weight_data)
+        if len(samples) < len(self.connections):
+            # A member that stopped answering leaves partial ticks behind; keep only recent ones
+            if len(self._samples) > 16:
+                del self._samples[min(self._samples)]
+            return
+
+        # Complete; earlier ticks can no longer complete in order, so drop them
+        for older in [key for key in self._samples if key <= tick]:
+            del self._samples[older]
+
+        arrivals = [arrived for arrived, _data in samples.values()]
+        if max(arrivals) - min(arrivals) > self.window:
+            self.skipped += 1
+            return
+
+        self.synced += 1
+        if self.callback:
+            self.callback([samples[i][1] for i in range(len(self.connections))])
+
+    def tare(self) -> bool:
+        """Tare every platform; False unless all of them are connected"""
+        if not self.connected:
+            return False
+        return all([connection.tare() for connection in self.connections])
+
+    def disconnect(self):
+        """Stop sampling and close every member connection"""
+        self.running = False
+        for connection in self.connections:
+            connection.running = False
+        if self._task:
+            self.hub.loop.call_soon_threadsafe(self._task.cancel)
+
+class AsyncScaleHub:
+    """Single asyncio event loop that talks TCP directly to many USR-TCP232 scales.
+
+    Replaces one socat process plus one pyserial reader per scale; the loop
+    runs in a daemon thread and each scale is a lightweight task on it.
+    """
+
+    def __init__(self, poll_interval: float = 0.1, connect_timeout: float = 5.0, read_timeout: float = 1.0,
+                 reconnect_delay: float = 0.5, max_reconnect_delay: float = 10.0):
+        self.poll_interval = poll_interval
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.loop = None
+        self.thread = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop thread if it is not running yet"""
+        with self._lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self._started.clear()
+            self.thread = threading.Thread(target=self._run_loop, daemon=True, name="scale-hub")
+            self.thread.start()
+        self._started.wait()
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        self.loop.run_forever()
+
+    def add_scale(self, ip: str, port: int, callback: Optional[Callable] = None,
+                  protocol: str = None, framing: str = None) -> AsyncScaleConnection:
+        """Start serving a scale on the hub loop and return its connection handle"""
+        self.start()
+        connection = AsyncScaleConnection(self, ip, port, callback, protocol, framing)
+
+        def _schedule():
+            connection._task = self.loop.create_task(connection.run())
+
+        self.loop.call_soon_threadsafe(_schedule)
+        return connection
+
+    def add_group(self, members: list, callback: Optional[Callable] = None,
+                  window: float = 0.05) -> AsyncScaleGroup:
+        """Serve several scales sampled together; members are (ip, port, protocol, framing) tuples"""
+        self.start()
+        group = AsyncScaleGroup(self, members, callback, window)
+
+        def _schedule():
+            group._task = self.loop.create_task(group.run())
+
+        self.loop.call_soon_threadsafe(_schedule)
+        return group
@@ -0,0 +1,110 @@
+from typing import Callable
+import numpy as np
+
+# Printer control sequences shared by the receipt and label layouts
+INIT = b'\x1b\x40'  # ESC @
+ALIGN_LEFT = b'\x1b\x61\x00'  # ESC a 0
+ALIGN_CENTER = b'\x1b\x61\x01'  # ESC a 1
+ALIGN_RIGHT = b'\x1b\x61\x02'  # ESC a 2
+NORMAL = b'\x1b\x21\x00'  # ESC ! 0
+BOLD = b'\x1b\x21\x08'  # ESC ! 8 - Emphasized
+DOUBLE_HEIGHT = b'\x1b\x21\x10'  # ESC ! 16
+DOUBLE_WIDTH = b'\x1b\x21\x20'  # ESC ! 32
+DOUBLE = b'\x1b\x21\x30'  # ESC ! 48 - Double height and width
+FEED_CUT = b'\x1d\x56\x41\x10'  # GS V A n - Feed and cut
+PARTIAL_CUT = b'\x1d\x56\x42\x10'  # GS V B n - Feed and partial cut, leaves labels joined
+
+# Receipt text is sent in the printers' default code page
+ENCODING = 'cp437'
+
+def encode(text: str) -> bytes:
+    return text.encode(ENCODING, errors='replace')
+
+def feed(lines: int) -> bytes:
+    """ESC d n - Print and feed n lines"""
+    return b'\x1b\x64' + bytes([lines])
+
+def code128(data: str, height: int = 80, module: int = 2) -> bytes:
+    """GS k - Code128 drawn by the printer, with the text printed below it"""
+    if data.isdigit() and len(data) % 2 == 0:
+        # Code set C packs each digit pair into one symbol
+        symbols = b'{C' + bytes(int(data[i:i + 2]) for i in range(0, len(data), 2))
+    else:
+        symbols = b'{B' + data.replace('{', '{{').encode('ascii', errors='replace')
+    if len(symbols) > 255:
+        raise ValueError('barcode data too long')
+    return (b'\x1d\x68' + bytes([height])  # GS h - Bar height in dots
+            + b'\x1d\x77' + bytes([module])  # GS w - Module width in dots
+            + b'\x1d\x48\x02'  # GS H 2 - Readable text below
+            + b'\x1d\x6b\x49' + bytes([len(symbols)]) + symbols)
+
+def qr(data: str, module: int = 6) -> bytes:
+    """GS ( k - QR code drawn by the printer"""
+    body = data.encode('utf-8')
+    size = len(body) + 3
+    if size > 0xffff:
+        raise ValueError('QR data too long')
+    return (b'\x1d\x28\x6b\x04\x00\x31\x41\x32\x00'  # Model 2
+            + b'\x1d\x28\x6b\x03\x00\x31\x43' + bytes([module])  # Module size in dots
+            + b'\x1d\x28\x6b\x03\x00\x31\x45\x31'  # Error correction level M
+            + b'\x1d\x28\x6b' + bytes([size & 0xff, size >> 8]) + b'\x31\x50\x30' + body  # Store data
+            + b'\x1d\x28\x6b\x03\x00\x31\x51\x30')  # Print stored symbol
+
+def raster(dots: np.ndarray) -> bytes:
+    """GS v 0 raster bit image from a 2D array where True prints a dot"""
+    height, width = dots.shape
+    row_bytes = (width + 7) // 8
+    # packbits pads each row to whole bytes, MSB is the leftmost dot
+    data = np.packbits(dots.astype(np.uint8), axis=1).tobytes()
+    return b'\x1d\x76\x30\x00' + bytes([row_bytes & 0xff, row_bytes >> 8, height & 0xff, height >> 8]) + data
+
+class Slot:
+    """Variable part of a layout; format builds its text, or raw command bytes, from the values being printed"""
+
+    __slots__ = ('format',)
+
+    def __init__(self, format: Callable[[dict], str]):
+        self.format = format
+
+class CompiledLayout:
+    """A printout compiled once into static byte segments with slots between them.
+
+    Static text and control codes are encoded at compile time and adjacent
+    pieces are merged, so filling a layout only formats and encodes the
+    slots. Pieces from one or more layouts are copied into a single
+    preallocated buffer by assemble() for one write to the printer.
+    """
+
+    def __init__(self, parts: list):
+        merged = []
+        for part in parts:
+            if isinstance(part, str):
+                part = encode(part)
+            if isinstance(part, bytes) and merged and isinstance(merged[-1], bytes):
+                merged[-1] += part
+            else:
+                merged.append(part)
+        self.parts = tuple(merged)
+        self.static_size = sum(len(part) for part in merged if isinstance(part, bytes))
+
+    def pieces(self, values: dict) -> list:
+        """Static segments and filled slots in print order"""
+        pieces = []
+        for part in self.parts:
+            if part.__class__ is not bytes:
+                part = part.format(values)
+                if part.__class__ is str:
+                    part = encode(part)
+            pieces.append(part)
+        return pieces
+
+def assemble(pieces: list) -> bytearray:
+    """Copy pieces into one buffer allocated at its final size"""
+    buffer = bytearray(sum(map(len, pieces)))
+    view = memoryview(buffer)
+    position = 0
+    for piece in pieces:
+        end = position + len(piece)
+        view[position:end] = piece
+        position = end
+    return buffer
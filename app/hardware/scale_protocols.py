@@ -0,0 +1,171 @@
+import re
+import logging
+from typing import Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Registry of output formats, keyed by the name stored in Device.scale_protocol
+PROTOCOLS = {}
+
+DEFAULT_PROTOCOL = 'toledo'
+
+# Frame terminators, keyed by the name stored in Device.scale_framing
+FRAMINGS = {
+    'crlf': b'\r\n',
+    'lf': b'\n',
+    'cr': b'\r',
+    'etx': b'\x03'
+}
+
+_UNITS = {
+    'lb': 'lb', 'lbs': 'lb', 'l': 'lb',
+    'kg': 'kg', 'k': 'kg',
+    'g': 'g',
+    't': 't', 'tn': 't',
+    'oz': 'oz', 'o': 'oz'
+}
+# Indicators send units in either case; map both up front so parsing a frame never lowercases
+_UNITS.update({unit.upper(): normalized for unit, normalized in list(_UNITS.items())})
+_UNITS[''] = 'lb'
+
+class ScaleProtocol:
+    """A precompiled, format-specific parser for one indicator output format"""
+
+    def __init__(self, name: str, label: str, parse: Callable, terminator: bytes, example: str):
+        self.name = name
+        self.label = label
+        self.parse = parse
+        self.terminator = terminator
+        self.example = example
+
+def register(name: str, label: str, terminator: bytes = b'\n', example: str = ''):
+    """Decorator that adds a parser function to the protocol registry"""
+    def decorator(func):
+        PROTOCOLS[name] = ScaleProtocol(name, label, func, terminator, example)
+        return func
+    return decorator
+
+def get_protocol(name: Optional[str]) -> ScaleProtocol:
+    """Look up a protocol by name, falling back to the default format"""
+    protocol = PROTOCOLS.get(name or DEFAULT_PROTOCOL)
+    if protocol is None:
+        logger.warning(f"Unknown scale protocol '{name}', using {DEFAULT_PROTOCOL}")
+        protocol = PROTOCOLS[DEFAULT_PROTOCOL]
+    return protocol
+
+def get_terminator(protocol: ScaleProtocol, framing: Optional[str] = None) -> bytes:
+    """Frame terminator for a device: its detected framing, else the protocol default"""
+    return FRAMINGS.get(framing, protocol.terminator)
+
+def _reading(weight: float, unit: str, net: bool = False, tare: float = 0.0,
+             motion: bool = False, overload: bool = False) -> dict:
+    """Build the common reading dict every parser returns; runs once per frame, so keep it lean"""
+    gross = weight + tare if net else weight
+    return {
+        'weight': weight,
+        'gross': gross,
+        'net': weight if net else gross - tare,
+        'tare': tare,
+        'unit': _UNITS.get(unit) or _UNITS.get(unit.lower(), unit.lower()),
+        'stable': not (motion or overload),
+        'motion': motion,
+        'overload': overload
+    }
+
+# "ST,GS,+00012.34,lb" - ST/US stable or unstable, OL overload, GS gross / NT net / TR tare
+_TOLEDO = re.compile(r'(ST|US|OL),(GS|NT|TR),\s*([+-]?)\s*(\d+(?:\.\d+)?)\s*,?\s*([A-Za-z]*)')
+
+@register('toledo', 'Toledo ST/GS comma format', example='ST,GS,+00012.34,lb')
+def parse_toledo(line: str) -> Optional[dict]:
+    match = _TOLEDO.search(line)
+    if not match:
+        return None
+    status, mode, sign, digits, unit = match.groups()
+    weight = float(digits)
+    if sign == '-':
+        weight = -weight
+    reading = _reading(weight, unit, net=mode == 'NT', motion=status == 'US', overload=status == 'OL')
+    if mode == 'TR':
+        reading['tare'] = weight
+    return reading
+
+# Mettler Toledo continuous output: STX, status words A/B/C, 6 digit weight, 6 digit tare, CR
+_TOLEDO_CONTINUOUS = re.compile(r'\x02([\x20-\x7f])([\x20-\x7f])([\x20-\x7f])([ \d]{6})([ \d]{6})')
+
+# Status word A bits 0-2 select the implied decimal point / dummy zeros
+_TOLEDO_SCALE = {0: 100.0, 1: 10.0, 2: 1.0, 3: 0.1, 4: 0.01, 5: 0.001, 6: 0.0001, 7: 0.00001}
+
+@register('toledo_continuous', 'Mettler Toledo continuous', terminator=b'\r',
+          example='\x02" 0  1234   100')
+def parse_toledo_continuous(line: str) -> Optional[dict]:
+    match = _TOLEDO_CONTINUOUS.search(line)
+    if not match:
+        return None
+    swa, swb, _swc, weight_digits, tare_digits = match.groups()
+    status_a, status_b = ord(swa), ord(swb)
+    factor = _TOLEDO_SCALE[status_a & 0x07]
+    weight = int(weight_digits.replace(' ', '0')) * factor
+    tare = int(tare_digits.replace(' ', '0')) * factor
+    if status_b & 0x02:
+        weight = -weight
+    return _reading(weight, 'kg' if status_b & 0x10 else 'lb', net=bool(status_b & 0x01), tare=tare,
+                    motion=bool(status_b & 0x08), overload=bool(status_b & 0x04))
+
+# Cardinal 7xx/2xx: polarity, weight, unit, G/N, optional status (M motion, O overload, Z center of zero)
+_CARDINAL = re.compile(r'([+-]?)\s*(\d+(?:\.\d+)?)\s*(lb|kg|g|t|oz)\s+([GN])\s*([MOZ]*)', re.IGNORECASE)
+
+@register('cardinal', 'Cardinal', example='   1234.5 lb  G  M')
+def parse_cardinal(line: str) -> Optional[dict]:
+    match = _CARDINAL.search(line)
+    if not match:
+        return None
+    sign, digits, unit, mode, status = match.groups()
+    weight = float(digits)
+    if sign == '-':
+        weight = -weight
+    status = status.upper()
+    return _reading(weight, unit, net=mode.upper() == 'N', motion='M' in status, overload='O' in status)
+
+# Fairbanks: polarity, weight, unit, GR/NT, optional MO motion or OR overrange
+_FAIRBANKS = re.compile(r'([+-]?)\s*(\d+(?:\.\d+)?)\s*(LB|KG|G|T)\s*(GR|NT)\s*(MO|OR)?', re.IGNORECASE)
+
+@register('fairbanks', 'Fairbanks', example='  -12345 LB GR MO')
+def parse_fairbanks(line: str) -> Optional[dict]:
+    match = _FAIRBANKS.search(line)
+    if not match:
+        return None
+    sign, digits, unit, mode, status = match.groups()
+    weight = float(digits)
+    if sign == '-':
+        weight = -weight
+    status = (status or '').upper()
+    return _reading(weight, unit, net=mode.upper() == 'NT', motion=status == 'MO', overload=status == 'OR')
+
+# Rice Lake streaming: STX, polarity, 7 char weight, unit L/K/T/G/O, G/N, status (space ok, M motion, O over, I invalid)
+_RICE_LAKE = re.compile(r'\x02?([ +-])([ \d.]{7})([LKTGO])([GN])([ MOIZ])')
+
+@register('rice_lake', 'Rice Lake', terminator=b'\r', example='\x02   12345LG ')
+def parse_rice_lake(line: str) -> Optional[dict]:
+    match = _RICE_LAKE.search(line)
+    if not match:
+        return None
+    sign, digits, unit, mode, status = match.groups()
+    if status == 'I' or not digits.strip():
+        return None
+    weight = float(digits.replace(' ', ''))
+    if sign == '-':
+        weight = -weight
+    return _reading(weight, unit, net=mode == 'N', motion=status == 'M', overload=status == 'O')
+
+# Plain number with optional unit, e.g. "123.45 lb" or a "W 123.45" command echo
+_NUMERIC = re.compile(r'([+-]?\d+(?:\.\d+)?)\s*(lbs|lb|kg|g|oz)?', re.IGNORECASE)
+
+@register('numeric', 'Plain numeric', example='W 123.45 lb')
+def parse_numeric(line: str) -> Optional[dict]:
+    match = _NUMERIC.search(line)
+    if not match:
+        return None
+    # Plain numeric output has no motion flag; stability is left to the numeric detector
+    reading = _reading(float(match.group(1)), match.group(2) or 'lb')
+    reading['stable'] = False
+    return reading
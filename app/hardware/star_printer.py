@@ -1,18 +1,58 @@
+import select
 import socket
+import threading
+import time
 import logging
 from datetime import datetime
 from typing import Optional
+from app.hardware import escpos
+from app.hardware.escpos import CompiledLayout, Slot
 
 logger = logging.getLogger(__name__)
 
+# Yard tag layout, compiled once; optional lines print only when the label has them
+_LABEL = CompiledLayout([
+    escpos.ALIGN_CENTER,
+    escpos.DOUBLE_WIDTH,
+    Slot(lambda label: f"{label.get('metal_type', 'Unknown')}\n"),
+    escpos.NORMAL,
+    Slot(lambda label: f"Weight: {label.get('weight', 0):.2f} lbs\n"),
+    Slot(lambda label: f"Price: ${label['price']:.2f}\n" if label.get('price') is not None else ''),
+    Slot(lambda label: f"Customer: {label['customer']}\n" if label.get('customer') else ''),
+    Slot(lambda label: f"Date: {label['date']}\n"),
+    Slot(lambda label: f"ID: {label.get('id', 'N/A')}\n"),
+    # Bin ids are free text, so they go in a QR code rather than Code128
+    Slot(lambda label: escpos.qr(str(label['id'])) if label.get('id') else b'')
+])
+_LABEL_SEPARATOR = escpos.feed(2) + escpos.PARTIAL_CUT
+_LABEL_END = escpos.feed(2) + escpos.FEED_CUT
+
+# DLE EOT 1, 2 and 4: printer, offline cause and paper roll status, one byte each
+STATUS_QUERY = b'\x10\x04\x01\x10\x04\x02\x10\x04\x04'
+
+# ESC v: paper sensor status, for printers without real-time status
+PAPER_QUERY = b'\x1b\x76'
+
+# Seconds to wait for a status reply
+STATUS_TIMEOUT = 1.0
+
+def _valid_status_byte(value: int) -> bool:
+    # Real-time status bytes always have bits 1 and 4 set and bits 0 and 7 clear
+    return value & 0x93 == 0x12
+
 class StarMicronicsPrinter:
     """Driver for Star Micronics thermal label printers"""
     
+    # Drawer switch polarity varies between drawers; most report open with pin 3 low
+    DRAWER_OPEN_HIGH = False
+    
     def __init__(self, ip: str, port: int = 9100):
         self.ip = ip
         self.port = port
         self.socket = None
         self.connected = False
+        # Shared by the print worker and the status monitor when they use the same connection
+        self.lock = threading.RLock()
     
     def connect(self) -> bool:
         """Connect to the printer via TCP"""
@@ -20,6 +60,9 @@ class StarMicronicsPrinter:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(10)
             self.socket.connect((self.ip, self.port))
+            # Kept open between jobs; keepalive notices a printer that silently went away
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.connected = True
             logger.info(f"Connected to Star printer at {self.ip}:{self.port}")
             return True
@@ -32,6 +75,10 @@ class StarMicronicsPrinter:
     
     def disconnect(self):
         """Disconnect from the printer"""
+        with self.lock:
+            self._close()
+    
+    def _close(self):
         if self.socket:
             try:
                 self.socket.shutdown(socket.SHUT_RDWR)
@@ -39,148 +86,161 @@ class StarMicronicsPrinter:
                 pass
             finally:
                 self.socket.close()
+                self.socket = None
         self.connected = False
     
-    def print_receipt(self, transaction_data: dict) -> bool:
-        """Print a scrap receipt"""
-        if not self.connected and not self.connect():
-            return False
-        
+    def _is_stale(self) -> bool:
+        """True if the printer closed the kept-alive connection since the last job"""
         try:
-            # ESC/POS commands for Star printers
-            commands = []
-            
-            # Initialize printer
-            commands.append(b'\x1b\x40')  # ESC @
-            
-            # Set font size and alignment
-            commands.append(b'\x1b\x21\x30')  # Double height/width
-            commands.append(b'\x1b\x61\x01')  # Center alignment
-            
-            # Header
-            commands.append(b'SCRAP RECEIPT\n')
-            commands.append(b'\x1b\x21\x00')  # Normal size
-            commands.append(b'=' * 32 + b'\n')
-            
-            # Transaction details
-            commands.append(b'\x1b\x61\x00')  # Left alignment
-            commands.append(f"Date: {datetime.now().strftime('%m/%d/%Y %H:%M')}\n".encode())
-            commands.append(f"Transaction: {transaction_data.get('id', 'N/A')}\n".encode())
-            commands.append(f"Customer: {transaction_data.get('customer_name', 'N/A')}\n".encode())
-            commands.append(b'-' * 32 + b'\n')
-            
-            # Items
-            for item in transaction_data.get('items', []):
-                metal_type = item.get('metal_type', 'Unknown')
-                weight = item.get('weight', 0)
-                price = item.get('price_per_lb', 0)
-                total = item.get('total', 0)
-                
-                commands.append(f"{metal_type}\n".encode())
-                commands.append(f"  {weight:.2f} lbs @ ${price:.2f}/lb\n".encode())
-                commands.append(f"  Total: ${total:.2f}\n".encode())
-            
-            commands.append(b'-' * 32 + b'\n')
-            
-            # Total
-            total_weight = transaction_data.get('total_weight', 0)
-            total_amount = transaction_data.get('total_amount', 0)
-            
-            commands.append(f"Total Weight: {total_weight:.2f} lbs\n".encode())
-            commands.append(b'\x1b\x21\x10')  # Double width
-            commands.append(f"TOTAL: ${total_amount:.2f}\n".encode())
-            commands.append(b'\x1b\x21\x00')  # Normal size
-            
-            # Footer
-            commands.append(b'\n')
-            commands.append(b'\x1b\x61\x01')  # Center alignment
-            commands.append(b'Thank you for your business!\n')
-            commands.append(b'NJ License: 12345\n')
-            
-            # Cut paper
-            commands.append(b'\x1b\x64\x03')  # Feed 3 lines
-            commands.append(b'\x1d\x56\x41\x10')  # Partial cut
-            
-            # Send all commands
-            for cmd in commands:
-                self.socket.send(cmd)
-            
-            logger.info("Receipt printed successfully")
+            readable, _, _ = select.select([self.socket], [], [], 0)
+            # Printers never send unsolicited data on 9100, so readable means EOF or reset
+            return bool(readable) and not self.socket.recv(64, socket.MSG_PEEK)
+        except (OSError, ValueError):
             return True
+    
+    def _ensure_connected(self) -> bool:
+        if self.connected and self._is_stale():
+            self._close()
+        return self.connected or self.connect()
+    
+    def send(self, data: bytes) -> bool:
+        """Write a complete job in one sendall over the kept-alive connection"""
+        with self.lock:
+            if not self._ensure_connected():
+                return False
             
-        except Exception as e:
-            logger.error("Error printing receipt: operation failed")
-            return False
+            try:
+                self.socket.sendall(data)
+                return True
+            except (OSError, socket.timeout) as e:
+                logger.error(f"Printer write to {self.ip}:{self.port} failed: {str(e)[:100]}")
+                self._close()
+                return False
+    
+    def print_receipt(self, transaction_data: dict) -> bool:
+        """Print a scrap receipt using the current receipt template"""
+        from app.services.receipt_renderer import ReceiptRenderer
+        return self.send(ReceiptRenderer.render(transaction_data))
     
     def print_label(self, label_data: dict) -> bool:
         """Print a metal identification label"""
-        if not self.connected and not self.connect():
-            return False
-        
-        try:
-            commands = []
-            
-            # Initialize
-            commands.append(b'\x1b\x40')
-            
-            # Label format
-            commands.append(b'\x1b\x21\x20')  # Double height
-            commands.append(b'\x1b\x61\x01')  # Center
-            
-            metal_type = label_data.get('metal_type', 'Unknown')
-            weight = label_data.get('weight', 0)
-            date = datetime.now().strftime('%m/%d/%Y')
-            
-            commands.append(f"{metal_type}\n".encode())
-            commands.append(b'\x1b\x21\x00')  # Normal size
-            commands.append(f"Weight: {weight:.2f} lbs\n".encode())
-            commands.append(f"Date: {date}\n".encode())
-            commands.append(f"ID: {label_data.get('id', 'N/A')}\n".encode())
-            
-            # Cut
-            commands.append(b'\x1b\x64\x02')
-            commands.append(b'\x1d\x56\x41\x10')
-            
-            for cmd in commands:
-                self.socket.send(cmd)
-            
-            return True
-            
-        except Exception as e:
-            logger.error("Error printing label: operation failed")
-            return False
+        return self.send(self.label_bytes(label_data))
+    
+    def print_labels(self, labels: list) -> bool:
+        """Print a batch of labels as one continuous job"""
+        return self.send(self.labels_bytes(labels))
+    
+    @staticmethod
+    def label_bytes(label_data: dict) -> bytes:
+        """ESC/POS byte stream for a metal identification label"""
+        return bytes(StarMicronicsPrinter.labels_bytes([label_data]))
+    
+    @staticmethod
+    def labels_bytes(labels: list) -> bytearray:
+        """One command stream for a batch of labels: partial cut between labels, full cut after the last"""
+        today = datetime.now().strftime('%m/%d/%Y')
+        pieces = [escpos.INIT]
+        for index, label in enumerate(labels):
+            if index:
+                pieces.append(_LABEL_SEPARATOR)
+            pieces += _LABEL.pieces({'date': today, **label})
+        pieces.append(_LABEL_END)
+        return escpos.assemble(pieces)
     
     def open_cash_drawer(self) -> bool:
         """Open cash drawer connected to printer"""
-        if not self.connected and not self.connect():
-            return False
-        
-        try:
-            # ESC/POS command to open cash drawer
-            # ESC p m t1 t2 - Generate pulse to open drawer
-            # m=0 (connector pin 2), t1=50 (pulse on time), t2=250 (pulse off time)
-            self.socket.send(b'\x1b\x70\x00\x32\xfa')
+        # ESC/POS command to open cash drawer
+        # ESC p m t1 t2 - Generate pulse to open drawer
+        # m=0 (connector pin 2), t1=50 (pulse on time), t2=250 (pulse off time)
+        if self.send(b'\x1b\x70\x00\x32\xfa'):
             logger.info("Cash drawer opened")
             return True
-        except Exception as e:
-            logger.error("Error opening cash drawer: operation failed")
-            return False
+        logger.error("Error opening cash drawer: operation failed")
+        return False
+    
+    def _read_reply(self, size: int) -> bytes:
+        """Read up to size status bytes, giving up after STATUS_TIMEOUT"""
+        reply = b''
+        deadline = time.monotonic() + STATUS_TIMEOUT
+        while len(reply) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.socket], [], [], remaining)[0]:
+                break
+            chunk = self.socket.recv(size - len(reply))
+            if not chunk:
+                raise ConnectionResetError('printer closed the connection')
+            reply += chunk
+        return reply
+    
+    def query_status(self) -> Optional[dict]:
+        """Real-time status via DLE EOT, falling back to ESC v; None if the printer is unreachable"""
+        with self.lock:
+            if not self._ensure_connected():
+                return None
+            
+            try:
+                # Discard a late reply to an earlier query so it is not read as this one's
+                while select.select([self.socket], [], [], 0)[0]:
+                    if not self.socket.recv(64):
+                        raise ConnectionResetError('printer closed the connection')
+                self.socket.sendall(STATUS_QUERY)
+                reply = self._read_reply(3)
+                if len(reply) == 3 and all(_valid_status_byte(value) for value in reply):
+                    return self._decode_status(*reply)
+                
+                self.socket.sendall(PAPER_QUERY)
+                reply = self._read_reply(1)
+                if reply:
+                    return self._decode_paper(reply[0])
+                # Reachable but silent, e.g. status replies disabled in the printer settings
+                return {'online': True, 'known': False, 'paper': 'unknown', 'cover_open': False,
+                        'drawer_open': False, 'error': False}
+            except (OSError, socket.timeout) as e:
+                logger.error(f"Printer status query to {self.ip}:{self.port} failed: {str(e)[:100]}")
+                self._close()
+                return None
+    
+    def _decode_status(self, printer: int, offline: int, paper: int) -> dict:
+        if paper & 0x60:
+            paper_state = 'out'
+        elif paper & 0x0c:
+            paper_state = 'low'
+        else:
+            paper_state = 'ok'
+        return {
+            'online': not printer & 0x08,
+            'known': True,
+            'paper': 'out' if offline & 0x20 else paper_state,
+            'cover_open': bool(offline & 0x04),
+            'drawer_open': bool(printer & 0x04) == self.DRAWER_OPEN_HIGH,
+            'error': bool(offline & 0x40)
+        }
+    
+    @staticmethod
+    def _decode_paper(paper: int) -> dict:
+        if paper & 0x0c:
+            paper_state = 'out'
+        elif paper & 0x03:
+            paper_state = 'low'
+        else:
+            paper_state = 'ok'
+        return {'online': paper_state != 'out', 'known': True, 'paper': paper_state, 'cover_open': False,
+                'drawer_open': False, 'error': False}
     
     def get_status(self) -> dict:
         """Get printer status"""
-        if not self.connected:
+        status = self.query_status()
+        if status is None:
             return {'connected': False, 'status': 'disconnected'}
         
-        try:
-            # Send status request
-            self.socket.send(b'\x1b\x76')
-            response = self.socket.recv(1024)
-            
-            return {
-                'connected': True,
-                'status': 'ready',
-                'paper': 'ok'
-            }
-        except Exception as e:
-            logger.error(f"Error getting printer status: {str(e)[:100].replace('\n', ' ').replace('\r', ' ')}")
-            return {'connected': False, 'status': 'error'}
\ No newline at end of file
+        if not status['known']:
+            state = 'unknown'
+        elif status['cover_open']:
+            state = 'cover_open'
+        elif status['paper'] == 'out':
+            state = 'paper_out'
+        elif status['error'] or not status['online']:
+            state = 'error'
+        else:
+            state = 'ready'
+        return {'connected': True, 'status': state, **status}
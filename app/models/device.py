@@ -9,7 +9,10 @@ class Device(db.Model):
     device_type = db.Column(db.String(20), nullable=False)  # scale, printer, camera
     ip_address = db.Column(db.String(15), nullable=False)
     
-    # Scale-specific fields
+    # Scale-specific fields; the defaults apply to new scales only, upgrade.sh keeps existing ones on socat/numeric
+    scale_transport = db.Column(db.String(10), default='tcp')  # tcp (native driver), socat (virtual serial fallback), combined (sum of member scales)
+    scale_protocol = db.Column(db.String(20), default='toledo')  # Output format key in app.hardware.scale_protocols
+    scale_framing = db.Column(db.String(10))  # crlf, lf, cr, etx; None uses the protocol's default terminator
     serial_port = db.Column(db.String(50))  # Virtual serial device path
     baud_rate = db.Column(db.Integer, default=9600)
     data_bits = db.Column(db.Integer, default=8)
@@ -19,6 +22,7 @@ class Device(db.Model):
     
     # Printer-specific fields
     printer_model = db.Column(db.String(50))
+    printer_pool = db.Column(db.String(50))  # Printers sharing a pool name share and fail over each other's jobs
     
     # Camera-specific fields
     camera_model = db.Column(db.String(50))
@@ -28,4 +32,29 @@ class Device(db.Model):
     
     is_active = db.Column(db.Boolean, default=True)
     last_seen = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Platforms summed by a combined scale
+    members = db.relationship('Device', secondary='combined_scale_members',
+                              primaryjoin='Device.id == CombinedScaleMember.combined_id',
+                              secondaryjoin='Device.id == CombinedScaleMember.member_id',
+                              order_by='Device.id')
+
+class CombinedScaleMember(db.Model):
+    __tablename__ = 'combined_scale_members'
+    
+    combined_id = db.Column(db.Integer, db.ForeignKey('devices.id', ondelete='CASCADE'), primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('devices.id', ondelete='CASCADE'), primary_key=True)
+
+class DeviceAssignment(db.Model):
+    """Pins a device to a user or a terminal; unassigned requests fall back to the first active device"""
+    __tablename__ = 'device_assignments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('devices.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    terminal = db.Column(db.String(45))  # Terminal IP address as seen by the server
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    device = db.relationship('Device')
+    user = db.relationship('User')
@@ -0,0 +1,19 @@
+from app import db
+from datetime import datetime
+
+class PrintJob(db.Model):
+    """Durable journal of spooled print jobs; the id doubles as the client's idempotency key"""
+    __tablename__ = 'print_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('devices.id', ondelete='CASCADE'), nullable=False)
+    printer_ip = db.Column(db.String(15), nullable=False)
+    kind = db.Column(db.String(20), default='receipt')  # receipt, reprint, label
+    payload = db.Column(db.LargeBinary)  # Raw printer bytes; cleared once the job is done
+    state = db.Column(db.String(10), default='queued', index=True)  # queued, printing, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.String(200))
+    claimed_by = db.Column(db.Integer)  # pid of the process whose spooler holds the job
+    claim_token = db.Column(db.String(32))  # Drawn by that process at start; tells it apart from a reused pid
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime)
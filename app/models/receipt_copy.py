@@ -0,0 +1,16 @@
+from app import db
+from datetime import datetime
+
+class ReceiptCopy(db.Model):
+    """Compressed ESC/POS bytes of the first receipt printed for a transaction; reprints send them unchanged"""
+    __tablename__ = 'receipt_copies'
+    
+    # Only saved transactions get an archived receipt
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), primary_key=True)
+    template_id = db.Column(db.Integer)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed printer bytes
+    size = db.Column(db.Integer, nullable=False)  # Uncompressed length
+    sha256 = db.Column(db.String(64), nullable=False)  # Of the uncompressed bytes, for audit
+    printed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reprint_count = db.Column(db.Integer, default=0)
+    last_reprinted_at = db.Column(db.DateTime)
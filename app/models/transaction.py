@@ -14,14 +14,42 @@ class Transaction(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     items = db.relationship('TransactionItem', backref='transaction', lazy=True)
+    customer = db.relationship('Customer', lazy=True)
+    
+    # Printed as a barcode on receipts; scanning it opens the ticket
+    TICKET_PREFIX = 'T'
+    
+    # Largest id the integer primary key can hold
+    MAX_ID = 2**31 - 1
+    
+    @property
+    def ticket_code(self):
+        return self.format_ticket_code(self.id)
+    
+    @classmethod
+    def format_ticket_code(cls, transaction_id):
+        return f"{cls.TICKET_PREFIX}{int(transaction_id):08d}"
+    
+    @classmethod
+    def parse_ticket_code(cls, code):
+        """Transaction id from a scanned ticket code, or None if it is not one"""
+        code = (code or '').strip().upper()
+        if code.startswith(cls.TICKET_PREFIX):
+            code = code[len(cls.TICKET_PREFIX):]
+        if not code.isdigit() or len(code) > 10:
+            return None
+        transaction_id = int(code)
+        return transaction_id if transaction_id <= cls.MAX_ID else None
 
 class TransactionItem(db.Model):
     __tablename__ = 'transaction_items'
     
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'))
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), index=True)
     material_id = db.Column(db.Integer, db.ForeignKey('materials.id'))
     weight = db.Column(db.Numeric(10, 4), nullable=False)
     price_per_pound = db.Column(db.Numeric(10, 4), nullable=False)
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    material = db.relationship('Material', lazy=True)
@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from app.models.user import User, UserGroup
-from app.models.device import Device
+from app.models.device import Device, DeviceAssignment, CombinedScaleMember
 from app import db
 import logging
 import socket
@@ -138,20 +138,68 @@ def update_user(user_id):
 
 @admin_bp.route('/devices')
 def devices():
+    from app.hardware.scale_protocols import PROTOCOLS
+    from app.services.printer_monitor import PrinterMonitor
+    from app.services.camera_monitor import CameraMonitor
     devices = Device.query.all()
     
     # Check connection status for each device
     for device in devices:
-        device.is_connected = check_device_connection(device.ip_address, device.device_type)
+        device.printer_status = PrinterMonitor.status(device.id) if device.device_type == 'printer' else None
+        device.camera_status = CameraMonitor.status(device.id) if device.device_type == 'camera' else None
+        if device.printer_status:
+            # Polled by the hardware owner; no need to open the printer's only session here
+            device.is_connected = device.printer_status['connected']
+        elif device.camera_status:
+            device.is_connected = device.camera_status['connected']
+        elif device.scale_transport == 'combined':
+            device.is_connected = bool(device.members) and all(
+                check_device_connection(member.ip_address, member.device_type) for member in device.members)
+        else:
+            device.is_connected = check_device_connection(device.ip_address, device.device_type)
+    
+    assignments = DeviceAssignment.query.order_by(DeviceAssignment.device_id).all()
+    users = User.query.order_by(User.username).all()
+    
+    return render_template('admin/devices.html', devices=devices, scale_protocols=PROTOCOLS.values(),
+                           assignments=assignments, users=users)
+
+def _combined_members(data, device_id=None):
+    """Validate the member scales chosen for a combined scale; returns (members, error)"""
+    member_ids = {int(member_id) for member_id in data.get('member_ids') or []}
+    if len(member_ids) < 2:
+        return None, 'A combined scale needs at least two member scales'
+    
+    members = Device.query.filter(Device.id.in_(member_ids), Device.device_type == 'scale').all()
+    if len(members) != len(member_ids):
+        return None, 'Unknown member scale'
+    if any(member.scale_transport == 'combined' or member.id == device_id for member in members):
+        return None, 'A combined scale cannot contain another combined scale'
     
-    return render_template('admin/devices.html', devices=devices)
+    # Each platform can only be sampled by one group at a time
+    taken = CombinedScaleMember.query.filter(CombinedScaleMember.member_id.in_(member_ids))
+    if device_id:
+        taken = taken.filter(CombinedScaleMember.combined_id != device_id)
+    if taken.first():
+        return None, 'A member scale already belongs to another combined scale'
+    return members, None
 
 @admin_bp.route('/devices/create', methods=['POST'])
 def create_device():
     data = request.get_json()
     
+    members = None
+    if data['device_type'] == 'scale' and data.get('scale_transport') == 'combined':
+        members, error = _combined_members(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+    
     # Handle serial_port for different device types
-    if data['device_type'] == 'scale':
+    if members is not None:
+        # Virtual device: no address or serial port of its own
+        serial_port = None
+        data['ip_address'] = ''
+    elif data['device_type'] == 'scale':
         # Auto-assign next available virtual serial device
         existing_scales = Device.query.filter_by(device_type='scale').all()
         used_numbers = []
@@ -176,6 +224,9 @@ def create_device():
         name=data['name'],
         device_type=data['device_type'],
         ip_address=data['ip_address'],
+        scale_transport=data.get('scale_transport', 'tcp') if data['device_type'] == 'scale' else None,
+        scale_protocol=(data.get('scale_protocol', 'toledo') if data.get('scale_protocol') != 'auto' else 'toledo')
+            if data['device_type'] == 'scale' else None,
         serial_port=serial_port,
         baud_rate=int(data.get('baud_rate', 9600)) if data['device_type'] == 'scale' else None,
         data_bits=int(data.get('data_bits', 8)) if data['device_type'] == 'scale' else None,
@@ -183,23 +234,29 @@ def create_device():
         stop_bits=int(data.get('stop_bits', 1)) if data['device_type'] == 'scale' else None,
         flow_control=data.get('flow_control', 'none') if data['device_type'] == 'scale' else None,
         printer_model=data.get('printer_model'),
+        printer_pool=(data.get('printer_pool') or '').strip() or None if data['device_type'] == 'printer' else None,
         camera_model=data.get('camera_model'),
         stream_url=data.get('stream_url'),
         camera_username=data.get('camera_username'),
         camera_password=data.get('camera_password')
     )
+    if members is not None:
+        device.members = members
     
     db.session.add(device)
     db.session.commit()
     
+    from app.services.startup_service import notify_device_change
+    notify_device_change()
+    
     # Update Apache camera proxies if this is a camera
     if data['device_type'] == 'camera':
         from app.services.apache_config_service import ApacheConfigService
         ApacheConfigService.update_camera_proxies()
         ApacheConfigService.reload_apache()
     
-    # Create virtual serial device for scales
-    if data['device_type'] == 'scale' and serial_port:
+    # Create virtual serial device for scales using the socat fallback transport
+    if data['device_type'] == 'scale' and serial_port and device.scale_transport == 'socat':
         from app.services.virtual_serial_service import VirtualSerialService
         try:
             success = VirtualSerialService.create_virtual_serial(serial_port, data['ip_address'])
@@ -212,8 +269,13 @@ def create_device():
     
     response_data = {'success': True, 'device_id': device.id}
     
+    # Sample the scale once now so the read path never has to guess its format
+    if data['device_type'] == 'scale' and data.get('scale_protocol') == 'auto' and members is None:
+        from app.services.scale_detection_service import ScaleDetectionService
+        response_data['detection'] = {'operation_id': ScaleDetectionService.request(device.id), 'status': 'pending'}
+    
     # Add virtual serial device status for scales
-    if data['device_type'] == 'scale' and serial_port:
+    if data['device_type'] == 'scale' and serial_port and device.scale_transport == 'socat':
         import os
         response_data['virtual_device_created'] = os.path.exists(serial_port)
         response_data['virtual_device_path'] = serial_port
@@ -230,6 +292,9 @@ def get_device(device_id):
             'name': device.name,
             'device_type': device.device_type,
             'ip_address': device.ip_address,
+            'scale_transport': device.scale_transport,
+            'scale_protocol': device.scale_protocol,
+            'scale_framing': device.scale_framing,
             'serial_port': device.serial_port,
             'baud_rate': device.baud_rate,
             'data_bits': device.data_bits,
@@ -237,10 +302,12 @@ def get_device(device_id):
             'stop_bits': device.stop_bits,
             'flow_control': device.flow_control,
             'printer_model': device.printer_model,
+            'printer_pool': device.printer_pool,
             'camera_model': device.camera_model,
             'stream_url': device.stream_url,
             'camera_username': device.camera_username,
-            'camera_password': '***' if device.camera_password else None
+            'camera_password': '***' if device.camera_password else None,
+            'member_ids': [member.id for member in device.members]
         }
     })
 
@@ -249,11 +316,27 @@ def update_device(device_id):
     device = Device.query.get_or_404(device_id)
     data = request.get_json()
     
+    if data['device_type'] == 'scale' and data.get('scale_transport') == 'combined':
+        members, error = _combined_members(data, device.id)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        device.members = members
+        data['ip_address'] = ''
+        data['serial_port'] = None
+    elif device.members:
+        device.members = []
+    
     device.name = data['name']
     device.ip_address = data['ip_address']
     device.serial_port = data.get('serial_port')
     
     if data['device_type'] == 'scale':
+        device.scale_transport = data.get('scale_transport', 'tcp')
+        scale_protocol = data.get('scale_protocol', 'toledo')
+        if scale_protocol != 'auto' and scale_protocol != device.scale_protocol:
+            # A manually chosen format falls back to its own default terminator
+            device.scale_protocol = scale_protocol
+            device.scale_framing = None
         device.baud_rate = int(data.get('baud_rate', 9600))
         device.data_bits = int(data.get('data_bits', 8))
         device.parity = data.get('parity', 'N')
@@ -261,6 +344,8 @@ def update_device(device_id):
         device.flow_control = data.get('flow_control', 'none')
     
     device.printer_model = data.get('printer_model')
+    if device.device_type == 'printer':
+        device.printer_pool = (data.get('printer_pool') or '').strip() or None
     device.camera_model = data.get('camera_model')
     device.stream_url = data.get('stream_url')
     device.camera_username = data.get('camera_username')
@@ -268,6 +353,20 @@ def update_device(device_id):
     
     db.session.commit()
     
+    from app.services.startup_service import notify_device_change
+    notify_device_change()
+    
+    # Drop the cached scale reader so the next read reconnects with the new settings
+    if device.device_type == 'scale':
+        from app.services.scale_monitor import ScaleMonitor
+        ScaleMonitor.stop(device.id)
+        
+        if device.scale_transport == 'socat' and device.serial_port:
+            import os
+            from app.services.virtual_serial_service import VirtualSerialService
+            if not os.path.exists(device.serial_port):
+                VirtualSerialService.create_virtual_serial(device.serial_port, device.ip_address)
+    
     # Update Apache camera proxies if this is a camera
     if device.device_type == 'camera':
         from app.services.apache_config_service import ApacheConfigService
@@ -285,11 +384,18 @@ def delete_device(device_id):
         from app.services.virtual_serial_service import VirtualSerialService
         VirtualSerialService.destroy_virtual_serial(device.serial_port)
     
+    if device.device_type == 'scale':
+        from app.services.scale_monitor import ScaleMonitor
+        ScaleMonitor.stop(device.id)
+    
     is_camera = device.device_type == 'camera'
     
     db.session.delete(device)
     db.session.commit()
     
+    from app.services.startup_service import notify_device_change
+    notify_device_change()
+    
     # Update Apache camera proxies if this was a camera
     if is_camera:
         from app.services.apache_config_service import ApacheConfigService
@@ -298,6 +404,120 @@ def delete_device(device_id):
     
     return jsonify({'success': True})
 
+@admin_bp.route('/devices/assignments/create', methods=['POST'])
+def create_device_assignment():
+    data = request.get_json()
+    device = Device.query.get_or_404(int(data['device_id']))
+    user_id = int(data['user_id']) if data.get('user_id') else None
+    terminal = (data.get('terminal') or '').strip() or None
+    
+    if not user_id and not terminal:
+        return jsonify({'success': False, 'error': 'Choose a user or enter a terminal IP'}), 400
+    
+    # One device of each type per user and per terminal; a new pin replaces the old one
+    replaced = DeviceAssignment.query.join(Device).filter(Device.device_type == device.device_type)
+    if user_id:
+        for assignment in replaced.filter(DeviceAssignment.user_id == user_id).all():
+            db.session.delete(assignment)
+    if terminal:
+        for assignment in replaced.filter(DeviceAssignment.terminal == terminal).all():
+            db.session.delete(assignment)
+    
+    assignment = DeviceAssignment(device_id=device.id, user_id=user_id, terminal=terminal)
+    db.session.add(assignment)
+    db.session.commit()
+    
+    from app.services.startup_service import notify_device_change
+    notify_device_change()
+    
+    return jsonify({'success': True, 'assignment_id': assignment.id})
+
+@admin_bp.route('/devices/assignments/delete/<int:assignment_id>', methods=['POST'])
+def delete_device_assignment(assignment_id):
+    assignment = DeviceAssignment.query.get_or_404(assignment_id)
+    db.session.delete(assignment)
+    db.session.commit()
+    
+    from app.services.startup_service import notify_device_change
+    notify_device_change()
+    
+    return jsonify({'success': True})
+
+@admin_bp.route('/devices/detect_protocol/<int:device_id>', methods=['POST'])
+def detect_scale_protocol(device_id):
+    """Start sampling a scale's output; poll the returned operation id for the detected format"""
+    from app.services.scale_detection_service import ScaleDetectionService
+    device = Device.query.get_or_404(device_id)
+    
+    if device.device_type != 'scale':
+        return jsonify({'success': False, 'error': 'Not a scale device'})
+    
+    try:
+        operation_id = ScaleDetectionService.request(device.id)
+        return jsonify({'success': True, 'operation_id': operation_id, 'status': 'pending'}), 202
+    except Exception as e:
+        logger.error(f"Scale detection error: {str(e)[:100]}")
+        return jsonify({'success': False, 'error': 'Detection failed'}), 500
+
+@admin_bp.route('/devices/detect_protocol/status/<operation_id>')
+def detect_scale_protocol_status(operation_id):
+    """Status of a format detection: pending, running, detected or failed"""
+    from app.services.scale_detection_service import ScaleDetectionService
+    
+    status = ScaleDetectionService.status(operation_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'Unknown detection operation'}), 404
+    return jsonify(status)
+
+def _parse_history_time(value):
+    """Accept epoch seconds or an ISO 8601 local time"""
+    from datetime import datetime
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(value).timestamp()
+
+@admin_bp.route('/devices/weight_history/<int:device_id>')
+def scale_weight_history(device_id):
+    """Recorded scale readings for a time window, e.g. ?at=2024-05-01T10:42&window=30"""
+    from app.services.scale_monitor import ScaleMonitor
+    device = Device.query.get_or_404(device_id)
+
+    if device.device_type != 'scale':
+        return jsonify({'success': False, 'error': 'Not a scale device'})
+
+    try:
+        if request.args.get('at'):
+            at = _parse_history_time(request.args['at'])
+            window = float(request.args.get('window', 30))
+            start, end = at - window, at + window
+        else:
+            start = _parse_history_time(request.args['start'])
+            end = _parse_history_time(request.args['end'])
+        limit = min(int(request.args.get('limit', 5000)), 50000)
+    except (KeyError, ValueError, TypeError):
+        return jsonify({'success': False, 'error': 'Provide at, or start and end, as epoch seconds or ISO time'}), 400
+
+    segments = ScaleMonitor.get_history(device.id, start, end)
+    total = sum(len(segment) for segment in segments)
+
+    # Thin long windows by striding rather than serializing every record
+    step = max(1, -(-total // limit))
+    readings = []
+    for segment in segments:
+        for timestamp, weight, flags, _reserved in segment[::step].tolist():
+            readings.append({'timestamp': timestamp, 'weight': weight, 'flags': flags})
+
+    return jsonify({
+        'success': True,
+        'device_id': device.id,
+        'start': start,
+        'end': end,
+        'total': total,
+        'step': step,
+        'readings': readings
+    })
+
 @admin_bp.route('/devices/create_virtual_serial/<int:device_id>', methods=['POST'])
 def create_virtual_serial(device_id):
     """Manually create virtual serial device for scale"""
@@ -397,11 +617,47 @@ def test_camera_stream(device_id):
     </html>
     '''
 
+def _test_scale_tcp(device):
+    """Test a natively connected scale by waiting briefly for the background reader"""
+    from flask import current_app
+    from app.services.scale_monitor import ScaleMonitor
+    import time
+    
+    port = current_app.config.get('DEFAULT_SCALE_PORT', 8899)
+    ScaleMonitor.start_device(device, port)
+    
+    deadline = time.monotonic() + 3.0
+    snapshot = ScaleMonitor.get_snapshot(device.id)
+    while snapshot['timestamp'] is None and time.monotonic() < deadline:
+        time.sleep(0.1)
+        snapshot = ScaleMonitor.get_snapshot(device.id)
+    
+    address = ', '.join(member.ip_address for member in device.members) if device.members else device.ip_address
+    result = {
+        'connection_type': 'Combined TCP' if device.members else 'TCP',
+        'port': f'{address}:{port}',
+        'baud_rate': device.baud_rate,
+        'config': f'{device.data_bits}{device.parity}{device.stop_bits}'
+    }
+    if snapshot['timestamp'] is not None:
+        result.update({
+            'status': 'online',
+            'message': f"TCP Connected - Live Weight: {snapshot['weight']:.2f} {snapshot['unit']}",
+            'weight': snapshot['weight']
+        })
+    elif snapshot['connected']:
+        result.update({'status': 'connected', 'message': f'TCP Connected to {address}:{port} but no weight data'})
+    else:
+        result.update({'status': 'offline', 'message': f'TCP Connection failed to {address}:{port}'})
+    return result
+
 @admin_bp.route('/devices/test/<int:device_id>', methods=['POST'])
 def test_device(device_id):
     device = Device.query.get_or_404(device_id)
     
-    if device.device_type == 'scale':
+    if device.device_type == 'scale' and device.scale_transport != 'socat':
+        result = _test_scale_tcp(device)
+    elif device.device_type == 'scale':
         if not device.serial_port or device.serial_port.strip() == '':
             result = {'status': 'error', 'message': 'Scale serial port is required'}
         else:
@@ -426,7 +682,8 @@ def test_device(device_id):
                     data_bits=device.data_bits or 8,
                     parity=device.parity or 'N',
                     stop_bits=device.stop_bits or 1,
-                    flow_control=device.flow_control or 'none'
+                    flow_control=device.flow_control or 'none',
+                    protocol=device.scale_protocol
                 )
                 result = service.test_connection()
             else:
@@ -461,6 +718,19 @@ def test_device(device_id):
     
     return jsonify(result)
 
+@admin_bp.route('/receipts/<int:transaction_id>')
+def download_receipt(transaction_id):
+    """Audit copy of the exact printer bytes handed to the customer for a transaction"""
+    from flask import Response
+    from app.services.receipt_archive import ReceiptArchive
+    
+    payload = ReceiptArchive.load(transaction_id)
+    if payload is None:
+        return jsonify({'success': False, 'error': 'No stored receipt for this transaction'}), 404
+    return Response(payload, mimetype='application/octet-stream', headers={
+        'Content-Disposition': f'attachment; filename=receipt_{transaction_id}.bin'
+    })
+
 @admin_bp.route('/groups')
 def groups():
     groups = UserGroup.query.all()
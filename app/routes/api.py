@@ -2,7 +2,6 @@ from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from app import db
 from app.models.customer import Customer
-from app.services.printer_service import StarPrinterService
 import requests
 import os
 import logging
@@ -463,15 +462,18 @@ def open_cash_drawer():
     if not current_user.has_permission('open_cash_drawer'):
         return jsonify({'success': False, 'error': 'Insufficient permissions'}), 403
     
+    from app.services.device_resolver import DeviceResolver
+    from app.services.print_spooler import PrintSpooler
+    
     try:
-        data = request.get_json() or {}
-        printer_ip = data.get('printer_ip')
-        
-        if not printer_ip:
-            return jsonify({'success': False, 'error': 'Printer IP required'}), 400
+        # The drawer is wired to this lane's own printer; never a client-supplied, pooled, user-assigned
+        # or first-active one, any of which could pop another lane's drawer. A site with one printer and
+        # no terminal assignments uses that printer
+        printer = DeviceResolver.for_terminal('printer')
+        if not printer:
+            return jsonify({'success': False, 'error': 'No printer assigned to this terminal'}), 404
         
-        printer_service = StarPrinterService(printer_ip)
-        success = printer_service.open_cash_drawer()
+        success = PrintSpooler.open_drawer(printer)
         
         if success:
             return jsonify({'success': True, 'message': 'Cash drawer opened'})
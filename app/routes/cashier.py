@@ -30,43 +30,153 @@ def dashboard():
 @login_required
 @require_permission('transaction')
 def get_scale_weight():
-    """Get current scale weight"""
-    from app.models.device import Device
-    from app.services.scale_service import USRScaleService
+    """Get current scale weight from the background reader's cached snapshot"""
+    from flask import current_app
+    from app.services.device_resolver import DeviceResolver
+    from app.services.scale_monitor import ScaleMonitor
+    from app.services.startup_service import scales_ready
     
-    scale = Device.query.filter_by(device_type='scale', is_active=True).first()
+    scale = DeviceResolver.for_request('scale')
     if not scale:
         return jsonify({'weight': 0.0, 'stable': False})
     
     try:
-        service = USRScaleService(scale.ip_address, scale.serial_port)
-        weight_data = service.get_weight()
-        return jsonify(weight_data)
+        # Starting is a no-op once the reader is running; it never blocks on the device
+        if scales_ready():
+            ScaleMonitor.start_device(scale, current_app.config.get('DEFAULT_SCALE_PORT', 8899))
+        return jsonify(ScaleMonitor.get_snapshot(scale.id))
     except Exception as e:
         logger.error(f"Scale read error: {str(e)[:100]}")
         return jsonify({'weight': 0.0, 'stable': False})
 
+@cashier_bp.route('/api/scale/stream')
+@login_required
+@require_permission('transaction')
+def stream_scale_weight():
+    """Server-Sent Events stream that pushes scale readings only when they change"""
+    from flask import current_app, Response
+    from app.services.device_resolver import DeviceResolver
+    from app.services.scale_monitor import ScaleMonitor
+    from app.services.startup_service import scales_ready
+    import json
+    import time
+    
+    # Resolve the scale once per connection rather than once per reading
+    scale = DeviceResolver.for_request('scale')
+    if not scale:
+        return jsonify({'error': 'No scale available'}), 404
+    
+    scale_id = scale.id
+    port = current_app.config.get('DEFAULT_SCALE_PORT', 8899)
+    keepalive = current_app.config.get('SCALE_STREAM_KEEPALIVE', 15)
+    max_seconds = current_app.config.get('SCALE_STREAM_MAX_SECONDS', 300)
+    
+    def generate():
+        started = False
+        last_sent = None
+        last_write = time.monotonic()
+        # Each open stream holds one server thread; ending it now and then lets EventSource reconnect
+        # and frees threads held by tabs whose connection died without the write failing
+        ends = last_write + max_seconds
+        
+        # Tell the browser how quickly to reconnect if the stream drops
+        yield 'retry: 2000\n\n'
+        
+        while time.monotonic() < ends:
+            # Readers start once the hardware owner has brought the scales up
+            if not started and scales_ready():
+                ScaleMonitor.start_device(scale, port)
+                started = True
+            
+            snapshot = ScaleMonitor.get_snapshot(scale_id)
+            current = (snapshot['weight'], snapshot['stable'], snapshot['unit'], snapshot['connected'])
+            
+            if current != last_sent:
+                last_sent = current
+                last_write = time.monotonic()
+                yield f"data: {json.dumps(snapshot)}\n\n"
+            elif time.monotonic() - last_write >= keepalive:
+                # Comment line keeps proxies from closing an idle connection
+                last_write = time.monotonic()
+                yield ': keepalive\n\n'
+            
+            # Wakes immediately on a new reading; the timeout catches connect/disconnect transitions
+            ScaleMonitor.wait_for_change(timeout=1.0, device_id=scale_id)
+    
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
+
 @cashier_bp.route('/api/scale/tare', methods=['POST'])
 @login_required
 @require_permission('transaction')
 def tare_scale():
-    """Tare the scale"""
-    from app.models.device import Device
-    from app.services.scale_service import USRScaleService
+    """Start a tare; poll the returned operation id for confirmation"""
+    from app.services.device_resolver import DeviceResolver
+    from app.services.tare_service import TareService
     
-    scale = Device.query.filter_by(device_type='scale', is_active=True).first()
+    scale = DeviceResolver.for_request('scale')
     if not scale:
         return jsonify({'success': False, 'error': 'No scale available'})
     
     try:
-        service = USRScaleService(scale.ip_address, scale.serial_port)
-        result = service.tare_scale()
-        return jsonify({'success': result})
+        operation_id = TareService.request(scale.id)
+        return jsonify({'success': True, 'operation_id': operation_id, 'status': 'pending'}), 202
     except Exception as e:
         logger.error(f"Scale tare error: {str(e)[:100]}")
         return jsonify({'success': False, 'error': 'Scale communication failed'})
 
+@cashier_bp.route('/api/scale/tare/<operation_id>')
+@login_required
+@require_permission('transaction')
+def tare_status(operation_id):
+    """Status of a tare operation: pending, running, confirmed or failed"""
+    from app.services.tare_service import TareService
+    
+    status = TareService.status(operation_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'Unknown tare operation'}), 404
+    return jsonify(status)
 
+@cashier_bp.route('/api/tickets/<code>')
+@login_required
+@require_permission('transaction')
+def open_ticket(code):
+    """Open the transaction behind a scanned receipt barcode"""
+    from app.models.transaction import Transaction, TransactionItem
+    
+    transaction_id = Transaction.parse_ticket_code(code)
+    if transaction_id is None:
+        return jsonify({'success': False, 'error': 'Not a ticket barcode'}), 400
+    
+    # Primary key lookup with customer, items and materials joined in, so one query loads the ticket
+    transaction = (Transaction.query
+                   .options(db.joinedload(Transaction.customer),
+                            db.joinedload(Transaction.items).joinedload(TransactionItem.material))
+                   .filter(Transaction.id == transaction_id)
+                   .one_or_none())
+    if transaction is None:
+        return jsonify({'success': False, 'error': 'Ticket not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'ticket_code': transaction.ticket_code,
+        'transaction': {
+            'id': transaction.id,
+            'status': transaction.status,
+            'customer_id': transaction.customer_id,
+            'customer_name': transaction.customer.name if transaction.customer else None,
+            'total_weight': float(transaction.total_weight or 0),
+            'total_amount': float(transaction.total_amount or 0),
+            'created_at': transaction.created_at.isoformat() if transaction.created_at else None,
+            'items': [{
+                'material_id': item.material_id,
+                'material': item.material.description if item.material else None,
+                'weight': float(item.weight),
+                'price_per_lb': float(item.price_per_pound),
+                'total': float(item.total_amount)
+            } for item in transaction.items]
+        }
+    })
 
 @cashier_bp.route('/api/transactions/create', methods=['POST'])
 @login_required
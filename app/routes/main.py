@@ -7,6 +7,9 @@ logger = logging.getLogger(__name__)
 
 main_bp = Blueprint('main', __name__)
 
+# Largest label batch accepted in one print job
+MAX_BATCH_LABELS = 500
+
 def require_permission(permission):
     def decorator(f):
         def decorated_function(*args, **kwargs):
@@ -64,11 +67,141 @@ def capture_photo(camera_id):
     """Capture photo from specified camera"""
     return jsonify({'success': True, 'photo': 'base64_data_here'})
 
+def _valid_job_id(job_id) -> bool:
+    """Client-supplied print job ids are optional, alphanumeric and fit the journal's key"""
+    return job_id is None or (isinstance(job_id, str) and job_id.isalnum() and len(job_id) <= 32)
+
 @main_bp.route('/api/print_receipt', methods=['POST'])
 @login_required
 def print_receipt():
-    """Print transaction receipt"""
-    return jsonify({'success': True})
+    """Queue a transaction receipt; poll the returned job id for the outcome"""
+    from app.services.device_resolver import DeviceResolver
+    from app.services.print_spooler import PrintSpooler
+    from app.services.printer_monitor import PrinterMonitor
+    from app.services.receipt_archive import ReceiptArchive
+    from app.services.receipt_renderer import ReceiptRenderer
+    
+    printer = DeviceResolver.for_request('printer')
+    if not printer:
+        return jsonify({'success': False, 'error': 'No printer available'}), 404
+    
+    transaction_data = request.get_json() or {}
+    # Client-generated id so a resubmitted request never prints a second copy
+    job_id = transaction_data.pop('job_id', None)
+    if not _valid_job_id(job_id):
+        return jsonify({'success': False, 'error': 'Invalid job id'}), 400
+    if job_id and PrintSpooler.status(job_id):
+        # Already printing or printed
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued',
+                        'printer_status': PrinterMonitor.status(printer.id)}), 202
+    
+    try:
+        template = ReceiptRenderer.default_template()
+        transaction_id = ReceiptArchive.transaction_id(transaction_data.get('id'))
+        transaction = ReceiptArchive.saved_transaction(transaction_id) if transaction_id is not None else None
+        if transaction is None:
+            # Unsaved ticket: print what the page sent, but keep no audit copy of it
+            payload = bytes(ReceiptRenderer.render(transaction_data, template))
+        else:
+            # Saved ticket: the receipt and its archived copy come from the stored totals, not the posted ones
+            payload = bytes(ReceiptRenderer.render(ReceiptArchive.receipt_data(transaction), template))
+            try:
+                ReceiptArchive.store(transaction.id, payload, template.id)
+            except Exception as e:
+                # The customer still gets their receipt; only instant reprint is lost
+                db.session.rollback()
+                logger.error(f"Failed to store receipt for transaction {transaction.id}: {str(e)[:100]}")
+        
+        job_id = PrintSpooler.submit(printer, payload, job_id=job_id)
+        # Lets the page warn about paper or cover problems before the job fails
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued',
+                        'printer_status': PrinterMonitor.status(printer.id)}), 202
+    except Exception as e:
+        logger.error(f"Receipt print error: {str(e)[:100]}")
+        return jsonify({'success': False, 'error': 'Print failed'}), 500
+
+@main_bp.route('/api/receipts/<int:transaction_id>/reprint', methods=['POST'])
+@login_required
+def reprint_receipt(transaction_id):
+    """Queue the stored bytes of a transaction's receipt, exactly as first printed"""
+    from app.services.device_resolver import DeviceResolver
+    from app.services.print_spooler import PrintSpooler
+    from app.services.receipt_archive import ReceiptArchive
+    
+    printer = DeviceResolver.for_request('printer')
+    if not printer:
+        return jsonify({'success': False, 'error': 'No printer available'}), 404
+    
+    job_id = (request.get_json(silent=True) or {}).get('job_id')
+    if not _valid_job_id(job_id):
+        return jsonify({'success': False, 'error': 'Invalid job id'}), 400
+    
+    payload = ReceiptArchive.load(transaction_id)
+    if payload is None:
+        return jsonify({'success': False, 'error': 'No stored receipt for this transaction'}), 404
+    
+    try:
+        job_id = PrintSpooler.submit(printer, payload, kind='reprint', job_id=job_id)
+        ReceiptArchive.record_reprint(transaction_id)
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'}), 202
+    except Exception as e:
+        logger.error(f"Receipt reprint error: {str(e)[:100]}")
+        return jsonify({'success': False, 'error': 'Print failed'}), 500
+
+@main_bp.route('/api/print_labels', methods=['POST'])
+@login_required
+def print_labels():
+    """Queue a batch of yard tags as one continuous print job"""
+    from app.hardware.star_printer import StarMicronicsPrinter
+    from app.services.device_resolver import DeviceResolver
+    from app.services.print_spooler import PrintSpooler
+    from app.services.printer_monitor import PrinterMonitor
+    
+    printer = DeviceResolver.for_request('printer')
+    if not printer:
+        return jsonify({'success': False, 'error': 'No printer available'}), 404
+    
+    data = request.get_json() or {}
+    labels = data.get('labels')
+    if not isinstance(labels, list) or not labels or not all(isinstance(label, dict) for label in labels):
+        return jsonify({'success': False, 'error': 'labels must be a non-empty list'}), 400
+    if len(labels) > MAX_BATCH_LABELS:
+        return jsonify({'success': False, 'error': f'At most {MAX_BATCH_LABELS} labels per batch'}), 400
+    job_id = data.get('job_id')
+    if not _valid_job_id(job_id):
+        return jsonify({'success': False, 'error': 'Invalid job id'}), 400
+    
+    try:
+        payload = bytes(StarMicronicsPrinter.labels_bytes(labels))
+        job_id = PrintSpooler.submit(printer, payload, kind='label', job_id=job_id, count=len(labels))
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued', 'count': len(labels),
+                        'printer_status': PrinterMonitor.status(printer.id)}), 202
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Invalid label: {str(e)[:100]}'}), 400
+    except Exception as e:
+        logger.error(f"Label print error: {str(e)[:100]}")
+        return jsonify({'success': False, 'error': 'Print failed'}), 500
+
+@main_bp.route('/api/print_jobs/<job_id>')
+@login_required
+def print_job_status(job_id):
+    """Status of a print job: queued, printing, done or failed"""
+    from app.services.print_spooler import PrintSpooler
+    
+    status = PrintSpooler.status(job_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'Unknown print job'}), 404
+    return jsonify(status)
+
+@main_bp.route('/api/print_jobs/<job_id>/retry', methods=['POST'])
+@login_required
+def retry_print_job(job_id):
+    """Queue a failed print job again"""
+    from app.services.print_spooler import PrintSpooler
+    
+    if not PrintSpooler.retry(job_id):
+        return jsonify({'success': False, 'error': 'Only failed print jobs can be retried'}), 409
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'}), 202
 
 @main_bp.route('/api/customers/create', methods=['POST'])
 @login_required
@@ -178,14 +311,14 @@ def ping_test():
 @main_bp.route('/api/camera/stream')
 @login_required
 def camera_stream():
-    """Proxy MJPEG stream from camera"""
-    from app.models.device import Device
+    """Proxy MJPEG stream from camera, sharing one upstream connection per camera"""
+    from app.services.device_resolver import DeviceResolver
     from app.services.camera_service import AxisCameraService
+    from app.services.camera_hub import CameraHub, BOUNDARY
     from flask import Response
-    import requests
     
-    # Find first available camera
-    camera = Device.query.filter_by(device_type='camera', is_active=True).first()
+    # Camera assigned to this user or terminal, else the first available one
+    camera = DeviceResolver.for_request('camera')
     
     if not camera:
         return Response('No camera available', status=404)
@@ -194,22 +327,9 @@ def camera_stream():
         service = AxisCameraService(camera.ip_address, camera.camera_username, camera.camera_password)
         stream_url = service.get_stream_url()
         
-        def generate():
-            try:
-                # Use the stream URL with embedded credentials
-                response = requests.get(stream_url, stream=True, timeout=30)
-                response.raise_for_status()
-                
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        yield chunk
-                        
-            except Exception as e:
-                logger.error(f"Stream error: {e}")
-                return
-        
         headers = {'Cache-Control': 'no-cache'}
-        return Response(generate(), mimetype='multipart/x-mixed-replace', headers=headers)
+        return Response(CameraHub.stream(camera.id, stream_url),
+                        mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}', headers=headers)
         
     except Exception as e:
         logger.error(f"Camera stream error: {e}")
@@ -219,11 +339,11 @@ def camera_stream():
 @login_required
 def capture_camera_photo():
     """Capture photo using available camera"""
-    from app.models.device import Device
+    from app.services.device_resolver import DeviceResolver
     from app.services.camera_service import AxisCameraService
     
-    # Find first available camera
-    camera = Device.query.filter_by(device_type='camera', is_active=True).first()
+    # Camera assigned to this user or terminal, else the first available one
+    camera = DeviceResolver.for_request('camera')
     
     if not camera:
         return jsonify({'success': False, 'error': 'No camera available'})
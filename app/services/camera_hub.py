@@ -0,0 +1,205 @@
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_CONTENT_LENGTH = re.compile(rb'content-length:\s*(\d+)', re.IGNORECASE)
+
+# Boundary sent to browsers; each part carries the latest complete frame
+BOUNDARY = 'frame'
+
+class MjpegParser:
+    """Splits a multipart/x-mixed-replace byte stream into complete JPEG frames.
+
+    Parts with a Content-Length header (as AXIS cameras send) are cut by
+    length; parts without one are cut at the JPEG end-of-image marker.
+    """
+
+    # Anything larger without a frame boundary is garbage; drop it and resync
+    MAX_BUFFER = 4 * 1024 * 1024
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        self.buffer += data
+        frames = []
+        while True:
+            # Parts are separated by blank lines before the boundary
+            while self.buffer[:2] == b'\r\n':
+                del self.buffer[:2]
+            header_end = self.buffer.find(b'\r\n\r\n')
+            if header_end < 0:
+                break
+            start = header_end + 4
+            match = _CONTENT_LENGTH.search(self.buffer, 0, header_end)
+            if match:
+                end = start + int(match.group(1))
+                if len(self.buffer) < end:
+                    break
+            else:
+                end = self.buffer.find(b'\xff\xd9', start)
+                if end < 0:
+                    break
+                end += 2
+            frame = bytes(self.buffer[start:end])
+            del self.buffer[:end]
+            if frame[:2] == b'\xff\xd8':
+                frames.append(frame)
+
+        if len(self.buffer) > self.MAX_BUFFER:
+            logger.warning("MJPEG stream lost frame sync, discarding buffered data")
+            self.buffer.clear()
+        return frames
+
+class CameraFeed:
+    """One upstream MJPEG connection to a camera, shared by every viewer of it"""
+
+    def __init__(self, device_id: int, stream_url: str):
+        self.device_id = device_id
+        self.stream_url = stream_url
+        self.frame = None
+        self.sequence = 0
+        self.subscribers = 0
+        self.idle_since = time.monotonic()
+        self.connected = False
+        self.running = True
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f'camera-{device_id}')
+        self.thread.start()
+
+    def _run(self):
+        import requests
+        delay = CameraHub.RECONNECT_DELAY
+        while self.running:
+            parser = MjpegParser()
+            try:
+                with requests.get(self.stream_url, stream=True, timeout=CameraHub.READ_TIMEOUT) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    delay = CameraHub.RECONNECT_DELAY
+                    logger.info(f"Camera {self.device_id} stream connected")
+                    # read1 returns whatever has arrived; iter_content would hold a frame back until a full chunk filled
+                    read = getattr(response.raw, 'read1', response.raw.read)
+                    while self.running:
+                        chunk = read(CameraHub.CHUNK_SIZE)
+                        if not chunk:
+                            raise ConnectionError("Camera closed the stream")
+                        for frame in parser.feed(chunk):
+                            self._publish(frame)
+            except Exception as e:
+                logger.error(f"Camera {self.device_id} stream error: {str(e)[:100]}")
+            self.connected = False
+            with self.condition:
+                self.condition.notify_all()
+            if self.running:
+                time.sleep(delay)
+                delay = min(delay * 2, CameraHub.MAX_RECONNECT_DELAY)
+
+    def _publish(self, frame: bytes):
+        with self.condition:
+            self.frame = frame
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def wait_frame(self, after: int, timeout: float) -> tuple:
+        """Latest (sequence, frame) newer than after; frames published in between are skipped"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > after or not self.running, timeout)
+            return self.sequence, self.frame
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+class CameraHub:
+    """Fans each camera's MJPEG stream out to any number of browser viewers.
+
+    The first viewer of a camera opens its single upstream connection;
+    further viewers share it. A reader thread parses frame boundaries and
+    keeps only the latest complete frame. Each viewer is sent the newest
+    frame whenever it is ready for one, so a slow client skips frames
+    instead of buffering them. The upstream connection closes once a camera
+    has had no viewers for IDLE_TIMEOUT seconds.
+
+    Each viewer holds a request thread, so a viewer's stream ends after
+    MAX_STREAM_SECONDS; the page reopens it, and a tab whose connection died
+    without a failed write gives its thread back.
+    """
+
+    # Most bytes taken per upstream read
+    CHUNK_SIZE = 16384
+
+    # Seconds without data before the upstream connection is dropped and reopened
+    READ_TIMEOUT = 10.0
+
+    # Seconds before reconnecting after an upstream error; doubles up to MAX_RECONNECT_DELAY
+    RECONNECT_DELAY = 1.0
+    MAX_RECONNECT_DELAY = 30.0
+
+    # Seconds a camera keeps streaming after its last viewer left
+    IDLE_TIMEOUT = 10.0
+
+    # Seconds before a viewer's stream is ended
+    MAX_STREAM_SECONDS = 300.0
+
+    _feeds = {}
+    _lock = threading.Lock()
+    _reaper = None
+
+    @classmethod
+    def configure(cls, config):
+        """Load the idle timeout and stream lifetime from the Flask config"""
+        cls.IDLE_TIMEOUT = config.get('CAMERA_IDLE_TIMEOUT', cls.IDLE_TIMEOUT)
+        cls.MAX_STREAM_SECONDS = config.get('CAMERA_STREAM_MAX_SECONDS', cls.MAX_STREAM_SECONDS)
+
+    @classmethod
+    def _subscribe(cls, device_id: int, stream_url: str) -> CameraFeed:
+        with cls._lock:
+            feed = cls._feeds.get(device_id)
+            if feed is None or feed.stream_url != stream_url:
+                if feed:
+                    feed.stop()
+                feed = cls._feeds[device_id] = CameraFeed(device_id, stream_url)
+            feed.subscribers += 1
+            if cls._reaper is None:
+                cls._reaper = threading.Thread(target=cls._reap, daemon=True, name='camera-reaper')
+                cls._reaper.start()
+            return feed
+
+    @classmethod
+    def _unsubscribe(cls, feed: CameraFeed):
+        with cls._lock:
+            feed.subscribers -= 1
+            if feed.subscribers == 0:
+                feed.idle_since = time.monotonic()
+
+    @classmethod
+    def _reap(cls):
+        while True:
+            time.sleep(cls.IDLE_TIMEOUT / 2)
+            with cls._lock:
+                for device_id, feed in list(cls._feeds.items()):
+                    if feed.subscribers == 0 and time.monotonic() - feed.idle_since >= cls.IDLE_TIMEOUT:
+                        feed.stop()
+                        del cls._feeds[device_id]
+                        logger.info(f"Camera {device_id} stream closed, no viewers")
+
+    @classmethod
+    def stream(cls, device_id: int, stream_url: str):
+        """Generator of multipart MJPEG parts for one viewer"""
+        feed = cls._subscribe(device_id, stream_url)
+        ends = time.monotonic() + cls.MAX_STREAM_SECONDS
+        try:
+            sequence = 0
+            while feed.running and time.monotonic() < ends:
+                sequence, frame = feed.wait_frame(sequence, cls.READ_TIMEOUT)
+                if frame is None:
+                    continue
+                yield (f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(frame)}\r\n\r\n'
+                       .encode('ascii') + frame + b'\r\n')
+        finally:
+            cls._unsubscribe(feed)
@@ -0,0 +1,126 @@
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Optional
+from app.services.device_state import KIND_CAMERA
+
+logger = logging.getLogger(__name__)
+
+# Camera status bits stored in the device state slot
+STATUS_AUTH_FAILED = 0x01
+STATUS_HTTP_ERROR = 0x02
+
+_STATUS_BITS = {'online': 0, 'auth_error': STATUS_AUTH_FAILED, 'error': STATUS_HTTP_ERROR}
+
+class CameraMonitor:
+    """Background poller that caches every active camera's reachability.
+
+    The hardware owner asks each camera for its system properties every
+    INTERVAL seconds and publishes whether it answered, and whether it
+    accepted the stored credentials, to the shared device state table,
+    bumping Device.last_seen whenever the camera answers. Pages in any
+    process read status() from the table instead of probing the camera
+    themselves.
+    """
+
+    # Seconds between health polls of each camera
+    INTERVAL = 30.0
+
+    _app = None
+    _thread = None
+    _latest = {}
+
+    @classmethod
+    def configure(cls, config):
+        """Load the poll interval from the Flask config"""
+        cls.INTERVAL = config.get('CAMERA_STATUS_INTERVAL', cls.INTERVAL)
+
+    @classmethod
+    def start(cls, app):
+        """Start polling; called by the hardware owner only"""
+        cls._app = app
+        if cls._thread and cls._thread.is_alive():
+            return
+        cls._thread = threading.Thread(target=cls._run, daemon=True, name='camera-status')
+        cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            started = time.monotonic()
+            try:
+                with cls._app.app_context():
+                    cls.poll()
+            except Exception as e:
+                logger.error(f"Camera status poll failed: {str(e)[:100]}")
+            time.sleep(max(0.0, cls.INTERVAL - (time.monotonic() - started)))
+
+    @classmethod
+    def poll(cls):
+        """Probe every active camera once and publish the results"""
+        from app import db
+        from app.models.device import Device
+        from app.services.camera_service import AxisCameraService
+
+        cameras = Device.query.filter_by(device_type='camera', is_active=True).all()
+        seen = []
+        for device in cameras:
+            try:
+                result = AxisCameraService(device.ip_address, device.camera_username,
+                                           device.camera_password).test_connection()
+            except ValueError:
+                result = {'status': 'offline'}
+            bits = _STATUS_BITS.get(result['status'])
+            cls._publish(device.id, bits is not None, bits or 0)
+            if bits is not None:
+                seen.append(device.id)
+
+        if seen:
+            Device.query.filter(Device.id.in_(seen)).update({'last_seen': datetime.utcnow()},
+                                                            synchronize_session=False)
+            db.session.commit()
+
+    @classmethod
+    def _publish(cls, device_id: int, connected: bool, bits: int):
+        from app.services.startup_service import get_state_table
+        now = time.time()
+        previous = cls._latest.get(device_id)
+        last_seen = now if connected else (previous['last_seen'] if previous else 0.0)
+        cls._latest[device_id] = {'connected': connected, 'status': bits, 'updated': now, 'last_seen': last_seen}
+
+        table = get_state_table()
+        if table:
+            table.write_status(device_id, KIND_CAMERA, connected, bits, last_seen)
+
+        if previous is None or previous['connected'] != connected or previous['status'] != bits:
+            logger.info(f"Camera {device_id} status: {cls.describe(connected, bits)}")
+
+    @classmethod
+    def status(cls, device_id: int) -> Optional[dict]:
+        """Cached status of a camera, or None if it has not been polled recently"""
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+        cached = table.read(device_id) if table else cls._latest.get(device_id)
+        if not cached or cached.get('kind', KIND_CAMERA) != KIND_CAMERA:
+            return None
+        # Older than a few polls means the owner stopped polling; don't report it as current
+        if time.time() - cached['updated'] > cls.INTERVAL * 3:
+            return None
+
+        return {
+            'connected': cached['connected'],
+            'status': cls.describe(cached['connected'], cached['status']),
+            'last_seen': cached['last_seen'] or None,
+            'updated': cached['updated']
+        }
+
+    @staticmethod
+    def describe(connected: bool, bits: int) -> str:
+        if not connected:
+            return 'offline'
+        if bits & STATUS_AUTH_FAILED:
+            return 'auth_error'
+        if bits & STATUS_HTTP_ERROR:
+            return 'error'
+        return 'online'
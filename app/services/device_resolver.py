@@ -0,0 +1,135 @@
+import threading
+import logging
+from types import SimpleNamespace
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Columns copied into the cached, session-independent device records
+_FIELDS = ('id', 'name', 'device_type', 'ip_address', 'scale_transport', 'scale_protocol', 'scale_framing',
+           'serial_port', 'baud_rate', 'data_bits', 'parity', 'stop_bits', 'flow_control', 'printer_model',
+           'printer_pool', 'camera_model', 'stream_url', 'camera_username', 'camera_password')
+
+class DeviceResolver:
+    """In-process cache answering "which scale/printer/camera does this request use".
+
+    Active devices and DeviceAssignment rows are loaded once into plain,
+    session-independent records. A user's assignment wins over the terminal's,
+    and anything unassigned falls back to the first active device of the type.
+    The cache reloads when the shared config generation moves (any process's
+    admin edit) or when invalidate() is called in this process, so hot
+    endpoints resolve their device without a query.
+    """
+
+    _devices = {}
+    _by_type = {}
+    _users = {}
+    _terminals = {}
+    _pools = {}
+    _generation = None
+    _loaded = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the cache; the next resolve reloads it"""
+        cls._loaded = False
+
+    @classmethod
+    def _current_generation(cls) -> Optional[int]:
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+        return table.generation if table else None
+
+    @classmethod
+    def _ensure_loaded(cls):
+        generation = cls._current_generation()
+        if cls._loaded and generation == cls._generation:
+            return
+
+        with cls._lock:
+            generation = cls._current_generation()
+            if cls._loaded and generation == cls._generation:
+                return
+
+            from app.models.device import Device, DeviceAssignment
+            devices, by_type, pools = {}, {}, {}
+            for device in Device.query.filter_by(is_active=True).order_by(Device.id).all():
+                devices[device.id] = cls._record(device)
+                if device.scale_transport == 'combined':
+                    devices[device.id].members = [cls._record(member) for member in device.members]
+                if device.device_type == 'printer' and device.printer_pool:
+                    pools.setdefault(device.printer_pool, []).append(device.id)
+                by_type.setdefault(device.device_type, []).append(device.id)
+
+            users, terminals = {}, {}
+            for assignment in DeviceAssignment.query.order_by(DeviceAssignment.id).all():
+                device = devices.get(assignment.device_id)
+                if device is None:
+                    continue
+                if assignment.user_id:
+                    users[(assignment.user_id, device.device_type)] = device.id
+                if assignment.terminal:
+                    terminals[(assignment.terminal, device.device_type)] = device.id
+
+            cls._devices, cls._by_type = devices, by_type
+            cls._users, cls._terminals = users, terminals
+            cls._pools = pools
+            cls._generation = generation
+            cls._loaded = True
+            logger.debug(f"Device cache loaded: {len(devices)} devices, {len(users) + len(terminals)} assignments")
+
+    @staticmethod
+    def _record(device) -> SimpleNamespace:
+        return SimpleNamespace(**{field: getattr(device, field) for field in _FIELDS})
+
+    @classmethod
+    def resolve(cls, device_type: str, user_id: int = None, terminal: str = None) -> Optional[SimpleNamespace]:
+        """Device of a type for a user/terminal, or None if there is no active device of that type"""
+        cls._ensure_loaded()
+
+        device_id = cls._users.get((user_id, device_type)) or cls._terminals.get((terminal, device_type))
+        if device_id is None:
+            ids = cls._by_type.get(device_type)
+            device_id = ids[0] if ids else None
+        return cls._devices.get(device_id)
+
+    @classmethod
+    def for_request(cls, device_type: str) -> Optional[SimpleNamespace]:
+        """Device of a type for the logged-in user at the requesting terminal"""
+        from flask import request
+        from flask_login import current_user
+        user_id = current_user.id if current_user.is_authenticated else None
+        return cls.resolve(device_type, user_id, request.remote_addr)
+
+    @classmethod
+    def for_terminal(cls, device_type: str) -> Optional[SimpleNamespace]:
+        """Device of a type assigned to the requesting terminal itself.
+
+        There is no user or first-active fallback, except that a site with a
+        single active device of the type and no terminal assignments for it
+        uses that device, so small sites need not assign anything.
+        """
+        from flask import request
+        cls._ensure_loaded()
+        device_id = cls._terminals.get((request.remote_addr, device_type))
+        if device_id is None:
+            ids = cls._by_type.get(device_type, [])
+            assigned = any(kind == device_type for _terminal, kind in cls._terminals)
+            if len(ids) == 1 and not assigned:
+                device_id = ids[0]
+        return cls._devices.get(device_id)
+
+    @classmethod
+    def get(cls, device_id: int) -> Optional[SimpleNamespace]:
+        """Cached active device by id"""
+        cls._ensure_loaded()
+        return cls._devices.get(device_id)
+
+    @classmethod
+    def pool(cls, printer) -> list:
+        """Active printers sharing a printer's pool, the printer itself first; just the printer if unpooled"""
+        cls._ensure_loaded()
+        members = [cls._devices[device_id] for device_id in cls._pools.get(printer.printer_pool, ())
+                   if device_id != printer.id] if printer.printer_pool else []
+        return [printer] + members
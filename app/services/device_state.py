@@ -0,0 +1,318 @@
+import os
+import mmap
+import fcntl
+import random
+import struct
+import threading
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Slot kinds
+KIND_EMPTY = 0
+KIND_SCALE = 1
+KIND_PRINTER = 2
+KIND_CAMERA = 3
+
+# Slot flag bits
+FLAG_CONNECTED = 0x01
+FLAG_STABLE = 0x02
+FLAG_INDICATOR_STABLE = 0x04
+FLAG_MOTION = 0x08
+FLAG_OVERLOAD = 0x10
+
+# Mailbox commands
+COMMAND_TARE = 1
+COMMAND_DETECT = 2
+
+# Mailbox command states
+COMMAND_PENDING = 1
+COMMAND_RUNNING = 2
+COMMAND_DONE = 3
+COMMAND_FAILED = 4
+
+# Mailbox failure codes
+RESULT_OK = 0
+RESULT_NOT_CONNECTED = 1
+RESULT_TIMEOUT = 2
+RESULT_EXPIRED = 3
+RESULT_NO_DATA = 4
+RESULT_NO_MATCH = 5
+
+MAGIC = b'SCRPDEV1'
+VERSION = 2
+
+# magic, version, slot count, slot size, writer pid, config generation, commands posted
+_HEADER = struct.Struct('<8sIIIIQQ')
+_GENERATION_OFFSET = 24
+_COMMANDS_OFFSET = 32
+HEADER_SIZE = 64
+
+# Each slot: seq, then device id, kind, flags, updated, weight, gross, net, tare, unit, status, last seen
+_SEQ = struct.Struct('<Q')
+_BODY = struct.Struct('<IBBxxddddd8sIxxxxd')
+SLOT_SIZE = 128
+
+# Each mailbox record: seq, then device id, command, state, result code, nonce, posted, finished, result value
+_COMMAND = struct.Struct('<IBBBxQddd')
+COMMAND_SIZE = 64
+MAILBOX_SIZE = 64
+
+class DeviceStateTable:
+    """Fixed-layout shared-memory table of live device state, one slot per Device id.
+
+    The hardware owner process is the only slot writer. Each slot is guarded
+    by a seqlock: the writer makes the sequence odd, writes the fields and
+    makes it even again, and readers retry if the sequence was odd or moved
+    while they copied. Workers read the latest scale, printer and camera state
+    straight out of /dev/shm with no locks and no IPC round trip.
+
+    The intended deployment is a single mod_wsgi daemon process with many
+    threads (see config/apache-scrapyard.conf), where the table mostly
+    carries state across an ownership handoff: during a graceful restart
+    the old daemon still owns the hardware while the new one serves
+    requests. It is what keeps processes > 1 correct if the daemon is ever
+    widened, so writers and readers never assume they share a process.
+
+    After the slots sits a small ring-buffer mailbox through which any
+    process can post a command (e.g. tare or format detection) for the owner
+    to carry out. The owner writes the outcome back into the same record for
+    the poster to read.
+    """
+
+    def __init__(self, path: str, slots: int = 1024):
+        self.path = path
+        self.slots = slots
+        self._file = None
+        self._mm = None
+        self._lock = threading.Lock()
+        self._overflow = set()
+
+    @classmethod
+    def open(cls, path: str, slots: int = 1024) -> Optional['DeviceStateTable']:
+        """Map the table, creating it on first use; None if shared memory is unavailable"""
+        table = cls(path, slots)
+        try:
+            table._open()
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot open device state table {path}: {str(e)[:100]}")
+            table.close()
+            return None
+        return table
+
+    def _open(self):
+        size = self._mailbox_offset + MAILBOX_SIZE * COMMAND_SIZE
+        self._file = open(self.path, 'a+b')
+        os.chmod(self.path, 0o660)
+
+        # Serialize creation so concurrent workers never see a half-written header
+        fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._file.fileno()).st_size != size or not self._header_matches():
+                self._file.truncate(0)
+                self._file.truncate(size)
+                self._mm = mmap.mmap(self._file.fileno(), size)
+                _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.slots, SLOT_SIZE, 0, 0, 0)
+            else:
+                self._mm = mmap.mmap(self._file.fileno(), size)
+        finally:
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _header_matches(self) -> bool:
+        self._file.seek(0)
+        header = self._file.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            return False
+        magic, version, slots, slot_size, _pid, _generation, _commands = _HEADER.unpack(header)
+        return magic == MAGIC and version == VERSION and slots == self.slots and slot_size == SLOT_SIZE
+
+    @property
+    def _mailbox_offset(self) -> int:
+        return HEADER_SIZE + self.slots * SLOT_SIZE
+
+    def _offset(self, device_id: int) -> Optional[int]:
+        if 0 < device_id < self.slots:
+            return HEADER_SIZE + device_id * SLOT_SIZE
+        return None
+
+    def claim(self):
+        """Record this process as the slot writer"""
+        struct.pack_into('<I', self._mm, 20, os.getpid())
+
+    @property
+    def writer_pid(self) -> int:
+        return struct.unpack_from('<I', self._mm, 20)[0]
+
+    def _write(self, device_id: int, kind: int, flags: int, updated: float, weight: float = 0.0,
+               gross: float = 0.0, net: float = 0.0, tare: float = 0.0, unit: str = '',
+               status: int = 0, last_seen: float = 0.0):
+        offset = self._offset(device_id)
+        if offset is None:
+            if device_id not in self._overflow:
+                # Other processes will see this device as never polled until the table is enlarged
+                self._overflow.add(device_id)
+                logger.error(f"Device {device_id} does not fit the {self.slots}-slot device state table; "
+                             f"raise DEVICE_STATE_SLOTS above {device_id}")
+            return
+        with self._lock:
+            seq = _SEQ.unpack_from(self._mm, offset)[0]
+            _SEQ.pack_into(self._mm, offset, seq + 1)
+            _BODY.pack_into(self._mm, offset + _SEQ.size, device_id, kind, flags, updated, weight, gross, net,
+                            tare, unit.encode('ascii', errors='ignore')[:8], status, last_seen)
+            _SEQ.pack_into(self._mm, offset, seq + 2)
+
+    def write_scale(self, device_id: int, snapshot: dict, connected: bool = True):
+        """Publish a ScaleMonitor snapshot"""
+        flags = FLAG_CONNECTED if connected else 0
+        if snapshot.get('stable'):
+            flags |= FLAG_STABLE
+        if snapshot.get('indicator_stable'):
+            flags |= FLAG_INDICATOR_STABLE
+        if snapshot.get('motion'):
+            flags |= FLAG_MOTION
+        if snapshot.get('overload'):
+            flags |= FLAG_OVERLOAD
+        self._write(device_id, KIND_SCALE, flags, snapshot['timestamp'], snapshot['weight'],
+                    snapshot.get('gross', snapshot['weight']), snapshot.get('net', snapshot['weight']),
+                    snapshot.get('tare', 0.0), snapshot.get('unit', ''), last_seen=snapshot['timestamp'])
+
+    def write_status(self, device_id: int, kind: int, connected: bool, status: int = 0,
+                     last_seen: Optional[float] = None):
+        """Publish printer or camera health; status bits are defined by the device's monitor"""
+        now = time.time()
+        self._write(device_id, kind, FLAG_CONNECTED if connected else 0, now, status=status,
+                    last_seen=last_seen if last_seen is not None else (now if connected else 0.0))
+
+    def clear(self, device_id: int):
+        """Mark a slot empty, e.g. when its device is removed"""
+        self._write(device_id, KIND_EMPTY, 0, time.time())
+
+    def seq(self, device_id: int) -> int:
+        """Current sequence number of a slot; changes on every write"""
+        offset = self._offset(device_id)
+        return _SEQ.unpack_from(self._mm, offset)[0] if offset is not None else 0
+
+    def read(self, device_id: int) -> Optional[dict]:
+        """Consistent copy of a slot, or None if it has never been written"""
+        offset = self._offset(device_id)
+        if offset is None:
+            return None
+
+        while True:
+            before = _SEQ.unpack_from(self._mm, offset)[0]
+            if before & 1:
+                # Writer is mid-update; it finishes in microseconds
+                time.sleep(0)
+                continue
+            fields = _BODY.unpack_from(self._mm, offset + _SEQ.size)
+            if _SEQ.unpack_from(self._mm, offset)[0] == before:
+                break
+
+        slot_id, kind, flags, updated, weight, gross, net, tare, unit, status, last_seen = fields
+        if kind == KIND_EMPTY or slot_id != device_id:
+            return None
+        return {
+            'kind': kind,
+            'connected': bool(flags & FLAG_CONNECTED),
+            'stable': bool(flags & FLAG_STABLE),
+            'indicator_stable': bool(flags & FLAG_INDICATOR_STABLE),
+            'motion': bool(flags & FLAG_MOTION),
+            'overload': bool(flags & FLAG_OVERLOAD),
+            'updated': updated,
+            'weight': weight,
+            'gross': gross,
+            'net': net,
+            'tare': tare,
+            'unit': unit.rstrip(b'\x00').decode('ascii'),
+            'status': status,
+            'last_seen': last_seen
+        }
+
+    @property
+    def generation(self) -> int:
+        """Device configuration generation, bumped by any process after an admin edit"""
+        return struct.unpack_from('<Q', self._mm, _GENERATION_OFFSET)[0]
+
+    def bump_generation(self) -> int:
+        """Signal every process that device configuration changed"""
+        with self._lock:
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                generation = self.generation + 1
+                struct.pack_into('<Q', self._mm, _GENERATION_OFFSET, generation)
+            finally:
+                fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN)
+        return generation
+
+    @property
+    def commands_posted(self) -> int:
+        """Total commands ever posted; the owner processes up to this count"""
+        return struct.unpack_from('<Q', self._mm, _COMMANDS_OFFSET)[0]
+
+    def _write_command(self, index: int, device_id: int, command: int, state: int, nonce: int,
+                       posted: float, finished: float = 0.0, code: int = RESULT_OK, value: float = 0.0):
+        offset = self._mailbox_offset + index * COMMAND_SIZE
+        seq = _SEQ.unpack_from(self._mm, offset)[0]
+        _SEQ.pack_into(self._mm, offset, seq + 1)
+        _COMMAND.pack_into(self._mm, offset + _SEQ.size, device_id, command, state, code, nonce, posted,
+                           finished, value)
+        _SEQ.pack_into(self._mm, offset, seq + 2)
+
+    def post_command(self, device_id: int, command: int) -> tuple:
+        """Queue a command for the owner; returns (index, nonce) identifying it"""
+        nonce = random.getrandbits(63) or 1
+        # lockf only excludes other processes; the thread lock keeps this process's threads off the same index
+        with self._lock:
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                posted = self.commands_posted
+                index = posted % MAILBOX_SIZE
+                self._write_command(index, device_id, command, COMMAND_PENDING, nonce, time.time())
+                struct.pack_into('<Q', self._mm, _COMMANDS_OFFSET, posted + 1)
+            finally:
+                fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN)
+        return index, nonce
+
+    def read_command(self, index: int) -> Optional[dict]:
+        """Consistent copy of a mailbox record"""
+        if not 0 <= index < MAILBOX_SIZE:
+            return None
+        offset = self._mailbox_offset + index * COMMAND_SIZE
+        while True:
+            before = _SEQ.unpack_from(self._mm, offset)[0]
+            if before & 1:
+                time.sleep(0)
+                continue
+            fields = _COMMAND.unpack_from(self._mm, offset + _SEQ.size)
+            if _SEQ.unpack_from(self._mm, offset)[0] == before:
+                break
+
+        device_id, command, state, code, nonce, posted, finished, value = fields
+        return {'device_id': device_id, 'command': command, 'state': state, 'code': code, 'nonce': nonce,
+                'posted': posted, 'finished': finished, 'value': value}
+
+    def update_command(self, index: int, nonce: int, state: int, code: int = RESULT_OK,
+                       value: float = 0.0) -> bool:
+        """Record a command's progress; False if the record was reused for a newer command"""
+        with self._lock:
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                record = self.read_command(index)
+                if not record or record['nonce'] != nonce:
+                    return False
+                finished = time.time() if state in (COMMAND_DONE, COMMAND_FAILED) else 0.0
+                self._write_command(index, record['device_id'], record['command'], state, nonce,
+                                    record['posted'], finished, code, value)
+                return True
+            finally:
+                fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN)
+
+    def close(self):
+        if self._mm:
+            self._mm.close()
+            self._mm = None
+        if self._file:
+            self._file.close()
+            self._file = None
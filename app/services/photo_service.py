@@ -4,21 +4,35 @@ from datetime import datetime
 from werkzeug.utils import secure_filename
 from flask import current_app
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+def _bayer(size):
+    """Bayer threshold matrix scaled to 0..1"""
+    matrix = np.zeros((1, 1))
+    while matrix.shape[0] < size:
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return (matrix + 0.5) / matrix.size
+
+_BAYER_8X8 = _bayer(8)
+
 class PhotoService:
     """Service for handling customer photo uploads and storage"""
     
     UPLOAD_FOLDER = '/var/www/scrapyard/uploads/customer_photos'
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif'}
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+    LOGO_FOLDER = '/var/www/scrapyard/uploads/logos'
+    
+    # Printable width of 80mm receipt paper at 203 dpi
+    LOGO_DOTS = 576
     
     @classmethod
     def init_upload_directory(cls):
         """Check if upload directories exist (created by setup.sh)"""
         try:
-            if os.path.exists(cls.UPLOAD_FOLDER) and os.path.exists('/var/www/scrapyard/uploads/logos'):
+            if os.path.exists(cls.UPLOAD_FOLDER) and os.path.exists(cls.LOGO_FOLDER):
                 logger.info(f"Upload directories found")
                 return True
             else:
@@ -90,7 +104,7 @@ class PhotoService:
             return {'success': False, 'error': 'Only JPG files allowed'}
         
         # Use dedicated logos directory with proper permissions
-        logo_dir = '/var/www/scrapyard/uploads/logos'
+        logo_dir = cls.LOGO_FOLDER
         
         if not os.path.exists(logo_dir):
             logger.error(f"Logo directory not found: {logo_dir}")
@@ -105,11 +119,51 @@ class PhotoService:
         try:
             file.save(filepath)
             os.chmod(filepath, 0o600)
-            logger.info(f"Saved receipt logo: {filename}")
-            return {'success': True, 'filename': filename}
         except Exception as e:
             logger.error(f"Failed to save logo: {e}")
             return {'success': False, 'error': 'Failed to save logo'}
+        
+        # Convert once here so printing the logo is a plain byte copy
+        if not cls.rasterize_logo(safe_filename):
+            os.remove(filepath)
+            return {'success': False, 'error': 'Logo image could not be read'}
+        
+        logger.info(f"Saved receipt logo: {filename}")
+        return {'success': True, 'filename': filename}
+    
+    @classmethod
+    def logo_raster_path(cls, filename):
+        """Path of the printer-ready raster cached next to a logo JPEG"""
+        return os.path.join(cls.LOGO_FOLDER, secure_filename(os.path.splitext(filename)[0] + '.bin'))
+    
+    @classmethod
+    def rasterize_logo(cls, filename):
+        """Dither a logo to 1-bit at the printer's dot width and cache its raster command bytes"""
+        from PIL import Image, ImageOps
+        from app.hardware.escpos import raster
+        
+        try:
+            with Image.open(os.path.join(cls.LOGO_FOLDER, secure_filename(filename))) as image:
+                image = ImageOps.exif_transpose(image).convert('L')
+            if image.width > cls.LOGO_DOTS:
+                height = max(1, round(image.height * cls.LOGO_DOTS / image.width))
+                image = image.resize((cls.LOGO_DOTS, height), Image.LANCZOS)
+            
+            # Ordered dither: a pixel prints where it is darker than the tiled Bayer threshold
+            pixels = np.asarray(image, dtype=np.float32) / 255.0
+            rows, cols = pixels.shape
+            thresholds = np.tile(_BAYER_8X8, (rows // 8 + 1, cols // 8 + 1))[:rows, :cols]
+            data = raster(pixels < thresholds)
+            
+            raster_path = cls.logo_raster_path(filename)
+            with open(raster_path, 'wb') as f:
+                f.write(data)
+            os.chmod(raster_path, 0o600)
+            logger.info(f"Rasterized receipt logo: {cols}x{rows} dots, {len(data)} bytes")
+            return raster_path
+        except Exception as e:
+            logger.error(f"Failed to rasterize logo: {str(e)[:100]}")
+            return None
     
     @classmethod
     def delete_photo(cls, relative_path):
@@ -0,0 +1,496 @@
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from app.hardware.star_printer import StarMicronicsPrinter
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_PRINTING = 'printing'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class PrinterWorker:
+    """Single thread that owns one printer's connection and prints its jobs in order"""
+
+    def __init__(self, ip: str, port: int = 9100):
+        self.ip = ip
+        self.port = port
+        self.printer = StarMicronicsPrinter(ip, port)
+        self.queue = queue.Queue()
+        self.busy = False
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f'printer-{ip}:{port}')
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                job = self.queue.get(timeout=PrintSpooler.IDLE_TIMEOUT)
+            except queue.Empty:
+                # Free the printer's single 9100 session for other clients while idle
+                if self.printer.connected:
+                    self.printer.disconnect()
+                continue
+            if job is None:
+                break
+            self.busy = True
+            try:
+                self._print(job)
+            finally:
+                self.busy = False
+        self.printer.disconnect()
+
+    @property
+    def load(self) -> int:
+        """Jobs waiting for or being sent to this printer"""
+        return self.queue.qsize() + (1 if self.busy else 0)
+
+    def _print(self, job: dict):
+        from app.services.printer_monitor import PrinterMonitor
+        delay = PrintSpooler.RETRY_DELAY
+        while self.running:
+            # A printer out of paper or with its cover open takes the bytes but prints nothing
+            status = PrinterMonitor.status(job['device_id'])
+            if status and status['connected'] and not status['ready']:
+                problem = f"Printer {self.ip} not ready: {status['status'].replace('_', ' ')}"
+                if PrintSpooler._reroute(job, self.ip, problem):
+                    self._evacuate(problem)
+                    return
+                # Held rather than failed: it prints once someone loads paper or closes the cover,
+                # and waiting costs no attempt
+                held = f'{problem}, held'
+                if job['error'] != held:
+                    job['state'] = JOB_QUEUED
+                    job['error'] = held
+                    PrintSpooler._journal(job['id'], state=JOB_QUEUED, error=held)
+                    logger.warning(f"Print job {job['id']} held: {problem}")
+                time.sleep(PrintSpooler.HOLD_INTERVAL)
+                continue
+
+            job['state'] = JOB_PRINTING
+            job['attempts'] += 1
+            job['started'] = time.time()
+            PrintSpooler._journal(job['id'], state=JOB_PRINTING, attempts=job['attempts'])
+
+            if self.printer.send(job['payload']):
+                PrintSpooler._finish(job, JOB_DONE)
+                return
+            problem = f'Printer {self.ip} unreachable'
+
+            if job['attempts'] >= PrintSpooler.MAX_ATTEMPTS:
+                PrintSpooler._finish(job, JOB_FAILED, problem)
+                return
+
+            # In a pool, hand this job and everything queued behind it to a healthy printer
+            if PrintSpooler._reroute(job, self.ip, problem):
+                self._evacuate(problem)
+                return
+
+            # Later jobs wait behind this one so receipts never come out of order
+            job['state'] = JOB_QUEUED
+            job['error'] = f'{problem}, retrying'
+            PrintSpooler._journal(job['id'], state=JOB_QUEUED, error=job['error'])
+            logger.warning(f"Print job {job['id']} attempt {job['attempts']} failed, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, PrintSpooler.MAX_RETRY_DELAY)
+
+    def _evacuate(self, problem: str):
+        """Move queued jobs that have another printer in their pool; the rest stay in order"""
+        staying = []
+        while True:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                staying.append(job)
+                break
+            if not PrintSpooler._reroute(job, self.ip, problem):
+                staying.append(job)
+        for job in staying:
+            self.queue.put(job)
+
+    def stop(self):
+        self.running = False
+        self.queue.put(None)
+
+class PrintSpooler:
+    """Background print queue with one worker and one kept-alive connection per printer.
+
+    submit() queues a job and returns its id straight away; the printer's
+    worker sends each job in a single write over a connection it keeps open
+    between jobs, reconnecting when the printer dropped it. Failed sends are
+    retried with backoff before the job is marked failed. While the
+    PrinterMonitor reports the printer out of paper or otherwise not ready,
+    the job is held without using up attempts. Callers poll
+    status() with the job id.
+
+    A printer with a printer_pool shares its jobs with the pool's other
+    active printers: each job goes to the least-loaded printer that the
+    PrinterMonitor does not report as offline, out of paper or open, and a
+    printer that fails a job hands that job and the rest of its queue to
+    another printer in the pool.
+
+    Once start() has been called every job is journaled to the print_jobs
+    table before it is queued, claimed by this process's pid and a token
+    drawn at start(), since a restarted daemon can come back with the same
+    pid. Jobs left queued by a process that died, including an earlier
+    process with this pid, are claimed by a live one and replayed oldest
+    first, and a job id that is already journaled is never queued
+    twice, so a retried request cannot print the same receipt again.
+    """
+
+    # Raw print port on Star/ESC-POS network printers
+    PORT = 9100
+
+    # Attempts per job before it is reported failed
+    MAX_ATTEMPTS = 5
+
+    # Seconds before the first retry; doubles up to MAX_RETRY_DELAY
+    RETRY_DELAY = 1.0
+    MAX_RETRY_DELAY = 30.0
+
+    # Seconds between status checks while a job is held for paper or an open cover
+    HOLD_INTERVAL = 2.0
+
+    # Seconds without jobs before a worker closes its printer connection
+    IDLE_TIMEOUT = 30.0
+
+    # Seconds between sweeps for jobs orphaned by dead processes
+    RECOVER_INTERVAL = 30.0
+
+    # Days finished jobs stay in the journal
+    RETENTION_DAYS = 7
+
+    _app = None
+    _token = None
+    _workers = {}
+    _jobs = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, config):
+        """Load retry and connection settings from the Flask config"""
+        cls.MAX_ATTEMPTS = config.get('PRINT_MAX_ATTEMPTS', cls.MAX_ATTEMPTS)
+        cls.RETRY_DELAY = config.get('PRINT_RETRY_DELAY', cls.RETRY_DELAY)
+        cls.IDLE_TIMEOUT = config.get('PRINT_IDLE_TIMEOUT', cls.IDLE_TIMEOUT)
+        cls.RECOVER_INTERVAL = config.get('PRINT_RECOVER_INTERVAL', cls.RECOVER_INTERVAL)
+        cls.RETENTION_DAYS = config.get('PRINT_JOB_RETENTION_DAYS', cls.RETENTION_DAYS)
+
+    @classmethod
+    def start(cls, app):
+        """Journal jobs in the app's database and keep adopting jobs orphaned by dead processes"""
+        cls._app = app
+        # A pid alone is not a process identity once the daemon restarts
+        cls._token = uuid.uuid4().hex
+        threading.Thread(target=cls._recover_loop, daemon=True, name='print-recovery').start()
+
+    @classmethod
+    def submit(cls, device, payload: bytes, kind: str = 'receipt', job_id: str = None, count: int = 1) -> str:
+        """Queue raw printer bytes for a printer Device and return the job id.
+
+        A caller-supplied job_id makes the request idempotent: submitting the
+        same id again returns it without printing a second copy. count is the
+        number of receipts or labels in the payload, used to report throughput.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        if job_id in cls._jobs:
+            return job_id
+
+        candidates = cls._candidates(device)
+        device_id, printer_ip = cls._pick(candidates) or candidates[0]
+
+        if cls._app:
+            from sqlalchemy.exc import IntegrityError
+            from app import db
+            from app.models.print_job import PrintJob
+            try:
+                db.session.add(PrintJob(id=job_id, device_id=device_id, printer_ip=printer_ip, kind=kind,
+                                        payload=payload, state=JOB_QUEUED, **cls._claim()))
+                db.session.commit()
+            except IntegrityError:
+                # Already journaled by an earlier request, possibly in another process
+                db.session.rollback()
+                return job_id
+
+        cls._enqueue({
+            'id': job_id,
+            'device_id': device_id,
+            'printer_ip': printer_ip,
+            'candidates': candidates,
+            'kind': kind,
+            'payload': payload,
+            'state': JOB_QUEUED,
+            'attempts': 0,
+            'error': None,
+            'count': count,
+            'created': time.time(),
+            'started': None,
+            'finished': None
+        })
+        logger.info(f"Queued {kind} job {job_id} for printer {device_id}")
+        return job_id
+
+    @classmethod
+    def _candidates(cls, device) -> list:
+        """(device id, ip) of every printer that may take a job addressed to device"""
+        if not getattr(device, 'printer_pool', None):
+            return [(device.id, device.ip_address)]
+        from app.services.device_resolver import DeviceResolver
+        return [(printer.id, printer.ip_address) for printer in DeviceResolver.pool(device) if printer.ip_address]
+
+    @classmethod
+    def _pick(cls, candidates: list, exclude: str = None) -> Optional[tuple]:
+        """Least-loaded candidate not known to be unable to print; first candidate wins ties"""
+        from app.services.printer_monitor import PrinterMonitor
+        best, best_load = None, None
+        for device_id, printer_ip in candidates:
+            if printer_ip == exclude:
+                continue
+            status = PrinterMonitor.status(device_id)
+            if status is not None and not status['ready']:
+                continue
+            worker = cls._workers.get((printer_ip, cls.PORT))
+            load = worker.load if worker else 0
+            if best is None or load < best_load:
+                best, best_load = (device_id, printer_ip), load
+        return best
+
+    @classmethod
+    def _reroute(cls, job: dict, failed_ip: str, problem: str) -> bool:
+        """Move a job off a failing printer to another in its pool; False if there is none to take it"""
+        if len(job.get('candidates') or ()) < 2:
+            return False
+        target = cls._pick(job['candidates'], exclude=failed_ip)
+        if target is None:
+            return False
+
+        job['device_id'], job['printer_ip'] = target
+        job['state'] = JOB_QUEUED
+        job['error'] = f'{problem}, moved to printer {target[0]}'
+        cls._journal(job['id'], device_id=target[0], printer_ip=target[1], state=JOB_QUEUED, error=job['error'])
+        logger.warning(f"Print job {job['id']} moved from {failed_ip} to printer {target[0]}: {problem}")
+        cls._enqueue(job)
+        return True
+
+    @classmethod
+    def _enqueue(cls, job: dict):
+        with cls._lock:
+            # Keep finished jobs long enough for the page that printed them to poll
+            cutoff = time.time() - 300
+            for stale in [key for key, old in cls._jobs.items() if old['finished'] and old['finished'] < cutoff]:
+                del cls._jobs[stale]
+            cls._jobs[job['id']] = job
+
+            key = (job['printer_ip'], cls.PORT)
+            worker = cls._workers.get(key)
+            if worker is None:
+                worker = cls._workers[key] = PrinterWorker(*key)
+            worker.queue.put(job)
+
+    @classmethod
+    def open_drawer(cls, device) -> bool:
+        """Pulse the drawer wired to this printer now; never pooled, journaled or retried"""
+        shared = cls.connection(device.ip_address)
+        printer = shared or StarMicronicsPrinter(device.ip_address, cls.PORT)
+        try:
+            return printer.open_cash_drawer()
+        finally:
+            if not shared:
+                printer.disconnect()
+
+    @classmethod
+    def connection(cls, printer_ip: str) -> Optional[StarMicronicsPrinter]:
+        """The printer connection this process's worker keeps for printer_ip, if it has one"""
+        worker = cls._workers.get((printer_ip, cls.PORT))
+        return worker.printer if worker else None
+
+    @classmethod
+    def _journal(cls, job_id: str, **fields):
+        """Record a job's progress; the in-memory job stays authoritative if the database is unavailable"""
+        if not cls._app:
+            return
+        from app import db
+        from app.models.print_job import PrintJob
+        try:
+            with cls._app.app_context():
+                PrintJob.query.filter_by(id=job_id).update(fields, synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Print journal update failed for {job_id}: {str(e)[:100]}")
+
+    @classmethod
+    def _finish(cls, job: dict, state: str, error: str = None):
+        job['state'] = state
+        job['error'] = error
+        job['finished'] = time.time()
+        fields = {'state': state, 'error': error, 'attempts': job['attempts'], 'finished_at': datetime.utcnow()}
+        if state == JOB_DONE:
+            # The bytes are no longer needed; failed jobs keep theirs so they can be retried
+            job['payload'] = None
+            fields['payload'] = None
+            logger.info(f"Print job {job['id']} done after {job['attempts']} attempt(s)")
+        else:
+            logger.error(f"Print job {job['id']} failed: {error}")
+        cls._journal(job['id'], **fields)
+
+    @classmethod
+    def retry(cls, job_id: str) -> bool:
+        """Queue a failed job again, e.g. after the paper was replaced"""
+        job = cls._jobs.get(job_id)
+        if job and job['state'] == JOB_FAILED:
+            job.update(state=JOB_QUEUED, attempts=0, error=None, started=None, finished=None)
+            cls._journal(job_id, state=JOB_QUEUED, attempts=0, error=None, finished_at=None, **cls._claim())
+            cls._enqueue(job)
+            return True
+
+        if not cls._app:
+            return False
+        from app import db
+        from app.models.print_job import PrintJob
+        claimed = PrintJob.query.filter_by(id=job_id, state=JOB_FAILED).update(
+            {'state': JOB_QUEUED, 'attempts': 0, 'error': None, 'finished_at': None, **cls._claim()},
+            synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return False
+        cls._enqueue(cls._job_from_row(PrintJob.query.get(job_id)))
+        return True
+
+    @classmethod
+    def _claim(cls) -> dict:
+        """Journal columns marking a job as held by this process"""
+        return {'claimed_by': os.getpid(), 'claim_token': cls._token}
+
+    @classmethod
+    def recover(cls) -> int:
+        """Adopt queued jobs whose process died and replay them oldest first; returns how many"""
+        from app import db
+        from app.models.print_job import PrintJob
+        adopted = 0
+
+        rows = (PrintJob.query.filter(PrintJob.state.in_((JOB_QUEUED, JOB_PRINTING)))
+                .order_by(PrintJob.created_at).all())
+        for row in rows:
+            if row.claim_token == cls._token:
+                continue
+            # This pid with another token was an earlier process, restarted since; its jobs are orphans
+            if row.claimed_by != os.getpid() and _process_alive(row.claimed_by):
+                continue
+            # Compare-and-set on the old owner so only one surviving process replays the job
+            claimed = PrintJob.query.filter_by(id=row.id, claimed_by=row.claimed_by,
+                                               claim_token=row.claim_token).update(
+                {**cls._claim(), 'state': JOB_QUEUED}, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                cls._enqueue(cls._job_from_row(row))
+                adopted += 1
+
+        cutoff = datetime.utcnow() - timedelta(days=cls.RETENTION_DAYS)
+        PrintJob.query.filter(PrintJob.state == JOB_DONE, PrintJob.finished_at < cutoff).delete(
+            synchronize_session=False)
+        db.session.commit()
+
+        if adopted:
+            logger.info(f"Replaying {adopted} print job(s) left by stopped processes")
+        return adopted
+
+    @classmethod
+    def _recover_loop(cls):
+        while True:
+            try:
+                with cls._app.app_context():
+                    cls.recover()
+            except Exception as e:
+                logger.error(f"Print job recovery failed: {str(e)[:100]}")
+            time.sleep(cls.RECOVER_INTERVAL)
+
+    @classmethod
+    def _job_from_row(cls, row) -> dict:
+        from app.services.device_resolver import DeviceResolver
+        device = DeviceResolver.get(row.device_id)
+        candidates = cls._candidates(device) if device else [(row.device_id, row.printer_ip)]
+        return {
+            'id': row.id,
+            'device_id': row.device_id,
+            'printer_ip': row.printer_ip,
+            'candidates': candidates,
+            'kind': row.kind,
+            'payload': row.payload,
+            'state': JOB_QUEUED,
+            'attempts': 0,
+            'error': None,
+            'count': None,
+            'created': row.created_at.replace(tzinfo=timezone.utc).timestamp() if row.created_at else time.time(),
+            'started': None,
+            'finished': None
+        }
+
+    @classmethod
+    def status(cls, job_id: str) -> Optional[dict]:
+        """Current state of a print job, or None if the id is unknown"""
+        job = cls._jobs.get(job_id)
+        if job is None:
+            return cls._journal_status(job_id)
+        status = {
+            'job_id': job['id'],
+            'device_id': job['device_id'],
+            'kind': job['kind'],
+            'status': job['state'],
+            'success': job['state'] == JOB_DONE,
+            'attempts': job['attempts'],
+            'error': job['error'],
+            'elapsed': round((job['finished'] or time.time()) - job['created'], 3)
+        }
+        if job['count']:
+            status['count'] = job['count']
+            if job['state'] == JOB_DONE:
+                # Time of the successful attempt's write, not time spent waiting in the queue
+                seconds = max(job['finished'] - job['started'], 1e-6)
+                status[f"{job['kind']}s_per_second"] = round(job['count'] / seconds, 1)
+        return status
+
+    @classmethod
+    def _journal_status(cls, job_id: str) -> Optional[dict]:
+        """Status of a job spooled by another process or before a restart"""
+        if not cls._app:
+            return None
+        from app.models.print_job import PrintJob
+        row = PrintJob.query.get(job_id)
+        if row is None:
+            return None
+        return {
+            'job_id': row.id,
+            'device_id': row.device_id,
+            'kind': row.kind,
+            'status': row.state,
+            'success': row.state == JOB_DONE,
+            'attempts': row.attempts,
+            'error': row.error,
+            'elapsed': round(((row.finished_at or datetime.utcnow()) - row.created_at).total_seconds(), 3)
+        }
+
+    @classmethod
+    def stop_all(cls):
+        """Stop every printer worker and close its connection"""
+        with cls._lock:
+            workers, cls._workers = list(cls._workers.values()), {}
+        for worker in workers:
+            worker.stop()
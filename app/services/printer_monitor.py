@@ -0,0 +1,179 @@
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Optional
+from app.hardware.star_printer import StarMicronicsPrinter
+from app.services.device_state import KIND_PRINTER
+
+logger = logging.getLogger(__name__)
+
+# Printer status bits stored in the device state slot
+STATUS_OFFLINE = 0x01
+STATUS_PAPER_LOW = 0x02
+STATUS_PAPER_OUT = 0x04
+STATUS_COVER_OPEN = 0x08
+STATUS_DRAWER_OPEN = 0x10
+STATUS_ERROR = 0x20
+STATUS_UNKNOWN = 0x40
+
+# Conditions under which a job sent now would not come out of the printer
+STATUS_NOT_READY = STATUS_OFFLINE | STATUS_PAPER_OUT | STATUS_COVER_OPEN | STATUS_ERROR
+
+def _status_bits(status: dict) -> int:
+    if not status['known']:
+        return STATUS_UNKNOWN
+    bits = 0
+    if not status['online']:
+        bits |= STATUS_OFFLINE
+    if status['paper'] == 'low':
+        bits |= STATUS_PAPER_LOW
+    elif status['paper'] == 'out':
+        bits |= STATUS_PAPER_OUT
+    if status['cover_open']:
+        bits |= STATUS_COVER_OPEN
+    if status['drawer_open']:
+        bits |= STATUS_DRAWER_OPEN
+    if status['error']:
+        bits |= STATUS_ERROR
+    return bits
+
+class PrinterMonitor:
+    """Background poller that caches every active printer's real-time status.
+
+    The hardware owner queries each printer with DLE EOT (ESC v on printers
+    without real-time status) every INTERVAL seconds and publishes the
+    decoded paper, cover and drawer state to the shared device state table,
+    bumping Device.last_seen whenever the printer answers. Pages and the
+    print spooler read status() from the table instead of opening a socket
+    to the printer themselves.
+
+    A printer that this process is already spooling to is queried over the
+    spooler's kept-alive connection, since most printers serve one 9100
+    session at a time.
+    """
+
+    # Seconds between status polls of each printer
+    INTERVAL = 10.0
+
+    _app = None
+    _thread = None
+    _latest = {}
+
+    @classmethod
+    def configure(cls, config):
+        """Load the poll interval from the Flask config"""
+        cls.INTERVAL = config.get('PRINTER_STATUS_INTERVAL', cls.INTERVAL)
+
+    @classmethod
+    def start(cls, app):
+        """Start polling; called by the hardware owner only"""
+        cls._app = app
+        if cls._thread and cls._thread.is_alive():
+            return
+        cls._thread = threading.Thread(target=cls._run, daemon=True, name='printer-status')
+        cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            started = time.monotonic()
+            try:
+                with cls._app.app_context():
+                    cls.poll()
+            except Exception as e:
+                logger.error(f"Printer status poll failed: {str(e)[:100]}")
+            time.sleep(max(0.0, cls.INTERVAL - (time.monotonic() - started)))
+
+    @classmethod
+    def poll(cls):
+        """Query every active printer once and publish the results"""
+        from app import db
+        from app.models.device import Device
+        from app.services.print_spooler import PrintSpooler
+
+        printers = Device.query.filter_by(device_type='printer', is_active=True).all()
+        seen = []
+        for device in printers:
+            if not device.ip_address:
+                continue
+            shared = PrintSpooler.connection(device.ip_address)
+            printer = shared or StarMicronicsPrinter(device.ip_address, PrintSpooler.PORT)
+            status = printer.query_status()
+            if not shared:
+                # Leave the printer's only session free for the spooler between polls
+                printer.disconnect()
+
+            cls._publish(device.id, status)
+            if status is not None:
+                seen.append(device.id)
+
+        if seen:
+            Device.query.filter(Device.id.in_(seen)).update({'last_seen': datetime.utcnow()},
+                                                            synchronize_session=False)
+            db.session.commit()
+
+    @classmethod
+    def _publish(cls, device_id: int, status: Optional[dict]):
+        from app.services.startup_service import get_state_table
+        now = time.time()
+        connected = status is not None
+        bits = _status_bits(status) if connected else 0
+        previous = cls._latest.get(device_id)
+        last_seen = now if connected else (previous['last_seen'] if previous else 0.0)
+        cls._latest[device_id] = {'connected': connected, 'status': bits, 'updated': now, 'last_seen': last_seen}
+
+        table = get_state_table()
+        if table:
+            table.write_status(device_id, KIND_PRINTER, connected, bits, last_seen)
+
+        if previous is None or previous['connected'] != connected or previous['status'] != bits:
+            logger.info(f"Printer {device_id} status: {cls.describe(connected, bits)}")
+
+    @classmethod
+    def status(cls, device_id: int) -> Optional[dict]:
+        """Cached status of a printer, or None if it has not been polled recently"""
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+        cached = table.read(device_id) if table else cls._latest.get(device_id)
+        if not cached or cached.get('kind', KIND_PRINTER) != KIND_PRINTER:
+            return None
+        # Older than a few polls means the owner stopped polling; don't report it as current
+        if time.time() - cached['updated'] > cls.INTERVAL * 3:
+            return None
+
+        bits = cached['status']
+        connected = cached['connected']
+        if bits & STATUS_PAPER_OUT:
+            paper = 'out'
+        elif bits & STATUS_PAPER_LOW:
+            paper = 'low'
+        else:
+            paper = 'unknown' if bits & STATUS_UNKNOWN or not connected else 'ok'
+        return {
+            'connected': connected,
+            'ready': connected and not bits & STATUS_NOT_READY,
+            'status': cls.describe(connected, bits),
+            'paper': paper,
+            'cover_open': bool(bits & STATUS_COVER_OPEN),
+            'drawer_open': bool(bits & STATUS_DRAWER_OPEN),
+            'error': bool(bits & STATUS_ERROR),
+            'last_seen': cached['last_seen'] or None,
+            'updated': cached['updated']
+        }
+
+    @staticmethod
+    def describe(connected: bool, bits: int) -> str:
+        if not connected:
+            return 'disconnected'
+        if bits & STATUS_COVER_OPEN:
+            return 'cover_open'
+        if bits & STATUS_PAPER_OUT:
+            return 'paper_out'
+        if bits & (STATUS_OFFLINE | STATUS_ERROR):
+            return 'error'
+        if bits & STATUS_UNKNOWN:
+            return 'unknown'
+        if bits & STATUS_PAPER_LOW:
+            return 'paper_low'
+        return 'ready'
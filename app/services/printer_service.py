@@ -1,116 +1,39 @@
-import socket
 import logging
-from datetime import datetime
-from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 class StarPrinterService:
-    """Service for Star Micronics thermal label printers"""
+    """Connection test for Star Micronics printers.
+
+    Receipts, labels and the cash drawer go through PrintSpooler, which
+    keeps one connection per printer and renders receipts with
+    ReceiptRenderer; this service only reports whether a printer answers.
+    """
     
     def __init__(self, ip_address: str, port: int = 9100):
         self.ip_address = ip_address
         self.port = port
         
-    def print_receipt(self, content: str, printer_model: str = "TSP143III") -> bool:
-        """Print receipt content to Star Micronics printer"""
-        try:
-            # Connect to printer
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.ip_address, self.port))
-            
-            # Star printer ESC/POS commands
-            commands = []
-            
-            # Initialize printer
-            commands.append(b'\x1B\x40')  # ESC @ - Initialize
-            
-            # Set font and alignment
-            commands.append(b'\x1B\x61\x01')  # ESC a 1 - Center align
-            commands.append(b'\x1B\x21\x08')  # ESC ! 8 - Double height
-            
-            # Print header
-            commands.append(b'SCRAP YARD RECEIPT\n\n')
-            
-            # Reset to normal
-            commands.append(b'\x1B\x21\x00')  # ESC ! 0 - Normal
-            commands.append(b'\x1B\x61\x00')  # ESC a 0 - Left align
-            
-            # Print content
-            commands.append(content.encode('utf-8'))
-            commands.append(b'\n\n')
-            
-            # Cut paper (if supported)
-            if printer_model in ["TSP143III", "TSP654II"]:
-                commands.append(b'\x1D\x56\x41')  # GS V A - Full cut
-            
-            # Send all commands
-            for cmd in commands:
-                sock.send(cmd)
-            
-            try:
-                sock.shutdown(socket.SHUT_RDWR)
-            except:
-                pass
-            sock.close()
-            logger.info("Receipt printed successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Print error: {e}")
-            return False
-    
-    def print_label(self, material: str, weight: float, price: float, customer: str) -> bool:
-        """Print scrap metal label"""
-        content = f"""
-Material: {material}
-Weight: {weight:.2f} lbs
-Price: ${price:.2f}
-Customer: {customer}
-Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}
-        """.strip()
-        
-        return self.print_receipt(content)
-    
-    def open_cash_drawer(self) -> bool:
-        """Open cash drawer connected to printer"""
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect((self.ip_address, self.port))
-            
-            # ESC/POS command to open cash drawer
-            sock.send(b'\x1b\x70\x00\x32\xfa')
-            
-            try:
-                sock.shutdown(socket.SHUT_RDWR)
-            except:
-                pass
-            sock.close()
-            logger.info("Cash drawer opened")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Cash drawer error: {e}")
-            return False
-    
     def test_connection(self) -> dict:
-        """Test connection to printer"""
+        """Test connection to printer and report its real-time status"""
+        from app.hardware.star_printer import StarMicronicsPrinter
+        printer = StarMicronicsPrinter(self.ip_address, self.port)
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            sock.connect((self.ip_address, self.port))
-            
-            # Send status request
-            sock.send(b'\x10\x04\x01')  # DLE EOT 1 - Real-time status
-            
-            try:
-                sock.shutdown(socket.SHUT_RDWR)
-            except:
-                pass
-            sock.close()
-            return {'status': 'online', 'message': 'Printer ready'}
-            
-        except Exception as e:
-            return {'status': 'offline', 'message': str(e)}
\ No newline at end of file
+            status = printer.get_status()
+        finally:
+            printer.disconnect()
+        
+        messages = {
+            'ready': 'Printer ready',
+            'cover_open': 'Printer cover is open',
+            'paper_out': 'Printer is out of paper',
+            'error': 'Printer reports an error',
+            'unknown': 'Printer reachable but did not answer the status request'
+        }
+        if not status['connected']:
+            return {'status': 'offline', 'message': 'Printer not reachable'}
+        message = messages[status['status']]
+        if status['status'] == 'ready' and status['paper'] == 'low':
+            message = 'Printer ready, paper low'
+        return {'status': 'online' if status['status'] == 'ready' else 'warning', 'message': message,
+                'paper': status['paper'], 'drawer_open': status['drawer_open']}
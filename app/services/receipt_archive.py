@@ -0,0 +1,99 @@
+import hashlib
+import zlib
+import logging
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.receipt_copy import ReceiptCopy
+
+logger = logging.getLogger(__name__)
+
+class ReceiptArchive:
+    """Stores the exact printer bytes of each transaction's first receipt, compressed.
+
+    Archived receipts are rendered from the saved transaction, never from
+    figures posted by the page, and the first copy stored for a transaction
+    is never replaced. A reprint is one primary key read of the stored blob
+    followed by one write to the printer; nothing is reloaded or rendered
+    again, so the customer gets a byte-identical copy even if prices,
+    materials or the receipt template have changed since. The stored bytes
+    and their hash double as the audit record of what was handed over.
+    """
+
+    # zlib level; receipt streams are mostly repeated text and compress about 4:1
+    COMPRESSION_LEVEL = 6
+
+    @staticmethod
+    def transaction_id(value) -> Optional[int]:
+        """Integer transaction id from receipt data, or None for receipts not tied to a saved ticket"""
+        from app.models.transaction import Transaction
+        if isinstance(value, str) and value.isdigit():
+            value = int(value)
+        if isinstance(value, int) and not isinstance(value, bool) and 0 < value <= Transaction.MAX_ID:
+            return value
+        return None
+
+    @staticmethod
+    def saved_transaction(transaction_id: int):
+        """The transaction with its customer and priced items loaded, or None if it was never saved"""
+        from app.models.transaction import Transaction, TransactionItem
+        return (Transaction.query
+                .options(db.joinedload(Transaction.customer),
+                         db.joinedload(Transaction.items).joinedload(TransactionItem.material))
+                .filter(Transaction.id == transaction_id)
+                .one_or_none())
+
+    @staticmethod
+    def receipt_data(transaction) -> dict:
+        """Receipt renderer input built from the saved transaction"""
+        return {
+            'id': transaction.id,
+            'customer_name': transaction.customer.name if transaction.customer else 'N/A',
+            'date': transaction.created_at,
+            'items': [{
+                'metal_type': item.material.description if item.material else 'Unknown',
+                'weight': float(item.weight),
+                'price_per_lb': float(item.price_per_pound),
+                'total': float(item.total_amount)
+            } for item in transaction.items],
+            'total_weight': float(transaction.total_weight or 0),
+            'total_amount': float(transaction.total_amount or 0)
+        }
+
+    @classmethod
+    def store(cls, transaction_id: int, payload: bytes, template_id: Optional[int] = None) -> ReceiptCopy:
+        """Keep the bytes of a transaction's first receipt; a copy already stored is returned unchanged"""
+        copy = ReceiptCopy.query.get(transaction_id)
+        if copy is not None:
+            return copy
+        copy = ReceiptCopy(transaction_id=transaction_id, template_id=template_id, reprint_count=0,
+                           payload=zlib.compress(payload, cls.COMPRESSION_LEVEL), size=len(payload),
+                           sha256=hashlib.sha256(payload).hexdigest(), printed_at=datetime.utcnow())
+        db.session.add(copy)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request stored the first copy between the lookup and the insert
+            db.session.rollback()
+            copy = ReceiptCopy.query.get(transaction_id)
+        return copy
+
+    @classmethod
+    def load(cls, transaction_id: int) -> Optional[bytes]:
+        """The stored receipt bytes, or None if there are none or they fail their hash check"""
+        copy = ReceiptCopy.query.get(transaction_id)
+        if copy is None:
+            return None
+        payload = zlib.decompress(copy.payload)
+        if len(payload) != copy.size or hashlib.sha256(payload).hexdigest() != copy.sha256:
+            logger.error(f"Stored receipt for transaction {transaction_id} failed its integrity check")
+            return None
+        return payload
+
+    @classmethod
+    def record_reprint(cls, transaction_id: int):
+        ReceiptCopy.query.filter_by(transaction_id=transaction_id).update(
+            {'reprint_count': ReceiptCopy.reprint_count + 1, 'last_reprinted_at': datetime.utcnow()},
+            synchronize_session=False)
+        db.session.commit()
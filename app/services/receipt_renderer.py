@@ -0,0 +1,162 @@
+import os
+import threading
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+from app.hardware import escpos
+from app.hardware.escpos import CompiledLayout, Slot
+from app.models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Used when no receipt template has been set up in admin
+BUILTIN_TEMPLATE = SimpleNamespace(
+    id=None,
+    company_name='SCRAP RECEIPT',
+    company_address='',
+    footer_text='Thank you for your business!',
+    header_logo_path=None,
+    updated_at=None
+)
+
+class CompiledReceipt:
+    """Receipt template compiled into header, per-item and totals layouts"""
+
+    def __init__(self, head: CompiledLayout, item: CompiledLayout, tail: CompiledLayout):
+        self.head = head
+        self.item = item
+        self.tail = tail
+
+    def render(self, transaction_data: dict) -> bytearray:
+        pieces = self.head.pieces(transaction_data)
+        for item in transaction_data.get('items', []):
+            pieces += self.item.pieces(item)
+        pieces += self.tail.pieces(transaction_data)
+        return escpos.assemble(pieces)
+
+class ReceiptRenderer:
+    """Render transactions to printer bytes using the admin-managed receipt template.
+
+    Each template is compiled once into static ESC/POS segments and slots for
+    the transaction fields, and kept until the template's updated_at changes,
+    so a print only formats the variable fields into one buffer.
+    """
+
+    # Characters per line in the printer's standard font
+    COLUMNS = 32
+
+    _compiled = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def render(cls, transaction_data: dict, template=None) -> bytearray:
+        """ESC/POS bytes for a scrap receipt, ready for a single write"""
+        if template is None:
+            template = cls.default_template()
+        return cls.compiled(template).render(transaction_data)
+
+    @classmethod
+    def default_template(cls):
+        """The default active ReceiptTemplate, or the built-in layout if there is none"""
+        from flask import has_app_context
+        if not has_app_context():
+            return BUILTIN_TEMPLATE
+        from app import db
+        from app.models.receipt_template import ReceiptTemplate
+        try:
+            template = (ReceiptTemplate.query.filter_by(is_default=True, is_active=True).first()
+                        or ReceiptTemplate.query.filter_by(is_active=True).order_by(ReceiptTemplate.id).first())
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Receipt template lookup failed: {str(e)[:100]}")
+            template = None
+        return template or BUILTIN_TEMPLATE
+
+    @classmethod
+    def compiled(cls, template) -> CompiledReceipt:
+        """Compiled form of a template, recompiled only after it was edited"""
+        key = template.id
+        with cls._lock:
+            cached = cls._compiled.get(key)
+        if cached and cached[0] == template.updated_at:
+            return cached[1]
+
+        receipt = cls.compile(template)
+        with cls._lock:
+            cls._compiled[key] = (template.updated_at, receipt)
+        logger.info(f"Compiled receipt template {key or 'builtin'}")
+        return receipt
+
+    @classmethod
+    def compile(cls, template) -> CompiledReceipt:
+        width = cls.COLUMNS
+
+        head = [escpos.INIT, escpos.ALIGN_CENTER, _logo(template), escpos.DOUBLE]
+        head.append(f"{template.company_name or BUILTIN_TEMPLATE.company_name}\n")
+        head.append(escpos.NORMAL)
+        head += [f"{line.strip()}\n" for line in (template.company_address or '').splitlines() if line.strip()]
+        head.append('=' * width + '\n')
+        head.append(escpos.ALIGN_LEFT)
+        head += ['Date: ', Slot(_date), '\n']
+        head += ['Transaction: ', Slot(lambda t: str(t.get('id', 'N/A'))), '\n']
+        head += ['Customer: ', Slot(lambda t: str(t.get('customer_name', 'N/A'))), '\n']
+        head.append('-' * width + '\n')
+
+        item = [
+            Slot(lambda i: f"{i.get('metal_type', 'Unknown')}\n"),
+            Slot(lambda i: _columns(f"  {i.get('weight', 0):.2f} lbs @ ${i.get('price_per_lb', 0):.2f}/lb",
+                                    f"${i.get('total', 0):.2f}", width))
+        ]
+
+        tail = ['-' * width + '\n']
+        tail.append(Slot(lambda t: _columns('Total Weight:', f"{t.get('total_weight', 0):.2f} lbs", width)))
+        tail.append(escpos.DOUBLE_HEIGHT)
+        tail.append(Slot(lambda t: _columns('TOTAL:', f"${t.get('total_amount', 0):.2f}", width)))
+        tail.append(escpos.NORMAL)
+        tail += ['\n', escpos.ALIGN_CENTER, Slot(_ticket_barcode)]
+        tail += [f"{line.rstrip()}\n" for line in (template.footer_text or '').splitlines()]
+        tail += [escpos.feed(3), escpos.FEED_CUT]
+
+        return CompiledReceipt(CompiledLayout(head), CompiledLayout(item), CompiledLayout(tail))
+
+def _logo(template) -> bytes:
+    """Raster bytes cached when the template's logo was uploaded"""
+    if not template.header_logo_path:
+        return b''
+    from app.services.photo_service import PhotoService
+    path = PhotoService.logo_raster_path(template.header_logo_path)
+    if not os.path.exists(path):
+        # Logos uploaded before rasterizing existed are converted on first use
+        path = PhotoService.rasterize_logo(template.header_logo_path)
+        if not path:
+            return b''
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError as e:
+        logger.error(f"Failed to read logo raster: {str(e)[:100]}")
+        return b''
+
+def _ticket_barcode(transaction_data: dict) -> bytes:
+    """Code128 of the ticket code, drawn by the printer so scanning the receipt opens the ticket"""
+    transaction_id = transaction_data.get('id')
+    if transaction_id is None or transaction_id == '':
+        return b''
+    if isinstance(transaction_id, int) or str(transaction_id).isdigit():
+        code = Transaction.format_ticket_code(transaction_id)
+    else:
+        code = str(transaction_id)
+    return escpos.code128(code) + b'\n'
+
+def _date(transaction_data: dict) -> str:
+    date = transaction_data.get('date')
+    if isinstance(date, datetime):
+        return date.strftime('%m/%d/%Y %H:%M')
+    return date or datetime.now().strftime('%m/%d/%Y %H:%M')
+
+def _columns(left: str, right: str, width: int) -> str:
+    """One line with right pushed to the right margin, wrapping when both do not fit"""
+    gap = width - len(left) - len(right)
+    if gap < 1:
+        return f"{left}\n{right:>{width}}\n"
+    return f"{left}{' ' * gap}{right}\n"
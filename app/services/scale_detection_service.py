@@ -0,0 +1,291 @@
+import socket
+import threading
+import time
+import uuid
+import logging
+from typing import Optional
+from app.hardware.scale_protocols import PROTOCOLS, FRAMINGS
+from app.services.device_state import (COMMAND_DETECT, COMMAND_PENDING, COMMAND_RUNNING, COMMAND_DONE,
+                                       COMMAND_FAILED, RESULT_OK, RESULT_EXPIRED, RESULT_NO_DATA,
+                                       RESULT_NO_MATCH)
+
+logger = logging.getLogger(__name__)
+
+_STATUS = {
+    COMMAND_PENDING: 'pending',
+    COMMAND_RUNNING: 'running',
+    COMMAND_DONE: 'detected',
+    COMMAND_FAILED: 'failed'
+}
+
+_ERRORS = {
+    RESULT_NO_DATA: 'No data received from scale',
+    RESULT_NO_MATCH: 'Scale output did not match any known format',
+    RESULT_EXPIRED: 'Detection was not processed'
+}
+
+class ScaleDetectionService:
+    """Detects a scale's output format and frame terminator from sampled raw output.
+
+    Sampling needs the scale to itself, so it runs on the hardware owner,
+    which pauses the scale's reader, samples for SAMPLE_SECONDS and restarts
+    the reader with whatever was detected. request() returns an operation id
+    straight away; as with TareService, the request and its outcome travel
+    through the DeviceStateTable mailbox when shared memory is available.
+    """
+
+    SAMPLE_SECONDS = 3.0
+
+    # Scale TCP port sampled for natively connected scales
+    PORT = 8899
+
+    _operations = {}
+    _lock = threading.Lock()
+
+    # Plain numeric matches nearly any frame, so it only wins when nothing specific parses
+    SPECIFICITY = {'numeric': 0.5}
+
+    @staticmethod
+    def sample_tcp(ip_address: str, port: int, duration: float = SAMPLE_SECONDS) -> bytes:
+        """Collect raw bytes from a scale over TCP, prompting with W for demand-mode indicators"""
+        raw = bytearray()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(5)
+            sock.connect((ip_address, port))
+            sock.settimeout(0.2)
+
+            deadline = time.monotonic() + duration
+            next_prompt = 0.0
+            while time.monotonic() < deadline:
+                if time.monotonic() >= next_prompt:
+                    sock.sendall(b'W\r\n')
+                    next_prompt = time.monotonic() + 0.2
+                try:
+                    chunk = sock.recv(4096)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                raw.extend(chunk)
+        except (socket.error, OSError) as e:
+            logger.error("Error sampling scale output: %s", str(e)[:100].replace('\n', ' ').replace('\r', ' '))
+        finally:
+            sock.close()
+        return bytes(raw)
+
+    @staticmethod
+    def sample_serial(service, duration: float = SAMPLE_SECONDS) -> bytes:
+        """Collect raw bytes from a scale through its virtual serial device"""
+        raw = bytearray()
+        if not service.connect():
+            return bytes(raw)
+        try:
+            service.connection.timeout = 0.2
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                service.connection.write(b'W\r\n')
+                raw.extend(service.connection.read(4096))
+        except Exception as e:
+            logger.error(f"Error sampling scale output: {str(e)[:100]}")
+        finally:
+            service.disconnect()
+        return bytes(raw)
+
+    @classmethod
+    def score(cls, raw: bytes) -> list:
+        """Score every protocol/framing pair against a raw sample, best first"""
+        candidates = []
+        for framing, terminator in FRAMINGS.items():
+            # First and last pieces may be partial frames
+            frames = raw.split(terminator)[1:-1]
+            frames = [frame for frame in frames if frame.strip()]
+            if len(frames) < 2:
+                continue
+
+            # Leftover CR/LF inside frames means a different terminator fits better
+            residue = sum(1 for frame in frames if b'\r' in frame or b'\n' in frame) / len(frames)
+
+            for name, protocol in PROTOCOLS.items():
+                parsed = sum(1 for frame in frames if protocol.parse(frame.decode('ascii', errors='ignore')))
+                if not parsed:
+                    continue
+                score = (parsed / len(frames)) * cls.SPECIFICITY.get(name, 1.0) * (1.0 - residue)
+                candidates.append({
+                    'protocol': name,
+                    'framing': framing,
+                    'score': round(score, 3),
+                    'frames': len(frames),
+                    'parsed': parsed
+                })
+
+        candidates.sort(key=lambda c: (c['score'], c['frames']), reverse=True)
+        return candidates
+
+    @classmethod
+    def configure(cls, config):
+        """Load the scale TCP port from the Flask config"""
+        cls.PORT = config.get('DEFAULT_SCALE_PORT', cls.PORT)
+
+    @classmethod
+    def request(cls, device_id: int) -> str:
+        """Start detection on the hardware owner and return its operation id"""
+        from flask import current_app
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+        if table:
+            index, nonce = table.post_command(device_id, COMMAND_DETECT)
+            return f'{index}-{nonce:x}'
+
+        op_id = uuid.uuid4().hex
+        with cls._lock:
+            # Keep finished operations long enough for the devices page to poll them
+            cutoff = time.time() - 300
+            for stale in [key for key, op in cls._operations.items() if op['posted'] < cutoff]:
+                del cls._operations[stale]
+            cls._operations[op_id] = {'device_id': device_id, 'state': COMMAND_PENDING, 'code': RESULT_OK,
+                                      'posted': time.time(), 'finished': 0.0, 'value': 0.0}
+
+        def report(state, code=RESULT_OK, value=0.0):
+            cls._operations[op_id].update(state=state, code=code, value=value,
+                                          finished=time.time() if state in (COMMAND_DONE, COMMAND_FAILED) else 0.0)
+
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                cls.run(device_id, report)
+
+        threading.Thread(target=run, daemon=True, name=f'detect-{op_id[:8]}').start()
+        return op_id
+
+    @classmethod
+    def execute(cls, index: int, record: dict):
+        """Owner-side handler for a detection posted to the shared mailbox"""
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+
+        def report(state, code=RESULT_OK, value=0.0):
+            table.update_command(index, record['nonce'], state, code, value)
+
+        cls.run(record['device_id'], report)
+
+    @classmethod
+    def run(cls, device_id: int, report):
+        """Pause the scale's reader, detect its format and bring the reader back up"""
+        from app import db
+        from app.models.device import Device
+        from app.services.scale_monitor import ScaleMonitor
+        from app.services.startup_service import _start_scale_monitors
+
+        report(COMMAND_RUNNING)
+        device = Device.query.get(device_id)
+        if device is None:
+            report(COMMAND_FAILED, RESULT_NO_DATA)
+            return
+
+        # The background reader would compete for the device while sampling
+        ScaleMonitor.stop(device.id)
+        try:
+            result = cls.detect(device, cls.PORT)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Scale detection error: {str(e)[:100]}")
+            result = {'success': False, 'code': RESULT_NO_DATA}
+        finally:
+            # Restarts this scale, or the combined scale it belongs to, with the saved format
+            _start_scale_monitors(cls.PORT)
+
+        if result['success']:
+            report(COMMAND_DONE, RESULT_OK, result['score'])
+        else:
+            report(COMMAND_FAILED, result['code'])
+
+    @classmethod
+    def detect(cls, device, port: int = 8899) -> dict:
+        """Sample a scale, pick the best protocol/framing and save it on the Device row.
+
+        Owner only; the scale's reader must be stopped first.
+        """
+        from app import db
+
+        if device.scale_transport == 'socat' and device.serial_port:
+            from app.services.scale_service import USRScaleService
+            raw = cls.sample_serial(USRScaleService(
+                serial_port=device.serial_port,
+                baud_rate=device.baud_rate or 9600,
+                data_bits=device.data_bits or 8,
+                parity=device.parity or 'N',
+                stop_bits=device.stop_bits or 1,
+                flow_control=device.flow_control or 'none'
+            ))
+        else:
+            raw = cls.sample_tcp(device.ip_address, port)
+
+        if not raw:
+            return {'success': False, 'code': RESULT_NO_DATA}
+
+        candidates = cls.score(raw)
+        if not candidates:
+            logger.warning(f"No known format matched scale {device.id} output: "
+                           f"{raw[:80].decode('ascii', errors='replace')!r}")
+            return {'success': False, 'code': RESULT_NO_MATCH}
+
+        best = candidates[0]
+        device.scale_protocol = best['protocol']
+        device.scale_framing = best['framing']
+        db.session.commit()
+        
+        # Other workers' device caches pick up the new format
+        from app.services.startup_service import notify_device_change
+        notify_device_change()
+        logger.info(f"Detected {best['protocol']}/{best['framing']} for scale {device.id} "
+                    f"({best['parsed']}/{best['frames']} frames parsed)")
+
+        return {'success': True, 'protocol': best['protocol'], 'framing': best['framing'], 'score': best['score']}
+
+    @classmethod
+    def status(cls, op_id: str) -> Optional[dict]:
+        """Current state of a detection, or None if the id is unknown"""
+        from app.models.device import Device
+        record = cls._lookup(op_id)
+        if record is None:
+            return None
+
+        state, code = record['state'], record['code']
+        # Sampling plus connecting should finish well within this; otherwise the owner never picked it up
+        if state in (COMMAND_PENDING, COMMAND_RUNNING) and time.time() - record['posted'] > cls.SAMPLE_SECONDS + 15:
+            state, code = COMMAND_FAILED, RESULT_EXPIRED
+
+        result = {
+            'operation_id': op_id,
+            'device_id': record['device_id'],
+            'status': _STATUS.get(state, 'unknown'),
+            'success': state == COMMAND_DONE
+        }
+        if state == COMMAND_DONE:
+            device = Device.query.get(record['device_id'])
+            if device:
+                result['protocol'] = device.scale_protocol
+                result['framing'] = device.scale_framing
+            result['score'] = record['value']
+        if state == COMMAND_FAILED:
+            result['error'] = _ERRORS.get(code, 'Detection failed')
+        return result
+
+    @classmethod
+    def _lookup(cls, op_id: str) -> Optional[dict]:
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+        if not table:
+            return cls._operations.get(op_id)
+
+        try:
+            index, nonce = op_id.split('-', 1)
+            index, nonce = int(index), int(nonce, 16)
+        except ValueError:
+            return None
+        record = table.read_command(index)
+        if not record or record['nonce'] != nonce or record['command'] != COMMAND_DETECT:
+            return None
+        return record
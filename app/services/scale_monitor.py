@@ -0,0 +1,393 @@
+import os
+import threading
+import time
+import logging
+from app.hardware.async_scale_driver import AsyncScaleHub
+from app.services.scale_service import USRScaleService, SerialScalePoller
+from app.services.scale_stability import StabilityDetector
+from app.services.weight_history import WeightHistoryRing, history_flags
+
+logger = logging.getLogger(__name__)
+
+class ScaleMonitor:
+    """Long-running reader per scale with an in-memory latest-reading cache.
+
+    Scales using the native transport are served by one shared AsyncScaleHub
+    event loop; scales configured for the socat fallback get a
+    SerialScalePoller thread. Both publish into a per-device snapshot. HTTP
+    handlers only ever read the snapshot, so the request path never touches
+    the device.
+    
+    Readers run only in the hardware owner process, which also publishes each
+    snapshot to the shared DeviceStateTable. Other processes serve snapshots
+    from that table.
+
+    A combined scale sums several member platforms sampled together by an
+    AsyncScaleGroup. Its members' own snapshots are published from the same
+    samples, and the combined reading is stable only when every member is.
+    """
+
+    # Readings older than this are reported as stale/disconnected
+    STALE_AFTER = 3.0
+
+    # Stability thresholds, overridden from app config by configure()
+    STABILITY = {
+        'motion_band': 0.5,
+        'max_variance': 0.04,
+        'settle_time': 0.5,
+        'min_samples': 3
+    }
+
+    # Weight history ring files; disabled when no directory is configured
+    HISTORY_DIR = None
+    HISTORY_CAPACITY = 864000
+
+    # Largest spread in seconds between member answers summed into one combined reading
+    COMBINED_WINDOW = 0.05
+
+    _hub = None
+    _readers = {}
+    _configs = {}
+    _snapshots = {}
+    _detectors = {}
+    _histories = {}
+    _history_readers = {}
+    _grouped = {}
+    _state = None
+    _owner = True
+    _lock = threading.Lock()
+    _changed = threading.Condition()
+
+    @classmethod
+    def configure(cls, config):
+        """Load stability thresholds from the Flask config"""
+        cls.STABILITY = {
+            'motion_band': config.get('SCALE_MOTION_BAND', cls.STABILITY['motion_band']),
+            'max_variance': config.get('SCALE_STABLE_VARIANCE', cls.STABILITY['max_variance']),
+            'settle_time': config.get('SCALE_SETTLE_TIME', cls.STABILITY['settle_time']),
+            'min_samples': config.get('SCALE_STABLE_MIN_SAMPLES', cls.STABILITY['min_samples'])
+        }
+        cls.HISTORY_DIR = config.get('SCALE_HISTORY_DIR', cls.HISTORY_DIR)
+        cls.HISTORY_CAPACITY = config.get('SCALE_HISTORY_CAPACITY', cls.HISTORY_CAPACITY)
+        cls.COMBINED_WINDOW = config.get('SCALE_COMBINED_WINDOW', cls.COMBINED_WINDOW)
+
+    @classmethod
+    def attach_state(cls, table, owner: bool):
+        """Share snapshots through a DeviceStateTable; only the owner runs readers"""
+        cls._state = table
+        cls._owner = owner
+        if table and owner:
+            table.claim()
+    
+    @classmethod
+    def _history_path(cls, device_id: int) -> str:
+        return os.path.join(cls.HISTORY_DIR, f'scale_{device_id}.ring')
+
+    @classmethod
+    def start(cls, device_id: int, ip_address: str, port: int = 8899, transport: str = 'tcp',
+              serial_config: dict = None, protocol: str = None, framing: str = None) -> bool:
+        """Start the background reader for a scale if it is not already running"""
+        if not cls._owner:
+            return False
+        if device_id in cls._grouped:
+            # Sampled by its combined scale's group
+            return True
+        
+        config = (transport, ip_address, port, protocol, framing, tuple(sorted((serial_config or {}).items())))
+        if cls._configs.get(device_id) == config and device_id in cls._readers:
+            return True
+
+        with cls._lock:
+            if cls._configs.get(device_id) == config and device_id in cls._readers:
+                return True
+
+            # Settings changed in admin - replace the reader
+            existing = cls._readers.pop(device_id, None)
+            if existing:
+                existing.disconnect()
+
+            callback = lambda data, device_id=device_id: cls.publish(device_id, data)
+            cls._detectors[device_id] = StabilityDetector(**cls.STABILITY)
+
+            cls._open_history(device_id)
+
+            if transport == 'socat' and serial_config:
+                reader = SerialScalePoller(USRScaleService(protocol=protocol, framing=framing, **serial_config), callback)
+                reader.start()
+            else:
+                if cls._hub is None:
+                    cls._hub = AsyncScaleHub()
+                reader = cls._hub.add_scale(ip_address, port, callback, protocol, framing)
+
+            cls._readers[device_id] = reader
+            cls._configs[device_id] = config
+            logger.info(f"Started {transport} scale reader for device {device_id} at {ip_address}:{port}")
+            return True
+
+    @classmethod
+    def start_group(cls, device_id: int, members: list, port: int = 8899) -> bool:
+        """Start a combined scale that samples its member scale Devices together"""
+        if not cls._owner:
+            return False
+        if not members:
+            logger.warning(f"Combined scale {device_id} has no member scales")
+            return False
+        
+        member_ids = [member.id for member in members]
+        # Members are always sampled over the native driver so the hub can clock them together
+        config = ('combined', port, tuple((member.id, member.ip_address, member.scale_protocol,
+                                           member.scale_framing) for member in members))
+        if cls._configs.get(device_id) == config and device_id in cls._readers:
+            return True
+        
+        # A member may already have its own reader, or belong to a stale version of this group
+        cls.stop(device_id)
+        for member_id in member_ids:
+            cls.stop(member_id)
+        
+        with cls._lock:
+            if cls._hub is None:
+                cls._hub = AsyncScaleHub()
+            group = cls._hub.add_group(
+                [(member.ip_address, port, member.scale_protocol, member.scale_framing) for member in members],
+                lambda readings: cls.publish_group(device_id, member_ids, readings),
+                cls.COMBINED_WINDOW
+            )
+            for member_id, connection in zip(member_ids, group.connections):
+                cls._detectors[member_id] = StabilityDetector(**cls.STABILITY)
+                cls._open_history(member_id)
+                cls._readers[member_id] = connection
+                cls._grouped[member_id] = device_id
+            cls._open_history(device_id)
+            cls._readers[device_id] = group
+            cls._configs[device_id] = config
+            logger.info(f"Started combined scale {device_id} over devices {member_ids}")
+            return True
+
+    @classmethod
+    def start_device(cls, device, port: int = 8899) -> bool:
+        """Start the background reader for a scale Device row"""
+        if device.scale_transport == 'combined':
+            return cls.start_group(device.id, device.members, port)
+        
+        serial_config = None
+        if device.scale_transport == 'socat' and device.serial_port:
+            serial_config = {
+                'serial_port': device.serial_port,
+                'baud_rate': device.baud_rate or 9600,
+                'data_bits': device.data_bits or 8,
+                'parity': device.parity or 'N',
+                'stop_bits': device.stop_bits or 1,
+                'flow_control': device.flow_control or 'none'
+            }
+        return cls.start(device.id, device.ip_address, port, device.scale_transport or 'tcp', serial_config,
+                         device.scale_protocol, device.scale_framing)
+
+    @classmethod
+    def _open_history(cls, device_id: int):
+        if cls.HISTORY_DIR and device_id not in cls._histories:
+            # None when another process already records this scale
+            cls._histories[device_id] = WeightHistoryRing.open_writer(cls._history_path(device_id),
+                                                                      cls.HISTORY_CAPACITY)
+
+    @classmethod
+    def stop(cls, device_id: int):
+        """Stop the background reader for a scale and drop its cached reading"""
+        # A member cannot run without its group; stopping it stops the combined scale
+        combined_id = cls._grouped.get(device_id)
+        if combined_id is not None:
+            device_id = combined_id
+        
+        with cls._lock:
+            reader = cls._readers.pop(device_id, None)
+            cls._configs.pop(device_id, None)
+            cls._snapshots.pop(device_id, None)
+            cls._detectors.pop(device_id, None)
+            histories = [cls._histories.pop(device_id, None)]
+            members = [member_id for member_id, group_id in cls._grouped.items() if group_id == device_id]
+            for member_id in members:
+                del cls._grouped[member_id]
+                cls._readers.pop(member_id, None)
+                cls._snapshots.pop(member_id, None)
+                cls._detectors.pop(member_id, None)
+                histories.append(cls._histories.pop(member_id, None))
+        for history in histories:
+            # Releases the writer lock so a later start, here or in the next owner, can reopen the ring
+            if history:
+                history.close()
+        if reader:
+            reader.disconnect()
+            if cls._state:
+                for stopped_id in [device_id] + members:
+                    cls._state.clear(stopped_id)
+
+    @classmethod
+    def stop_all(cls):
+        """Stop every running scale reader"""
+        for device_id in list(cls._readers):
+            if device_id in cls._readers:
+                cls.stop(device_id)
+
+    @classmethod
+    def publish(cls, device_id: int, weight_data: dict, stable: bool = None):
+        """Store a new reading; called from the reader thread"""
+        previous = cls._snapshots.get(device_id)
+        now = time.time()
+        
+        # Stability comes from the numeric detector; the indicator's own flag is kept for reference
+        if stable is None:
+            detector = cls._detectors.get(device_id)
+            if detector and previous and now - previous['timestamp'] > cls.STALE_AFTER:
+                # A gap this long means the reader reconnected; readings from before it say nothing about the load now
+                detector.reset()
+            stable = detector.add(weight_data['weight'], now) if detector else weight_data['stable']
+        
+        history = cls._histories.get(device_id)
+        if history:
+            history.append(now, weight_data['weight'], history_flags(weight_data, stable))
+        
+        # Replace the dict rather than mutating it so readers never see a half-written snapshot
+        snapshot = {
+            'weight': weight_data['weight'],
+            'stable': stable,
+            'indicator_stable': weight_data['stable'],
+            'motion': weight_data.get('motion', False),
+            'overload': weight_data.get('overload', False),
+            'gross': weight_data.get('gross', weight_data['weight']),
+            'net': weight_data.get('net', weight_data['weight']),
+            'tare': weight_data.get('tare', 0.0),
+            'unit': weight_data['unit'],
+            'timestamp': now
+        }
+        cls._snapshots[device_id] = snapshot
+        
+        if cls._state:
+            cls._state.write_scale(device_id, snapshot)
+        
+        # Only wake stream listeners when something they display actually changed
+        if (not previous or previous['weight'] != weight_data['weight']
+                or previous['stable'] != stable or previous['unit'] != weight_data['unit']):
+            with cls._changed:
+                cls._changed.notify_all()
+
+    @classmethod
+    def publish_group(cls, device_id: int, member_ids: list, readings: list):
+        """Store one synchronized sample of a combined scale and of each of its members"""
+        units = {reading['unit'] for reading in readings}
+        if len(units) > 1:
+            logger.warning(f"Combined scale {device_id} members report different units {sorted(units)}")
+            return
+        
+        for member_id, reading in zip(member_ids, readings):
+            cls.publish(member_id, reading)
+        
+        # Only a full set of settled platforms makes a settled load
+        stable = all(cls._snapshots[member_id]['stable'] for member_id in member_ids)
+        cls.publish(device_id, {
+            'weight': sum(reading['weight'] for reading in readings),
+            'stable': all(reading['stable'] for reading in readings),
+            'motion': any(reading.get('motion', False) for reading in readings),
+            'overload': any(reading.get('overload', False) for reading in readings),
+            'gross': sum(reading.get('gross', reading['weight']) for reading in readings),
+            'net': sum(reading.get('net', reading['weight']) for reading in readings),
+            'tare': sum(reading.get('tare', 0.0) for reading in readings),
+            'unit': readings[0]['unit']
+        }, stable)
+
+    @classmethod
+    def tare(cls, device_id: int) -> bool:
+        """Send a tare through the running reader; False if the scale is not connected"""
+        reader = cls._readers.get(device_id)
+        if not (reader and reader.connected and reader.tare()):
+            return False
+        # Pre-tare readings must not count toward the post-tare settle window
+        for member_id in [device_id] + [member_id for member_id, group_id in cls._grouped.items()
+                                        if group_id == device_id]:
+            detector = cls._detectors.get(member_id)
+            if detector:
+                detector.reset()
+        return True
+    
+    @classmethod
+    def get_snapshot(cls, device_id: int) -> dict:
+        """Return the latest cached reading for a scale without touching the device"""
+        if not cls._owner and cls._state:
+            return cls._shared_snapshot(device_id)
+        
+        snapshot = cls._snapshots.get(device_id)
+        reader = cls._readers.get(device_id)
+
+        if not snapshot:
+            return {
+                'weight': 0.0,
+                'stable': False,
+                'unit': 'lbs',
+                'connected': bool(reader and reader.connected),
+                'timestamp': None
+            }
+
+        fresh = time.time() - snapshot['timestamp'] <= cls.STALE_AFTER
+        result = dict(snapshot)
+        result['connected'] = bool(reader and reader.connected and fresh)
+        if not fresh:
+            result['stable'] = False
+        return result
+
+    @classmethod
+    def get_history(cls, device_id: int, start: float, end: float) -> list:
+        """Recorded readings for a scale between two epoch times, as NumPy arrays oldest first"""
+        ring = cls._histories.get(device_id) or cls._history_readers.get(device_id)
+        if ring is None:
+            if not cls.HISTORY_DIR:
+                return []
+            # Readers stay mapped for the life of the process and reopen the ring if the owner replaces it
+            ring = WeightHistoryRing.open_reader(cls._history_path(device_id))
+            if ring is None:
+                return []
+            cls._history_readers[device_id] = ring
+        return ring.window(start, end)
+
+    @classmethod
+    def _shared_snapshot(cls, device_id: int) -> dict:
+        """Build a snapshot from the owner's slot in the shared state table"""
+        slot = cls._state.read(device_id)
+        if not slot:
+            return {'weight': 0.0, 'stable': False, 'unit': 'lbs', 'connected': False, 'timestamp': None}
+        
+        fresh = time.time() - slot['updated'] <= cls.STALE_AFTER
+        return {
+            'weight': slot['weight'],
+            'stable': slot['stable'] and fresh,
+            'indicator_stable': slot['indicator_stable'],
+            'motion': slot['motion'],
+            'overload': slot['overload'],
+            'gross': slot['gross'],
+            'net': slot['net'],
+            'tare': slot['tare'],
+            'unit': slot['unit'],
+            'timestamp': slot['updated'],
+            'connected': slot['connected'] and fresh
+        }
+    
+    @classmethod
+    def wait_for_change(cls, timeout: float, device_id: int = None):
+        """Block until a scale publishes a changed reading or the timeout expires"""
+        if device_id is not None and not cls._owner and cls._state:
+            # Other processes' notifications cannot reach us; watch the slot sequence instead
+            seq = cls._state.seq(device_id)
+            deadline = time.monotonic() + timeout
+            while cls._state.seq(device_id) == seq and time.monotonic() < deadline:
+                time.sleep(0.05)
+            return
+        
+        with cls._changed:
+            cls._changed.wait(timeout)
+
+    @classmethod
+    def is_running(cls, device_id: int) -> bool:
+        """Check if a background reader exists for a scale"""
+        if not cls._owner and cls._state:
+            slot = cls._state.read(device_id)
+            return bool(slot and time.time() - slot['updated'] <= cls.STALE_AFTER)
+        reader = cls._readers.get(device_id)
+        return bool(reader and reader.running)
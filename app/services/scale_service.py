@@ -1,23 +1,37 @@
+import os
 import serial
 import logging
-import re
+import selectors
+import threading
 import time
-from typing import Optional
+from typing import Optional, Callable
+from app.hardware.scale_protocols import get_protocol, get_terminator
 
 logger = logging.getLogger(__name__)
 
 class USRScaleService:
-    """Service for scale devices via virtual serial connection using socat"""
+    """Service for scale devices via virtual serial connection using socat
+    
+    The port is opened non-blocking and waited on with a selector, so each
+    command returns as soon as a complete frame arrives and gives up at its
+    deadline instead of sleeping a fixed time.
+    """
     
     def __init__(self, serial_port: str, baud_rate: int = 9600, data_bits: int = 8, 
-                 parity: str = 'N', stop_bits: int = 1, flow_control: str = 'none'):
+                 parity: str = 'N', stop_bits: int = 1, flow_control: str = 'none', protocol: str = None,
+                 framing: str = None, timeout: float = 1.0):
         self.serial_port = serial_port
         self.baud_rate = baud_rate
         self.data_bits = data_bits
         self.parity = parity.upper()
         self.stop_bits = stop_bits
         self.flow_control = flow_control.lower()
+        self.protocol = get_protocol(protocol)
+        self.terminator = get_terminator(self.protocol, framing)
+        self.timeout = timeout
         self.connection = None
+        self._selector = None
+        self._buffer = bytearray()
         
     def connect(self) -> bool:
         """Connect to scale device via serial"""
@@ -35,10 +49,14 @@ class USRScaleService:
                 bytesize=self.data_bits,
                 parity=parity_map.get(self.parity, serial.PARITY_NONE),
                 stopbits=self.stop_bits,
-                timeout=2,
+                timeout=0,
+                write_timeout=self.timeout,
                 xonxoff=xonxoff,
                 rtscts=rtscts
             )
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self.connection.fileno(), selectors.EVENT_READ)
+            self._buffer.clear()
             
             logger.info(f"Connected to scale at {self.serial_port}")
             return True
@@ -49,40 +67,73 @@ class USRScaleService:
     
     def disconnect(self):
         """Disconnect from scale device"""
+        if self._selector:
+            self._selector.close()
+            self._selector = None
         if self.connection and self.connection.is_open:
             self.connection.close()
-            self.connection = None
+        self.connection = None
+        self._buffer.clear()
+    
+    def _command(self, command: bytes):
+        """Send a command, discarding anything the scale sent before it"""
+        self.connection.reset_input_buffer()
+        self._buffer.clear()
+        self.connection.write(command)
+    
+    def _read_frame(self, deadline: float) -> Optional[bytes]:
+        """Wait for the next complete frame, without its terminator, or None at the deadline"""
+        fd = self.connection.fileno()
+        while True:
+            index = self._buffer.find(self.terminator)
+            if index >= 0:
+                frame = bytes(self._buffer[:index])
+                del self._buffer[:index + len(self.terminator)]
+                return frame
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._selector.select(remaining):
+                return None
+            
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise serial.SerialException("Scale device closed")
+            self._buffer.extend(chunk)
     
     def get_weight(self) -> Optional[float]:
         """Get current weight reading from scale"""
+        reading = self.get_reading()
+        return reading['weight'] if reading else None
+    
+    def get_reading(self) -> Optional[dict]:
+        """Get current reading (weight, gross/net/tare, unit, motion) from scale"""
         if not self.connection or not self.connection.is_open:
             if not self.connect():
                 return None
         
         try:
             # Send weight request command (common commands: 'W\r\n', 'P\r\n', or just read continuously)
-            self.connection.write(b'W\r\n')
-            time.sleep(0.1)
-            
-            # Read response
-            response = self.connection.readline().decode('ascii', errors='ignore').strip()
-            
-            # Parse weight from response using regex
-            # Common formats: "W 123.45 lb", "123.45", "ST,GS,+123.45,lb"
-            weight_patterns = [
-                r'([+-]?\d+\.?\d*)\s*(?:lb|kg|g)?',  # Simple number with optional unit
-                r'ST,GS,([+-]?\d+\.?\d*),',          # Toledo format
-                r'W\s+([+-]?\d+\.?\d*)',             # W command response
-            ]
+            deadline = time.monotonic() + self.timeout
+            self._command(b'W\r\n')
             
-            for pattern in weight_patterns:
-                match = re.search(pattern, response)
-                if match:
-                    weight = float(match.group(1))
-                    logger.debug(f"Weight reading: {weight}")
-                    return weight
+            # Skip echoes and partial frames until one parses or the deadline passes
+            response = None
+            while True:
+                frame = self._read_frame(deadline)
+                if frame is None:
+                    break
+                response = frame.decode('ascii', errors='ignore')
+                
+                # Single precompiled parser for the device's configured format
+                reading = self.protocol.parse(response)
+                if reading:
+                    logger.debug(f"Weight reading: {reading['weight']}")
+                    return reading
             
-            logger.warning(f"Could not parse weight from response: {response}")
+            if response is None:
+                logger.warning(f"No response from scale at {self.serial_port} within {self.timeout}s")
+            else:
+                logger.warning(f"Could not parse {self.protocol.name} weight from response: {response}")
             return None
                 
         except Exception as e:
@@ -90,19 +141,32 @@ class USRScaleService:
             self.disconnect()
             return None
     
-    def tare_scale(self) -> bool:
-        """Tare (zero) the scale"""
+    def tare_scale(self, wait_for_ack: bool = False) -> bool:
+        """Tare (zero) the scale
+        
+        Most indicators do not answer a tare, so by default this returns once the
+        command is written. With wait_for_ack it waits up to the command deadline
+        for a response frame and fails if none arrives.
+        """
         if not self.connection or not self.connection.is_open:
             if not self.connect():
                 return False
         
         try:
             # Send tare command (common commands: 'T\r\n', 'Z\r\n')
-            self.connection.write(b'T\r\n')
-            time.sleep(0.5)
+            deadline = time.monotonic() + self.timeout
+            self._command(b'T\r\n')
+            self.connection.flush()
             
-            response = self.connection.readline().decode('ascii', errors='ignore').strip()
-            logger.info(f"Tare command executed, response: {response}")
+            if not wait_for_ack:
+                logger.info("Tare command sent")
+                return True
+            
+            frame = self._read_frame(deadline)
+            if frame is None:
+                logger.warning(f"No tare acknowledgement from scale at {self.serial_port} within {self.timeout}s")
+                return False
+            logger.info(f"Tare command executed, response: {frame.decode('ascii', errors='ignore').strip()}")
             return True
             
         except Exception as e:
@@ -151,4 +215,50 @@ class USRScaleService:
                 'message': f'Serial Error: {str(e)[:100]}',
                 'connection_type': 'Serial',
                 'port': self.serial_port
-            }
\ No newline at end of file
+            }
+
+class SerialScalePoller:
+    """Background poller for a scale reached through a socat virtual serial device.
+    
+    Fallback transport for scales that cannot be reached by the native TCP driver.
+    """
+    
+    def __init__(self, service: USRScaleService, callback: Optional[Callable] = None, interval: float = 0.1):
+        self.service = service
+        self.callback = callback
+        self.interval = interval
+        self.connected = False
+        self.running = False
+        self.thread = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start polling in a separate thread"""
+        self.running = True
+        self.thread = threading.Thread(target=self._poll_loop, daemon=True,
+                                       name=f"scale-serial-{self.service.serial_port}")
+        self.thread.start()
+    
+    def _poll_loop(self):
+        while self.running:
+            with self._lock:
+                reading = self.service.get_reading()
+            
+            self.connected = reading is not None
+            if reading is not None and self.callback:
+                self.callback(reading)
+            
+            time.sleep(self.interval if self.connected else 2.0)
+    
+    def tare(self) -> bool:
+        """Tare the scale between polls"""
+        with self._lock:
+            return self.service.tare_scale()
+    
+    def disconnect(self):
+        """Stop polling and close the serial device"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.service.disconnect()
+        self.connected = False
\ No newline at end of file
@@ -0,0 +1,69 @@
+import time
+import threading
+import numpy as np
+from typing import Optional
+
+class StabilityDetector:
+    """Numeric stability detection for a single scale.
+
+    Keeps the most recent readings in a fixed-size ring buffer and declares
+    the weight stable once every reading in the last ``settle_time`` seconds
+    stays inside ``motion_band`` and the window variance is below
+    ``max_variance``. The check is vectorized over the whole buffer, so it
+    costs the same no matter where the ring head is.
+
+    add() runs on the scale's reader thread while reset() is called from
+    tare and reconnect handling on other threads, so both hold a lock.
+    """
+
+    def __init__(self, motion_band: float = 0.5, max_variance: float = 0.04,
+                 settle_time: float = 0.5, min_samples: int = 3, capacity: int = 128):
+        self.motion_band = motion_band
+        self.max_variance = max_variance
+        self.settle_time = settle_time
+        self.min_samples = min_samples
+        self.capacity = capacity
+
+        # Empty slots carry -inf timestamps so they never fall inside a window
+        self._weights = np.zeros(capacity, dtype=np.float64)
+        self._timestamps = np.full(capacity, -np.inf, dtype=np.float64)
+        self._head = 0
+        self.stable = False
+        self._lock = threading.Lock()
+
+    def add(self, weight: float, timestamp: Optional[float] = None) -> bool:
+        """Record a reading and return the updated stability state"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            self._weights[self._head] = weight
+            self._timestamps[self._head] = timestamp
+            self._head = (self._head + 1) % self.capacity
+
+            self.stable = self._evaluate(timestamp)
+            return self.stable
+
+    def reset(self):
+        """Forget all readings, e.g. after a tare or reconnect"""
+        with self._lock:
+            self._timestamps.fill(-np.inf)
+            self._head = 0
+            self.stable = False
+
+    def _evaluate(self, now: float) -> bool:
+        cutoff = now - self.settle_time
+        in_window = self._timestamps >= cutoff
+
+        # Need history older than the window, otherwise we have not watched the scale for settle_time yet
+        if not np.any(np.isfinite(self._timestamps) & ~in_window):
+            return False
+
+        window = self._weights[in_window]
+        if window.size < self.min_samples:
+            return False
+
+        if np.ptp(window) > self.motion_band:
+            return False
+
+        return bool(np.var(window) <= self.max_variance)
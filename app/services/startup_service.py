@@ -1,33 +1,234 @@
 import logging
 import os
+import fcntl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from app.models.device import Device
-from app.services.virtual_serial_service import VirtualSerialService
+from app.services.device_state import (DeviceStateTable, COMMAND_TARE, COMMAND_DETECT, COMMAND_PENDING,
+                                       MAILBOX_SIZE)
+from app.services.virtual_serial_service import VirtualSerialService, SerialBridgeSupervisor
 
 logger = logging.getLogger(__name__)
 
-def initialize_virtual_serial_devices():
-    """Initialize all virtual serial devices for scales on startup"""
+HARDWARE_LOCK_FILE = '/tmp/scrapyard-hardware.lock'
+HARDWARE_READY_FILE = '/tmp/scrapyard-hardware.ready'
+DEVICE_STATE_FILE = '/dev/shm/scrapyard-devices'
+
+# Seconds between owner checks for device configuration changes
+SYNC_INTERVAL = 1.0
+
+# Seconds between owner checks of the command mailbox
+COMMAND_INTERVAL = 0.05
+
+# Open lock file of the process that owns the hardware; held for the life of the process
+_owner_lock = None
+_ready_file = HARDWARE_READY_FILE
+_state_table = None
+
+def _restore_virtual_serial(scale_id: int, serial_port: str, ip_address: str) -> bool:
+    """Bring up one scale's socat device if it is missing or its process died"""
+    # A bridge left by a previous owner keeps running; supervise it rather than restart it
+    if os.path.exists(serial_port) and SerialBridgeSupervisor.adopt(serial_port, ip_address):
+        logger.info(f"Virtual serial device already active: {serial_port}")
+        return True
+
+    logger.info(f"Recreating virtual serial device: {serial_port}")
+    success = VirtualSerialService.create_virtual_serial(serial_port, ip_address)
+    if success:
+        logger.info(f"Virtual serial device restored: {serial_port}")
+    else:
+        logger.error(f"Failed to restore virtual serial device for scale {scale_id}: {serial_port}")
+    return success
+
+def initialize_virtual_serial_devices(max_workers: int = 8):
+    """Initialize all virtual serial devices for scales, concurrently across scales"""
     try:
         # Check if database tables exist
         from app import db
         if not db.engine.dialect.has_table(db.engine.connect(), 'devices'):
             logger.info("Database tables not yet created, skipping virtual serial initialization")
             return
-            
-        scales = Device.query.filter_by(device_type='scale').all()
+
+        # Natively connected scales need no virtual serial device
+        scales = [(scale.id, scale.serial_port, scale.ip_address)
+                  for scale in Device.query.filter_by(device_type='scale', scale_transport='socat').all()
+                  if scale.serial_port and scale.ip_address]
+        if not scales:
+            return
+
+        # Each bring-up is mostly waiting on socat, so one slow scale no longer delays the rest
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(scales)), thread_name_prefix='socat-init') as pool:
+            list(pool.map(lambda args: _restore_virtual_serial(*args), scales))
+
+    except Exception as e:
+        logger.error(f"Error initializing virtual serial devices: {str(e)[:100]}")
+
+def _start_scale_monitors(port: int):
+    """Start the background reader for every active scale and stop readers for removed ones"""
+    from app.services.scale_monitor import ScaleMonitor
+    scales = Device.query.filter_by(device_type='scale', is_active=True).all()
+    active = {scale.id for scale in scales}
+    
+    # Stop removed scales first so members of a removed combined scale are free to start on their own
+    for device_id in set(ScaleMonitor._readers) - active - set(ScaleMonitor._grouped):
+        if device_id in ScaleMonitor._readers:
+            ScaleMonitor.stop(device_id)
+    
+    for scale in scales:
+        try:
+            ScaleMonitor.start_device(scale, port)
+        except Exception as e:
+            logger.error(f"Failed to start scale reader for device {scale.id}: {str(e)[:100]}")
+
+def _sync_devices(app, retry: bool = False):
+    """Owner loop: re-apply device configuration whenever another process bumps the generation.
+
+    With retry set, the configuration is also re-applied every interval until it succeeds once.
+    """
+    generation = _state_table.generation
+    while True:
+        time.sleep(SYNC_INTERVAL)
+        if _state_table.generation == generation and not retry:
+            continue
+        if _state_table.generation != generation:
+            generation = _state_table.generation
+            logger.info(f"Device configuration changed (generation {generation}), resyncing hardware")
+        try:
+            with app.app_context():
+                _start_scale_monitors(app.config.get('DEFAULT_SCALE_PORT', 8899))
+            retry = False
+        except Exception as e:
+            logger.error(f"Error resyncing devices: {str(e)[:100]}")
+
+def _command_handlers() -> dict:
+    from app.services.tare_service import TareService
+    from app.services.scale_detection_service import ScaleDetectionService
+    return {COMMAND_TARE: TareService.execute, COMMAND_DETECT: ScaleDetectionService.execute}
+
+def _run_command(app, handler, index: int, record: dict):
+    with app.app_context():
+        try:
+            handler(index, record)
+        except Exception as e:
+            logger.error(f"Command {record['command']} for device {record['device_id']} failed: {str(e)[:100]}")
+
+def _process_commands(app):
+    """Owner loop: hand each command posted to the shared mailbox to its handler"""
+    handlers = _command_handlers()
+    processed = _state_table.commands_posted
+    while True:
+        time.sleep(COMMAND_INTERVAL)
+        posted = _state_table.commands_posted
         
-        for scale in scales:
-            if scale.serial_port and scale.ip_address:
-                # Check if device exists and process is running
-                if not os.path.exists(scale.serial_port) or not VirtualSerialService.is_device_active(scale.serial_port):
-                    logger.info(f"Recreating virtual serial device: {scale.serial_port}")
-                    success = VirtualSerialService.create_virtual_serial(scale.serial_port, scale.ip_address)
-                    if success:
-                        logger.info(f"Virtual serial device restored: {scale.serial_port}")
-                    else:
-                        logger.error(f"Failed to restore virtual serial device: {scale.serial_port}")
-                else:
-                    logger.info(f"Virtual serial device already active: {scale.serial_port}")
-                    
+        # Anything more than a full ring behind has already been overwritten
+        for number in range(max(processed, posted - MAILBOX_SIZE), posted):
+            index = number % MAILBOX_SIZE
+            record = _state_table.read_command(index)
+            handler = handlers.get(record['command']) if record else None
+            if handler is None or record['state'] != COMMAND_PENDING:
+                continue
+            threading.Thread(target=_run_command, args=(app, handler, index, record), daemon=True,
+                             name=f'command-{index}').start()
+        processed = posted
+
+def _bring_up_hardware(app):
+    """Owner-only hardware initialization; marks the ready flag when finished.
+
+    A failing step is logged and skipped rather than aborting the rest: the
+    ready flag is always written and the command and sync loops always run,
+    and if the scales could not be started the sync loop retries them.
+    """
+    from app.services.printer_monitor import PrinterMonitor
+    from app.services.camera_monitor import CameraMonitor
+    scales_started = False
+    try:
+        with app.app_context():
+            initialize_virtual_serial_devices()
+            _start_scale_monitors(app.config.get('DEFAULT_SCALE_PORT', 8899))
+        scales_started = True
     except Exception as e:
-        logger.error(f"Error initializing virtual serial devices: {str(e)[:100]}")
\ No newline at end of file
+        logger.error(f"Error starting scale readers: {str(e)[:100]}")
+
+    try:
+        # Both pick up added and removed devices on each poll, so they need no resync
+        PrinterMonitor.start(app)
+        CameraMonitor.start(app)
+    except Exception as e:
+        logger.error(f"Error starting device monitors: {str(e)[:100]}")
+    finally:
+        try:
+            with open(_ready_file, 'w') as f:
+                f.write(str(os.getpid()))
+            logger.info(f"Hardware ready (owner pid {os.getpid()})")
+        except OSError as e:
+            logger.error(f"Cannot write hardware ready file {_ready_file}: {str(e)[:100]}")
+
+        if _state_table:
+            threading.Thread(target=_process_commands, args=(app,), daemon=True, name='hardware-commands').start()
+            _sync_devices(app, retry=not scales_started)
+
+def _take_ownership(app, lock):
+    from app.services.scale_monitor import ScaleMonitor
+    global _owner_lock
+    _owner_lock = lock
+    ScaleMonitor.attach_state(_state_table, owner=True)
+
+    # Clear a flag left by a previous owner before reinitializing
+    if os.path.exists(_ready_file):
+        os.unlink(_ready_file)
+
+    logger.info(f"Process {os.getpid()} owns scale hardware")
+    threading.Thread(target=_bring_up_hardware, args=(app,), daemon=True, name='hardware-startup').start()
+
+def _wait_for_ownership(app, lock):
+    # Blocks until the current owner exits, then this process takes over
+    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+    _take_ownership(app, lock)
+
+def start_hardware(app):
+    """Start hardware bring-up without blocking the calling process.
+
+    The first process to take an flock on the hardware lock file becomes the
+    owner and initializes scales in a background thread. Every other process
+    returns immediately and waits on the lock in a daemon thread, so a new
+    owner takes over if the current one exits.
+    """
+    from app.services.scale_monitor import ScaleMonitor
+    global _ready_file, _state_table
+    _ready_file = app.config.get('HARDWARE_READY_FILE', HARDWARE_READY_FILE)
+    _state_table = DeviceStateTable.open(app.config.get('DEVICE_STATE_FILE', DEVICE_STATE_FILE),
+                                         app.config.get('DEVICE_STATE_SLOTS', 1024))
+
+    lock = open(app.config.get('HARDWARE_LOCK_FILE', HARDWARE_LOCK_FILE), 'a')
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        # Without a shared table this process could not see the owner's readings, so it keeps its own
+        if _state_table:
+            ScaleMonitor.attach_state(_state_table, owner=False)
+        threading.Thread(target=_wait_for_ownership, args=(app, lock), daemon=True,
+                         name='hardware-standby').start()
+        return False
+
+    _take_ownership(app, lock)
+    return True
+
+def is_hardware_owner() -> bool:
+    """Check if this process owns the scale hardware"""
+    return _owner_lock is not None
+
+def get_state_table() -> DeviceStateTable:
+    """The shared device state table, or None if shared memory is unavailable"""
+    return _state_table
+
+def notify_device_change():
+    """Tell the hardware owner and every worker's device cache that device configuration changed"""
+    from app.services.device_resolver import DeviceResolver
+    DeviceResolver.invalidate()
+    if _state_table:
+        _state_table.bump_generation()
+
+def scales_ready() -> bool:
+    """Cheap check for workers: has the owner finished bringing up the scales"""
+    return os.path.exists(_ready_file)
@@ -0,0 +1,154 @@
+import threading
+import time
+import uuid
+import logging
+from typing import Callable, Optional
+from app.services.device_state import (COMMAND_TARE, COMMAND_PENDING, COMMAND_RUNNING, COMMAND_DONE,
+                                       COMMAND_FAILED, RESULT_OK, RESULT_NOT_CONNECTED, RESULT_TIMEOUT,
+                                       RESULT_EXPIRED)
+
+logger = logging.getLogger(__name__)
+
+_STATUS = {
+    COMMAND_PENDING: 'pending',
+    COMMAND_RUNNING: 'running',
+    COMMAND_DONE: 'confirmed',
+    COMMAND_FAILED: 'failed'
+}
+
+_ERRORS = {
+    RESULT_NOT_CONNECTED: 'Scale is not connected',
+    RESULT_TIMEOUT: 'Scale did not settle near zero',
+    RESULT_EXPIRED: 'Tare was not processed'
+}
+
+class TareService:
+    """Asynchronous tare that is only reported done once the scale reads a stable zero.
+
+    request() returns an operation id straight away. The hardware owner sends
+    the tare, then watches the live weight until it settles within ZERO_BAND
+    of zero or TIMEOUT passes. With shared memory the request and its outcome
+    travel through the DeviceStateTable mailbox so any worker can start a tare
+    and poll its status; without it everything runs in this process.
+    """
+
+    # Largest weight still accepted as zero after a tare (scale units)
+    ZERO_BAND = 0.5
+
+    # Seconds the scale has to settle at zero
+    TIMEOUT = 5.0
+
+    _operations = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, config):
+        """Load tare thresholds from the Flask config"""
+        cls.ZERO_BAND = config.get('SCALE_TARE_ZERO_BAND', cls.ZERO_BAND)
+        cls.TIMEOUT = config.get('SCALE_TARE_TIMEOUT', cls.TIMEOUT)
+
+    @classmethod
+    def request(cls, device_id: int) -> str:
+        """Start a tare and return its operation id"""
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+        if table:
+            index, nonce = table.post_command(device_id, COMMAND_TARE)
+            return f'{index}-{nonce:x}'
+
+        op_id = uuid.uuid4().hex
+        with cls._lock:
+            # Keep finished operations long enough for the cashier page to poll them
+            cutoff = time.time() - 300
+            for stale in [key for key, op in cls._operations.items() if op['posted'] < cutoff]:
+                del cls._operations[stale]
+            cls._operations[op_id] = {'device_id': device_id, 'state': COMMAND_PENDING, 'code': RESULT_OK,
+                                      'posted': time.time(), 'finished': 0.0, 'value': 0.0}
+
+        def report(state, code=RESULT_OK, value=0.0):
+            cls._operations[op_id].update(state=state, code=code, value=value,
+                                          finished=time.time() if state in (COMMAND_DONE, COMMAND_FAILED) else 0.0)
+
+        threading.Thread(target=cls.confirm, args=(device_id, report), daemon=True,
+                         name=f'tare-{op_id[:8]}').start()
+        return op_id
+
+    @classmethod
+    def execute(cls, index: int, record: dict):
+        """Owner-side handler for a tare posted to the shared mailbox"""
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+
+        def report(state, code=RESULT_OK, value=0.0):
+            table.update_command(index, record['nonce'], state, code, value)
+
+        cls.confirm(record['device_id'], report)
+
+    @classmethod
+    def confirm(cls, device_id: int, report: Callable):
+        """Send the tare and wait for a stable reading near zero taken after it"""
+        from app.services.scale_monitor import ScaleMonitor
+
+        report(COMMAND_RUNNING)
+        sent_at = time.time()
+        if not ScaleMonitor.tare(device_id):
+            logger.warning(f"Tare for scale {device_id} failed: not connected")
+            report(COMMAND_FAILED, RESULT_NOT_CONNECTED)
+            return
+
+        deadline = time.monotonic() + cls.TIMEOUT
+        weight = 0.0
+        while time.monotonic() < deadline:
+            snapshot = ScaleMonitor.get_snapshot(device_id)
+            if snapshot['timestamp'] and snapshot['timestamp'] > sent_at:
+                weight = snapshot['weight']
+                if snapshot['stable'] and abs(weight) <= cls.ZERO_BAND:
+                    logger.info(f"Tare confirmed for scale {device_id} at {weight}")
+                    report(COMMAND_DONE, RESULT_OK, weight)
+                    return
+            ScaleMonitor.wait_for_change(timeout=0.2)
+
+        logger.warning(f"Tare for scale {device_id} not confirmed, last weight {weight}")
+        report(COMMAND_FAILED, RESULT_TIMEOUT, weight)
+
+    @classmethod
+    def status(cls, op_id: str) -> Optional[dict]:
+        """Current state of a tare operation, or None if the id is unknown"""
+        record = cls._lookup(op_id)
+        if record is None:
+            return None
+
+        state, code = record['state'], record['code']
+        # The owner never picked it up, e.g. it restarted mid-operation
+        if state in (COMMAND_PENDING, COMMAND_RUNNING) and time.time() - record['posted'] > cls.TIMEOUT + 5:
+            state, code = COMMAND_FAILED, RESULT_EXPIRED
+
+        result = {
+            'operation_id': op_id,
+            'device_id': record['device_id'],
+            'status': _STATUS.get(state, 'unknown'),
+            'success': state == COMMAND_DONE
+        }
+        if state in (COMMAND_DONE, COMMAND_FAILED):
+            result['weight'] = record['value']
+            result['elapsed'] = round(record['finished'] - record['posted'], 3) if record['finished'] else None
+        if state == COMMAND_FAILED:
+            result['error'] = _ERRORS.get(code, 'Tare failed')
+        return result
+
+    @classmethod
+    def _lookup(cls, op_id: str) -> Optional[dict]:
+        from app.services.startup_service import get_state_table
+        table = get_state_table()
+        if not table:
+            return cls._operations.get(op_id)
+
+        try:
+            index, nonce = op_id.split('-', 1)
+            index, nonce = int(index), int(nonce, 16)
+        except ValueError:
+            return None
+        record = table.read_command(index)
+        if not record or record['nonce'] != nonce or record['command'] != COMMAND_TARE:
+            return None
+        return record
@@ -1,72 +1,249 @@
 import subprocess
 import os
+import shutil
+import signal
+import threading
 import time
 import logging
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+class SerialBridgeSupervisor:
+    """Owns the socat bridge processes behind virtual serial devices.
+    
+    Bridges started by this process are tracked in memory and restarted with
+    exponential backoff when they exit. A pidfile per bridge lets other
+    processes check liveness with os.kill(pid, 0) and stop a bridge without
+    scanning the process table; removing the pidfile is what tells the
+    supervising process not to restart it.
+    """
+    
+    PID_DIR = '/tmp/scrapyard-bridges'
+    CHECK_INTERVAL = 1.0
+    RESTART_DELAY = 1.0
+    MAX_RESTART_DELAY = 60.0
+    
+    # Exited this soon after starting counts as a failed start for backoff
+    MIN_UPTIME = 10.0
+    
+    _bridges = {}
+    _lock = threading.Lock()
+    _thread = None
+    _socat = None
+    
+    @classmethod
+    def _pidfile(cls, device_path: str) -> str:
+        return os.path.join(cls.PID_DIR, device_path.strip('/').replace('/', '_') + '.pid')
+    
+    @classmethod
+    def _read_pid(cls, device_path: str) -> Optional[int]:
+        try:
+            with open(cls._pidfile(device_path)) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def _pid_alive(pid: int, device_path: str) -> bool:
+        """Check a pid is running and, where /proc exists, is still this device's socat"""
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                return device_path.encode() in f.read()
+        except OSError:
+            return True
+    
+    @classmethod
+    def _spawn(cls, device_path: str, bridge: dict) -> bool:
+        socat_cmd = [
+            cls._socat,
+            f'pty,link={device_path},raw,echo=0,waitslave',
+            f"tcp:{bridge['ip_address']}:{bridge['port']}"
+        ]
+        try:
+            # New session so the bridge outlives a worker restart and can be signalled as a group
+            process = subprocess.Popen(socat_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       start_new_session=True)
+        except OSError as e:
+            logger.error(f"Failed to start socat for {device_path}: {str(e)[:100]}")
+            return False
+        
+        bridge.update({'process': process, 'pid': process.pid, 'started_at': time.monotonic()})
+        os.makedirs(cls.PID_DIR, mode=0o700, exist_ok=True)
+        with open(cls._pidfile(device_path), 'w') as f:
+            f.write(str(process.pid))
+        logger.info(f"Started socat bridge for {device_path} (pid {process.pid})")
+        return True
+    
+    @classmethod
+    def start(cls, device_path: str, ip_address: str, port: int = 23) -> bool:
+        """Start (or replace) the bridge for a device and supervise it"""
+        if cls._socat is None:
+            cls._socat = shutil.which('socat')
+            if cls._socat is None:
+                logger.error("socat is not installed. Install with: sudo apt-get install socat")
+                return False
+        
+        cls.stop(device_path)
+        
+        with cls._lock:
+            bridge = {'ip_address': ip_address, 'port': port, 'failures': 0, 'restarts': 0,
+                      'next_restart': None, 'last_exit': None, 'process': None, 'pid': None}
+            if not cls._spawn(device_path, bridge):
+                return False
+            cls._bridges[device_path] = bridge
+            cls._ensure_thread()
+        return True
+    
+    @classmethod
+    def stop(cls, device_path: str):
+        """Stop a device's bridge, whichever process started it"""
+        with cls._lock:
+            bridge = cls._bridges.pop(device_path, None)
+            pid = bridge['pid'] if bridge else cls._read_pid(device_path)
+            
+            # Drop the pidfile first so the supervising process does not restart it
+            try:
+                os.unlink(cls._pidfile(device_path))
+            except FileNotFoundError:
+                pass
+        
+        if pid and cls._pid_alive(pid, device_path):
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+        
+        if bridge and bridge.get('process'):
+            try:
+                bridge['process'].wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                bridge['process'].kill()
+                bridge['process'].wait()
+    
+    @classmethod
+    def adopt(cls, device_path: str, ip_address: str, port: int = 23) -> bool:
+        """Supervise a bridge a previous owner process left running, if its pidfile is live"""
+        pid = cls._read_pid(device_path)
+        if not pid or not cls._pid_alive(pid, device_path):
+            return False
+        with cls._lock:
+            cls._bridges[device_path] = {'ip_address': ip_address, 'port': port, 'failures': 0, 'restarts': 0,
+                                         'next_restart': None, 'last_exit': None, 'process': None,
+                                         'pid': pid, 'started_at': time.monotonic()}
+            cls._ensure_thread()
+        logger.info(f"Adopted socat bridge for {device_path} (pid {pid})")
+        return True
+    
+    @classmethod
+    def _ensure_thread(cls):
+        if cls._thread is None or not cls._thread.is_alive():
+            cls._thread = threading.Thread(target=cls._supervise, daemon=True, name='serial-bridge-supervisor')
+            cls._thread.start()
+    
+    @classmethod
+    def _running(cls, device_path: str, bridge: dict) -> bool:
+        if bridge['process'] is not None:
+            return bridge['process'].poll() is None
+        # Adopted bridges are not our children, so fall back to signalling the pid
+        return bool(bridge['pid']) and cls._pid_alive(bridge['pid'], device_path)
+    
+    @classmethod
+    def is_alive(cls, device_path: str) -> bool:
+        """In-memory liveness for bridges this process owns, pidfile check for the rest"""
+        bridge = cls._bridges.get(device_path)
+        if bridge:
+            return cls._running(device_path, bridge)
+        pid = cls._read_pid(device_path)
+        return bool(pid and cls._pid_alive(pid, device_path))
+    
+    @classmethod
+    def status(cls) -> dict:
+        """Snapshot of the bridges this process supervises"""
+        return {
+            device_path: {
+                'pid': bridge['pid'],
+                'alive': cls._running(device_path, bridge),
+                'restarts': bridge['restarts'],
+                'last_exit': bridge['last_exit']
+            }
+            for device_path, bridge in list(cls._bridges.items())
+        }
+    
+    @classmethod
+    def _supervise(cls):
+        while True:
+            time.sleep(cls.CHECK_INTERVAL)
+            with cls._lock:
+                for device_path, bridge in list(cls._bridges.items()):
+                    # Stopped from another process: it removed the pidfile
+                    if cls._read_pid(device_path) != bridge['pid']:
+                        del cls._bridges[device_path]
+                        logger.info(f"Socat bridge for {device_path} was stopped externally")
+                        continue
+                    
+                    if bridge['next_restart'] is None:
+                        if cls._running(device_path, bridge):
+                            continue
+                        
+                        process = bridge['process']
+                        bridge['last_exit'] = process.returncode if process else None
+                        quick_exit = time.monotonic() - bridge['started_at'] < cls.MIN_UPTIME
+                        bridge['failures'] = bridge['failures'] + 1 if quick_exit else 0
+                        delay = min(cls.RESTART_DELAY * (2 ** bridge['failures']), cls.MAX_RESTART_DELAY)
+                        bridge['next_restart'] = time.monotonic() + delay
+                        logger.warning(f"Socat bridge for {device_path} exited with code {bridge['last_exit']}, "
+                                       f"restarting in {delay:.0f}s")
+                    
+                    if time.monotonic() >= bridge['next_restart']:
+                        bridge['restarts'] += 1
+                        if cls._spawn(device_path, bridge):
+                            bridge['next_restart'] = None
+                        else:
+                            bridge['failures'] += 1
+                            bridge['next_restart'] = time.monotonic() + min(
+                                cls.RESTART_DELAY * (2 ** bridge['failures']), cls.MAX_RESTART_DELAY)
+
 class VirtualSerialService:
     """Service for managing virtual serial devices with socat"""
     
+    @staticmethod
+    def _valid_path(device_path: str) -> bool:
+        if not device_path or '..' in device_path:
+            return False
+        # Allow /tmp/ paths for virtual devices
+        return device_path.startswith('/tmp/') or device_path.startswith('tty')
+    
     @staticmethod
     def create_virtual_serial(device_path: str, ip_address: str, port: int = 23) -> bool:
-        """Create a virtual serial device using socat"""
+        """Create a virtual serial device using a supervised socat bridge"""
         try:
             # Validate inputs
-            if not device_path or '..' in device_path:
-                logger.error("Invalid device path")
-                return False
-            
-            # Allow /tmp/ paths for virtual devices
-            if not (device_path.startswith('/tmp/') or device_path.startswith('tty')):
+            if not VirtualSerialService._valid_path(device_path):
                 logger.error("Invalid device path")
                 return False
             
-            # Kill any existing socat process for this device
-            VirtualSerialService.destroy_virtual_serial(device_path)
-            
             # Ensure directory exists
             device_dir = os.path.dirname(device_path)
             if device_dir and not os.path.exists(device_dir):
                 os.makedirs(device_dir, mode=0o700, exist_ok=True)
             
-            # Check if socat is available
-            try:
-                result = subprocess.run(['which', 'socat'], check=True, capture_output=True, text=True)
-                logger.info(f"socat found at: {result.stdout.strip()}")
-            except subprocess.CalledProcessError:
-                logger.error("socat is not installed. Install with: sudo apt-get install socat")
+            if not SerialBridgeSupervisor.start(device_path, ip_address, port):
                 return False
             
-            # Create socat command with validated parameters
-            socat_cmd = [
-                'socat', 
-                f'pty,link={device_path},raw,echo=0,waitslave',
-                f'tcp:{ip_address}:{port}'
-            ]
-            
-            logger.info(f"Creating virtual serial device: {' '.join(socat_cmd)}")
-            
-            # Start socat process as daemon
-            process = subprocess.Popen(
-                socat_cmd,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                preexec_fn=os.setsid  # Create new process group
-            )
-            
             # Wait for device to be created
-            for i in range(20):  # Wait up to 10 seconds
-                if os.path.exists(device_path):
-                    break
-                time.sleep(0.5)
-                logger.debug(f"Waiting for device creation... attempt {i+1}")
-                
-                # Check if process died early
-                if process.poll() is not None:
-                    logger.error(f"Socat process died early with code: {process.returncode}")
+            deadline = time.monotonic() + 10
+            while not os.path.exists(device_path) and time.monotonic() < deadline:
+                if not SerialBridgeSupervisor.is_alive(device_path):
+                    logger.error(f"Socat bridge for {device_path} exited before creating the device")
                     break
+                time.sleep(0.1)
             
             if os.path.exists(device_path):
                 # Set permissions and verify device
@@ -77,8 +254,6 @@ class VirtualSerialService:
                     mode = os.stat(device_path).st_mode
                     if stat.S_ISCHR(mode) or stat.S_ISLNK(mode):
                         logger.info(f"Virtual serial device created successfully: {device_path} (mode: {oct(mode)})")
-                        # Log process info
-                        logger.info(f"Socat process PID: {process.pid}, status: {process.poll()}")
                         return True
                     else:
                         logger.warning(f"Device {device_path} exists but is not a character device")
@@ -87,12 +262,7 @@ class VirtualSerialService:
                     logger.warning(f"Could not set permissions on {device_path}: {e}")
                     return True  # Device exists, permission error is not critical
             else:
-                # Check if socat process failed
-                # Don't wait for process to complete - it should run indefinitely
                 logger.error(f"Failed to create virtual serial device: {device_path}")
-                # Check if process is still running
-                if process.poll() is not None:
-                    logger.error(f"Socat process exited with code: {process.returncode}")
                 return False
                 
         except Exception as e:
@@ -101,35 +271,17 @@ class VirtualSerialService:
     
     @staticmethod
     def destroy_virtual_serial(device_path: str) -> bool:
-        """Destroy a virtual serial device by killing socat process"""
+        """Destroy a virtual serial device by stopping its socat bridge"""
         try:
             # Validate device path
-            if not device_path or '..' in device_path:
+            if not VirtualSerialService._valid_path(device_path):
                 logger.error("Invalid device path")
                 return False
             
-            # Allow /tmp/ paths for virtual devices
-            if not (device_path.startswith('/tmp/') or device_path.startswith('tty')):
-                logger.error("Invalid device path")
-                return False
-                
-            # Find and kill socat processes using this device
-            # Use exact match to prevent command injection
-            escaped_path = device_path.replace('/', r'\/')
-            result = subprocess.run(
-                ['pgrep', '-f', f'socat.*{escaped_path}'],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                pids = result.stdout.strip().split('\n')
-                for pid in pids:
-                    if pid:
-                        subprocess.run(['kill', pid], check=False)
+            SerialBridgeSupervisor.stop(device_path)
                         
             # Remove device file if it exists
-            if os.path.exists(device_path):
+            if os.path.lexists(device_path):
                 os.unlink(device_path)
                 
             logger.info(f"Virtual serial device destroyed: {device_path}")
@@ -187,35 +339,6 @@ class VirtualSerialService:
     @staticmethod
     def is_device_active(device_path: str) -> bool:
         """Check if virtual serial device is active"""
-        try:
-            # Validate device path
-            if not device_path or '..' in device_path:
-                return False
-            
-            # Allow /tmp/ paths for virtual devices
-            if not (device_path.startswith('/tmp/') or device_path.startswith('tty')):
-                return False
-                
-            if not os.path.exists(device_path):
-                logger.info("Device does not exist")
-                return False
-                
-            # Check if socat process is running for this device
-            escaped_path = device_path.replace('/', r'\/')
-            result = subprocess.run(
-                ['pgrep', '-f', f'socat.*{escaped_path}'],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                pids = result.stdout.strip().split('\n')
-                logger.info("Found socat processes")
-                return True
-            else:
-                logger.info("No socat processes found")
-                return False
-            
-        except Exception as e:
-            logger.error("Error checking device status")
-            return False
\ No newline at end of file
+        if not VirtualSerialService._valid_path(device_path):
+            return False
+        return os.path.exists(device_path) and SerialBridgeSupervisor.is_alive(device_path)
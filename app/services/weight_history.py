@@ -0,0 +1,216 @@
+import os
+import mmap
+import fcntl
+import struct
+import threading
+import logging
+import numpy as np
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Record flag bits
+FLAG_STABLE = 0x01
+FLAG_INDICATOR_STABLE = 0x02
+FLAG_MOTION = 0x04
+FLAG_OVERLOAD = 0x08
+
+MAGIC = b'SCALEHST'
+VERSION = 1
+
+# magic, version, record size, capacity, total records ever written
+_HEADER = struct.Struct('<8sIIQQ')
+HEADER_SIZE = 64
+
+_RECORD = struct.Struct('<ddII')
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'), ('weight', '<f8'), ('flags', '<u4'), ('reserved', '<u4')])
+
+class WeightHistoryRing:
+    """Fixed-size memory-mapped ring file of (timestamp, weight, flags) records for one scale.
+
+    The reader daemon appends with struct.pack_into straight into the mapping,
+    so a sample costs no allocation and no syscalls. Readers map the same file
+    and get NumPy copies of the requested time window, so nothing handed out
+    points into a mapping that may later be closed. Only one process can hold
+    the writer lock on a file at a time, and it never truncates a file in
+    place: a ring with the wrong size is replaced by renaming a new file over
+    it, so a reader's mapping stays valid and the reader reopens the new file.
+    """
+
+    def __init__(self, path: str, capacity: int, writable: bool = False):
+        self.path = path
+        self.capacity = capacity
+        self.writable = writable
+        self._file = None
+        self._mm = None
+        self._records = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_writer(cls, path: str, capacity: int) -> Optional['WeightHistoryRing']:
+        """Create or reopen a ring file for appending; None if another process owns it"""
+        ring = cls(path, capacity, writable=True)
+        try:
+            ring._open()
+        except BlockingIOError:
+            ring.close()
+            return None
+        except OSError as e:
+            logger.error(f"Cannot open weight history {path}: {str(e)[:100]}")
+            ring.close()
+            return None
+        return ring
+
+    @classmethod
+    def open_reader(cls, path: str) -> Optional['WeightHistoryRing']:
+        """Map an existing ring file read-only; None if it does not exist yet"""
+        if not os.path.exists(path):
+            return None
+        ring = cls(path, 0)
+        try:
+            ring._open()
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot read weight history {path}: {str(e)[:100]}")
+            ring.close()
+            return None
+        return ring
+
+    def _open(self):
+        size = HEADER_SIZE + self.capacity * _RECORD.size
+
+        if self.writable:
+            self._file = open(self.path, 'a+b')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if self._replaced():
+                # Another writer swapped in a new file between our open and our lock
+                raise BlockingIOError("Weight history was replaced by another writer")
+            os.chmod(self.path, 0o640)
+
+            # Start a fresh ring when the file is new or was sized for a different capacity
+            if os.fstat(self._file.fileno()).st_size != size or not self._header_matches():
+                self._file = self._create(size)
+            self._mm = mmap.mmap(self._file.fileno(), size)
+        else:
+            self._file = open(self.path, 'rb')
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, record_size, self.capacity, _count = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION or record_size != _RECORD.size:
+                raise ValueError("Not a weight history file")
+
+        self._records = np.ndarray(self.capacity, dtype=RECORD_DTYPE, buffer=self._mm, offset=HEADER_SIZE)
+
+    def _create(self, size: int):
+        """Build an empty ring beside the old file and rename it into place; returns it locked"""
+        temp_path = f'{self.path}.{os.getpid()}.new'
+        new_file = open(temp_path, 'w+b')
+        try:
+            fcntl.flock(new_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.chmod(temp_path, 0o640)
+            new_file.write(_HEADER.pack(MAGIC, VERSION, _RECORD.size, self.capacity, 0))
+            new_file.truncate(size)
+            new_file.flush()
+            os.replace(temp_path, self.path)
+        except BaseException:
+            new_file.close()
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self._file.close()
+        return new_file
+
+    def _replaced(self) -> bool:
+        """True if the path now names a different file than the one this ring has open"""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _reopen(self) -> bool:
+        try:
+            replacement = WeightHistoryRing(self.path, 0)
+            replacement._open()
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot reopen weight history {self.path}: {str(e)[:100]}")
+            return False
+        self._release()
+        self._file, self._mm, self._records, self.capacity = (replacement._file, replacement._mm,
+                                                               replacement._records, replacement.capacity)
+        return True
+
+    def _header_matches(self) -> bool:
+        self._file.seek(0)
+        header = self._file.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            return False
+        magic, version, record_size, capacity, _count = _HEADER.unpack(header)
+        return magic == MAGIC and version == VERSION and record_size == _RECORD.size and capacity == self.capacity
+
+    @property
+    def count(self) -> int:
+        """Total number of records ever appended"""
+        return _HEADER.unpack_from(self._mm, 0)[4]
+
+    def append(self, timestamp: float, weight: float, flags: int = 0):
+        """Append one sample, overwriting the oldest once the ring is full"""
+        with self._lock:
+            if self._mm is None:
+                return
+            count = self.count
+            _RECORD.pack_into(self._mm, HEADER_SIZE + (count % self.capacity) * _RECORD.size,
+                              timestamp, weight, flags, 0)
+            # Publish the record before bumping the count readers use
+            struct.pack_into('<Q', self._mm, 24, count + 1)
+
+    def window(self, start: float, end: float) -> list:
+        """Return copies of the records in [start, end] as up to two NumPy arrays, oldest first"""
+        with self._lock:
+            if self._mm is None:
+                return []
+            if not self.writable and self._replaced() and not self._reopen():
+                return []
+            return self._window(start, end)
+
+    def _window(self, start: float, end: float) -> list:
+        count = self.count
+        if count == 0:
+            return []
+
+        if count <= self.capacity:
+            segments = [self._records[:count]]
+        else:
+            head = count % self.capacity
+            segments = [self._records[head:], self._records[:head]]
+
+        copies = []
+        for segment in segments:
+            timestamps = segment['timestamp']
+            lo = np.searchsorted(timestamps, start, side='left')
+            hi = np.searchsorted(timestamps, end, side='right')
+            if hi > lo:
+                copies.append(segment[lo:hi].copy())
+        return copies
+
+    def close(self):
+        """Unmap the ring and release the writer lock"""
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        self._records = None
+        if self._mm:
+            self._mm.close()
+            self._mm = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def history_flags(reading: dict, stable: bool) -> int:
+    """Pack a parsed reading's status and the detector's verdict into record flag bits"""
+    flags = FLAG_STABLE if stable else 0
+    if reading.get('stable'):
+        flags |= FLAG_INDICATOR_STABLE
+    if reading.get('motion'):
+        flags |= FLAG_MOTION
+    if reading.get('overload'):
+        flags |= FLAG_OVERLOAD
+    return flags
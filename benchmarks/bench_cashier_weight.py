@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the cashier scale weight endpoint.
+
+Starts simulated USR-TCP232 scales, then has many simulated terminals poll
+/cashier/api/scale/weight concurrently and reports request latency
+percentiles, throughput and how many responses were stale or disconnected.
+
+By default the app runs in-process on a throwaway SQLite database with one
+Device per simulated scale. With --url it drives a running server instead
+(pass a logged-in session cookie with --cookie); the simulated scales are
+still started so that server can be pointed at them.
+
+Usage: python benchmarks/bench_cashier_weight.py [--scales N] [--terminals N] [--duration S]
+       [--protocol NAME] [--curve NAME] [--drop-every S] [--url URL --cookie COOKIE]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from simulator import ScaleSimulator, CURVES, FORMATTERS
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def scratch_environment(workdir):
+    """Point the app at throwaway paths; must run before anything imports app"""
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{workdir}/bench.db',
+        'HARDWARE_LOCK_FILE': f'{workdir}/hardware.lock',
+        'HARDWARE_READY_FILE': f'{workdir}/hardware.ready',
+        'DEVICE_STATE_FILE': f'/dev/shm/scrapyard-bench-{os.getpid()}',
+        'SCALE_HISTORY_DIR': workdir
+    })
+
+def in_process_client(args):
+    """Create the app on a scratch database with one Device per simulated scale"""
+    from app import create_app, db
+    from app.models.user import User
+    from app.models.device import Device
+
+    app = create_app()
+    app.config['DEFAULT_SCALE_PORT'] = args.port
+    with app.app_context():
+        db.create_all()
+        admin = User(username='bench', email='bench@example.com', is_admin=True)
+        admin.set_password('bench')
+        db.session.add(admin)
+        for i in range(args.scales):
+            db.session.add(Device(name=f'Sim scale {i + 1}', device_type='scale', ip_address=f'127.0.0.{i + 1}',
+                                  is_active=True, scale_transport='tcp', scale_protocol=args.protocol))
+        db.session.commit()
+        user_id = admin.id
+
+        # Devices were added after startup, so bring the readers up directly
+        from app.services.startup_service import _start_scale_monitors
+        _start_scale_monitors(args.port)
+
+    def make_client():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return lambda: client.get('/cashier/api/scale/weight').get_json()
+
+    return make_client
+
+def remote_client(args):
+    import requests
+
+    def make_client():
+        session = requests.Session()
+        session.headers['Cookie'] = args.cookie or ''
+        url = args.url.rstrip('/') + '/cashier/api/scale/weight'
+        return lambda: session.get(url, timeout=10).json()
+
+    return make_client
+
+def run_terminal(get_weight, deadline, interval, latencies, failures, lock):
+    local_latencies = []
+    local_failures = 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            data = get_weight()
+            if not data or not data.get('connected'):
+                local_failures += 1
+        except Exception:
+            local_failures += 1
+        local_latencies.append(time.perf_counter() - started)
+        if interval:
+            time.sleep(interval)
+    with lock:
+        latencies.extend(local_latencies)
+        failures.append(local_failures)
+
+def main():
+    parser = argparse.ArgumentParser(description='Cashier scale weight endpoint load benchmark')
+    parser.add_argument('--scales', type=int, default=4, help='simulated scales, one Device each')
+    parser.add_argument('--terminals', type=int, default=16, help='concurrent polling terminals')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run')
+    parser.add_argument('--interval', type=float, default=0.0, help='pause between polls per terminal')
+    parser.add_argument('--port', type=int, default=18899, help='port every simulated scale listens on')
+    parser.add_argument('--protocol', choices=sorted(FORMATTERS), default='toledo')
+    parser.add_argument('--curve', choices=sorted(CURVES), default='truck')
+    parser.add_argument('--drop-every', type=float, default=0.0, help='drop scale connections every N seconds')
+    parser.add_argument('--url', help='drive a running server instead of an in-process app')
+    parser.add_argument('--cookie', help='session cookie header for --url')
+    args = parser.parse_args()
+
+    if not args.url:
+        scratch_environment(tempfile.mkdtemp(prefix='scrapyard-bench-'))
+
+    simulator = ScaleSimulator.build(args.scales, args.port, args.protocol, args.curve, per_host=True,
+                                     drop_every=args.drop_every).start()
+    make_client = remote_client(args) if args.url else in_process_client(args)
+
+    # Let the readers connect and take a first reading before measuring
+    warmup = make_client()
+    for _ in range(50):
+        data = warmup()
+        if data and data.get('connected'):
+            break
+        time.sleep(0.1)
+
+    latencies, failures, lock = [], [], threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=run_terminal,
+                                args=(make_client(), deadline, args.interval, latencies, failures, lock))
+               for _ in range(args.terminals)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"{args.terminals} terminals, {args.scales} {args.protocol} scales, {args.duration:.0f}s")
+    print(f"requests      {total:>10}")
+    print(f"throughput    {total / args.duration:>10.0f} req/s")
+    print(f"p50           {percentile(latencies, 0.50) * 1000:>10.2f} ms")
+    print(f"p90           {percentile(latencies, 0.90) * 1000:>10.2f} ms")
+    print(f"p99           {percentile(latencies, 0.99) * 1000:>10.2f} ms")
+    print(f"max           {(latencies[-1] if latencies else 0) * 1000:>10.2f} ms")
+    print(f"disconnected  {sum(failures):>10}")
+    print(f"scale polls   {sum(stats['commands'] for stats in simulator.stats().values()):>10}")
+
+    if not args.url:
+        state_file = os.environ['DEVICE_STATE_FILE']
+        if os.path.exists(state_file):
+            os.unlink(state_file)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the scale protocol parsers.
+
+Reports the cost per reading of every registered parser on its example
+frame, next to the legacy three-regex fallback chain and the weight each
+one extracts.
+
+The legacy chain only returns a bare weight, so it is also timed with the
+reading dict every consumer needs built from it ("legacy+dict"). That is
+the like-for-like figure: the registry parsers return the full reading,
+including the status flags and tare the legacy chain cannot extract, at
+roughly the same cost, and they read formats such as Toledo continuous
+that the legacy chain gets wrong.
+
+Usage: python benchmarks/bench_scale_protocols.py [--number N]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.hardware.scale_protocols import PROTOCOLS, _reading
+
+# Patterns USRScaleService.get_weight tried in order before the registry existed
+LEGACY_PATTERNS = [
+    r'([+-]?\d+\.?\d*)\s*(?:lb|kg|g)?',
+    r'ST,GS,([+-]?\d+\.?\d*),',
+    r'W\s+([+-]?\d+\.?\d*)',
+]
+
+def legacy_parse(response):
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, response)
+        if match:
+            return float(match.group(1))
+    return None
+
+def legacy_reading(response):
+    weight = legacy_parse(response)
+    return _reading(weight, 'lb') if weight is not None else None
+
+def bench(func, frame, number):
+    """Return nanoseconds per call, best of five runs"""
+    timer = timeit.Timer(lambda: func(frame))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description='Scale protocol parser micro-benchmark')
+    parser.add_argument('--number', type=int, default=100000, help='calls per timing run')
+    args = parser.parse_args()
+
+    print(f"{'protocol':<20} {'ns/reading':>12} {'legacy ns':>10} {'legacy+dict':>12} {'weight':>10} {'legacy':>10}")
+    print('-' * 79)
+    for name, protocol in PROTOCOLS.items():
+        reading = protocol.parse(protocol.example)
+        if reading is None:
+            print(f"{name:<20} {'FAILED':>12}  {protocol.example!r}")
+            continue
+        print(f"{name:<20} {bench(protocol.parse, protocol.example, args.number):>12.0f}"
+              f" {bench(legacy_parse, protocol.example, args.number):>10.0f}"
+              f" {bench(legacy_reading, protocol.example, args.number):>12.0f}"
+              f" {reading['weight']:>10} {str(legacy_parse(protocol.example)):>10}")
+
+if __name__ == '__main__':
+    main()
@@ -24,6 +24,59 @@ class Config:
     DEFAULT_PRINTER_PORT = 9100
     DEFAULT_CAMERA_PORT = 80
     
+    # One process per host owns hardware bring-up; workers check the ready flag
+    HARDWARE_LOCK_FILE = os.environ.get('HARDWARE_LOCK_FILE', '/tmp/scrapyard-hardware.lock')
+    HARDWARE_READY_FILE = os.environ.get('HARDWARE_READY_FILE', '/tmp/scrapyard-hardware.ready')
+    
+    # Shared-memory live device state; one slot per Device id below DEVICE_STATE_SLOTS
+    DEVICE_STATE_FILE = os.environ.get('DEVICE_STATE_FILE', '/dev/shm/scrapyard-devices')
+    DEVICE_STATE_SLOTS = 1024
+    
+    # Seconds between keepalive comments on the live scale stream
+    SCALE_STREAM_KEEPALIVE = 15
+    
+    # Seconds before the server ends a scale stream; the browser's EventSource reconnects, so abandoned
+    # or half-open connections give their request thread back instead of holding it forever
+    SCALE_STREAM_MAX_SECONDS = 300
+    
+    # Scale stability detection (weights in scale units, times in seconds)
+    SCALE_MOTION_BAND = float(os.environ.get('SCALE_MOTION_BAND', 0.5))
+    SCALE_STABLE_VARIANCE = float(os.environ.get('SCALE_STABLE_VARIANCE', 0.04))
+    SCALE_SETTLE_TIME = float(os.environ.get('SCALE_SETTLE_TIME', 0.5))
+    SCALE_STABLE_MIN_SAMPLES = 3
+    
+    # Tare is confirmed once the scale reads a stable weight within this band of zero
+    SCALE_TARE_ZERO_BAND = float(os.environ.get('SCALE_TARE_ZERO_BAND', 0.5))
+    SCALE_TARE_TIMEOUT = float(os.environ.get('SCALE_TARE_TIMEOUT', 5.0))
+    
+    # Per-scale weight history ring files (24 bytes/record; 864000 is 24 hours at 10 Hz)
+    SCALE_HISTORY_DIR = os.environ.get('SCALE_HISTORY_DIR', '/var/www/scrapyard/data/scale_history')
+    SCALE_HISTORY_CAPACITY = int(os.environ.get('SCALE_HISTORY_CAPACITY', 864000))
+    
+    # Combined scales: member answers further apart than this (seconds) are not summed
+    SCALE_COMBINED_WINDOW = float(os.environ.get('SCALE_COMBINED_WINDOW', 0.05))
+    
+    # Print spooler: attempts per job, first retry delay and idle seconds before a printer connection closes
+    PRINT_MAX_ATTEMPTS = int(os.environ.get('PRINT_MAX_ATTEMPTS', 5))
+    PRINT_RETRY_DELAY = float(os.environ.get('PRINT_RETRY_DELAY', 1.0))
+    PRINT_IDLE_TIMEOUT = float(os.environ.get('PRINT_IDLE_TIMEOUT', 30.0))
+    
+    # Print job journal: seconds between sweeps for jobs left by dead processes, days finished jobs are kept
+    PRINT_RECOVER_INTERVAL = 30
+    PRINT_JOB_RETENTION_DAYS = 7
+    
+    # Seconds between printer status polls by the hardware owner
+    PRINTER_STATUS_INTERVAL = float(os.environ.get('PRINTER_STATUS_INTERVAL', 10.0))
+    
+    # Seconds between camera health polls by the hardware owner
+    CAMERA_STATUS_INTERVAL = float(os.environ.get('CAMERA_STATUS_INTERVAL', 30.0))
+    
+    # Seconds a camera's shared stream stays open after its last viewer leaves
+    CAMERA_IDLE_TIMEOUT = float(os.environ.get('CAMERA_IDLE_TIMEOUT', 10.0))
+    
+    # Seconds before the server ends one viewer's camera stream; the page reopens it before then
+    CAMERA_STREAM_MAX_SECONDS = float(os.environ.get('CAMERA_STREAM_MAX_SECONDS', 300.0))
+    
     # Compliance
     NJ_LICENSE_NUMBER = os.environ.get('NJ_LICENSE_NUMBER', 'REQUIRED')
     REQUIRE_CUSTOMER_ID = True
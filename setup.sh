@@ -188,11 +188,13 @@ from dotenv import load_dotenv
 load_dotenv('/var/www/scrapyard/.env')
 from app import create_app, db
 from app.models.user import User, UserGroup, UserGroupMember
-from app.models.device import Device
+from app.models.device import Device, DeviceAssignment, CombinedScaleMember
 from app.models.material import Material
 from app.models.customer import Customer
 from app.models.permissions import Permission, GroupPermission
 from app.models.price_source import PriceSource
+from app.models.print_job import PrintJob
+from app.models.receipt_copy import ReceiptCopy
 from app.services.setup_service import initialize_default_groups
 app = create_app()
 with app.app_context():
@@ -226,6 +228,10 @@ sudo mkdir -p /var/www/scrapyard/uploads/logos
 sudo chown -R scrapyard:www-data /var/www/scrapyard/uploads
 sudo chmod -R 775 /var/www/scrapyard/uploads
 
+# Scale weight history ring files
+sudo mkdir -p /var/www/scrapyard/data/scale_history
+sudo chown -R scrapyard:www-data /var/www/scrapyard/data
+
 # Set permissions
 echo "Setting final permissions..."
 sudo chown -R scrapyard:www-data /var/www/scrapyard
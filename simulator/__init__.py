@@ -0,0 +1 @@
+from simulator.scales import SimulatedScale, ScaleSimulator, CURVES, FORMATTERS
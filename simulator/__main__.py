@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Run simulated USR-TCP232 scales for local testing.
+
+Usage: python -m simulator [--count N] [--base-port PORT] [--per-host] [--protocol NAME] [--curve NAME]
+                           [--noise LB] [--stream SECONDS] [--drop-every SECONDS] [--down-for SECONDS]
+
+Point scale Devices at the printed addresses and DEFAULT_SCALE_PORT at the base port.
+"""
+
+import argparse
+import logging
+import time
+
+from simulator.scales import ScaleSimulator, CURVES, FORMATTERS
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulated USR-TCP232 scales')
+    parser.add_argument('--count', type=int, default=1, help='number of scales on consecutive ports')
+    parser.add_argument('--base-port', type=int, default=18899)
+    parser.add_argument('--per-host', action='store_true', help='one port, scales on 127.0.0.1..N instead')
+    parser.add_argument('--protocol', choices=sorted(FORMATTERS), default='toledo')
+    parser.add_argument('--curve', choices=sorted(CURVES), default='truck')
+    parser.add_argument('--noise', type=float, default=0.0, help='standard deviation of weight noise')
+    parser.add_argument('--stream', type=float, default=0.0, help='push a frame every N seconds without W')
+    parser.add_argument('--drop-every', type=float, default=0.0, help='drop all clients every N seconds')
+    parser.add_argument('--down-for', type=float, default=0.0, help='refuse clients for N seconds after a drop')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before answering a command')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    simulator = ScaleSimulator.build(args.count, args.base_port, args.protocol, args.curve, args.per_host,
+                                     noise=args.noise, stream_interval=args.stream, drop_every=args.drop_every,
+                                     down_for=args.down_for, latency=args.latency).start()
+    for scale in simulator.scales:
+        print(f"{scale.protocol} scale on {scale.host}:{scale.port}")
+
+    try:
+        while True:
+            time.sleep(10)
+            for address, stats in simulator.stats().items():
+                logging.info(f"{address}: {stats}")
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Simulated USR-TCP232-410S scales.
+
+Each SimulatedScale listens on its own TCP port and behaves like an indicator
+behind a USR-TCP232 serial server: it answers W with one frame in the
+configured output format, zeroes on T, and can stream continuously. Weight
+follows a scripted curve, motion is flagged while the weight is changing,
+and faults can drop clients on a schedule or refuse connections for a while.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Curves: functions of seconds since start returning gross weight in lb
+
+def constant(weight: float = 1250.0) -> Callable[[float], float]:
+    return lambda t: weight
+
+def truck(peak: float = 24000.0, ramp: float = 4.0, hold: float = 8.0, empty: float = 3.0) -> Callable[[float], float]:
+    """Drive on, sit on the platform, drive off, repeat"""
+    period = ramp * 2 + hold + empty
+
+    def curve(t):
+        t %= period
+        if t < ramp:
+            return peak * t / ramp
+        if t < ramp + hold:
+            return peak
+        if t < ramp * 2 + hold:
+            return peak * (1 - (t - ramp - hold) / ramp)
+        return 0.0
+    return curve
+
+def steps(weights=(0.0, 35.5, 120.0, 87.25), dwell: float = 5.0) -> Callable[[float], float]:
+    """Drop material on and off the platform in discrete loads"""
+    return lambda t: weights[int(t // dwell) % len(weights)]
+
+def sway(center: float = 800.0, amplitude: float = 15.0, period: float = 6.0) -> Callable[[float], float]:
+    """A load that never settles, e.g. a swinging hook"""
+    return lambda t: center + amplitude * math.sin(2 * math.pi * t / period)
+
+CURVES = {'constant': constant, 'truck': truck, 'steps': steps, 'sway': sway}
+
+# Frame formatters matching the parsers in app.hardware.scale_protocols
+
+def _toledo(weight, tare, motion):
+    net = weight - tare
+    sign = '-' if net < 0 else '+'
+    return f"{'US' if motion else 'ST'},{'NT' if tare else 'GS'},{sign}{abs(net):08.2f},lb"
+
+# Status word A decimal point codes, finest first: (code, scale factor); weight and tare share one
+_TOLEDO_DECIMALS = ((4, 100), (3, 10), (2, 1))
+
+def _toledo_continuous(weight, tare, motion):
+    net = weight - tare
+    status_b = 0x20 | (0x01 if tare else 0) | (0x02 if net < 0 else 0) | (0x08 if motion else 0)
+    # Fewer decimals as the weight grows so both fields fit six digits; past that the indicator is overloaded
+    largest = max(abs(net), tare)
+    code, factor = next(((code, factor) for code, factor in _TOLEDO_DECIMALS if round(largest * factor) <= 999999),
+                        _TOLEDO_DECIMALS[-1])
+    net_digits = min(round(abs(net) * factor), 999999)
+    tare_digits = min(round(tare * factor), 999999)
+    return f"\x02{chr(0x20 | code)}{chr(status_b)} {net_digits:6d}{tare_digits:6d}"
+
+def _cardinal(weight, tare, motion):
+    return f"{weight - tare:9.1f} lb  {'N' if tare else 'G'}  {'M' if motion else ''}"
+
+def _fairbanks(weight, tare, motion):
+    return f"{weight - tare:8.0f} LB {'NT' if tare else 'GR'}{' MO' if motion else ''}"
+
+def _rice_lake(weight, tare, motion):
+    net = weight - tare
+    return f"\x02{'-' if net < 0 else ' '}{abs(net):7.1f}L{'N' if tare else 'G'}{'M' if motion else ' '}"
+
+def _numeric(weight, tare, motion):
+    return f"W {weight - tare:.2f} lb"
+
+FORMATTERS = {
+    'toledo': _toledo,
+    'toledo_continuous': _toledo_continuous,
+    'cardinal': _cardinal,
+    'fairbanks': _fairbanks,
+    'rice_lake': _rice_lake,
+    'numeric': _numeric
+}
+
+class SimulatedScale:
+    """One simulated indicator on a TCP port"""
+
+    def __init__(self, port: int, protocol: str = 'toledo', curve: Optional[Callable] = None,
+                 noise: float = 0.0, motion_threshold: float = 0.5, stream_interval: float = 0.0,
+                 drop_every: float = 0.0, down_for: float = 0.0, latency: float = 0.0, host: str = '127.0.0.1'):
+        from app.hardware.scale_protocols import get_protocol
+
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.format = FORMATTERS[protocol]
+        self.terminator = get_protocol(protocol).terminator
+        self.curve = curve or constant()
+        self.noise = noise
+        self.motion_threshold = motion_threshold
+        self.stream_interval = stream_interval
+        self.drop_every = drop_every
+        self.down_for = down_for
+        self.latency = latency
+        self.tare = 0.0
+        self.frames_sent = 0
+        self.commands = 0
+        self.connections = 0
+        self._started = time.monotonic()
+        self._down_until = 0.0
+        self._server = None
+        self._clients = set()
+
+    def reading(self) -> tuple:
+        """Current (gross weight, motion) from the curve"""
+        t = time.monotonic() - self._started
+        weight = self.curve(t)
+        # Motion is judged from the slope over the last 100 ms, like an indicator's motion band
+        motion = abs(weight - self.curve(max(0.0, t - 0.1))) > self.motion_threshold
+        if self.noise:
+            weight += random.gauss(0.0, self.noise)
+        return weight, motion
+
+    def frame(self) -> bytes:
+        weight, motion = self.reading()
+        self.frames_sent += 1
+        return self.format(weight, self.tare, motion).encode('ascii') + self.terminator
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        if self.drop_every:
+            asyncio.get_running_loop().create_task(self._faults())
+
+    async def _faults(self):
+        while True:
+            await asyncio.sleep(self.drop_every)
+            logger.info(f"Scale {self.port}: dropping {len(self._clients)} client(s)")
+            self._down_until = time.monotonic() + self.down_for
+            for writer in list(self._clients):
+                writer.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if time.monotonic() < self._down_until:
+            # Serial server rebooting: accept and immediately close
+            writer.close()
+            return
+
+        self.connections += 1
+        self._clients.add(writer)
+        streamer = None
+        if self.stream_interval:
+            streamer = asyncio.get_running_loop().create_task(self._stream(writer))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.strip().upper()
+                self.commands += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if command == b'W':
+                    writer.write(self.frame())
+                elif command in (b'T', b'Z'):
+                    weight, _motion = self.reading()
+                    # T tares off the current load, Z clears the tare
+                    self.tare = weight if command == b'T' else 0.0
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if streamer:
+                streamer.cancel()
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _stream(self, writer: asyncio.StreamWriter):
+        while True:
+            writer.write(self.frame())
+            await writer.drain()
+            await asyncio.sleep(self.stream_interval)
+
+class ScaleSimulator:
+    """Runs many SimulatedScales on one event loop in a background thread"""
+
+    def __init__(self, scales: list):
+        self.scales = scales
+        self.loop = None
+        self.thread = None
+        self._ready = threading.Event()
+
+    @classmethod
+    def build(cls, count: int, base_port: int = 18899, protocol: str = 'toledo', curve: str = 'constant',
+              per_host: bool = False, **options) -> 'ScaleSimulator':
+        """Create count scales sharing one configuration.
+        
+        Scales go on consecutive ports, or with per_host on the same port at
+        127.0.0.1, 127.0.0.2, ... so each can be a Device with its own IP.
+        """
+        if per_host:
+            return cls([SimulatedScale(base_port, protocol, CURVES[curve](), host=f'127.0.0.{i + 1}', **options)
+                        for i in range(count)])
+        return cls([SimulatedScale(base_port + i, protocol, CURVES[curve](), **options) for i in range(count)])
+
+    def start(self) -> 'ScaleSimulator':
+        self.thread = threading.Thread(target=self._run, daemon=True, name='scale-simulator')
+        self.thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        for scale in self.scales:
+            self.loop.run_until_complete(scale.start())
+        self._ready.set()
+        self.loop.run_forever()
+
+    def stats(self) -> dict:
+        return {f'{scale.host}:{scale.port}': {'connections': scale.connections, 'commands': scale.commands,
+                             'frames': scale.frames_sent} for scale in self.scales}
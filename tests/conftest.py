@@ -0,0 +1,25 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+@pytest.fixture
+def app(tmp_path):
+    """Bare Flask app bound to a throwaway SQLite database with every table created"""
+    from flask import Flask
+    from app import db
+    # Imported for their mappers; relationships refer to them by name
+    from app.models.user import User
+    from app.models.device import Device
+    from app.models.material import Material
+    from app.models.customer import Customer
+    from app.models.print_job import PrintJob
+
+    flask_app = Flask(__name__)
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
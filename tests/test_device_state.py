@@ -0,0 +1,97 @@
+import multiprocessing
+import pytest
+from app.services.device_state import (DeviceStateTable, KIND_SCALE, KIND_PRINTER, COMMAND_TARE,
+                                       COMMAND_PENDING, COMMAND_DONE, RESULT_OK, MAILBOX_SIZE)
+
+@pytest.fixture
+def table(tmp_path):
+    table = DeviceStateTable.open(str(tmp_path / 'devices'), slots=16)
+    yield table
+    table.close()
+
+def snapshot(weight, timestamp=100.0, **extra):
+    return dict({'weight': weight, 'stable': True, 'unit': 'lb', 'timestamp': timestamp}, **extra)
+
+def test_unwritten_slot_reads_none(table):
+    assert table.read(3) is None
+
+def test_scale_slot_round_trip(table):
+    table.write_scale(3, snapshot(12.5, tare=1.5, motion=True))
+    slot = table.read(3)
+    assert slot['kind'] == KIND_SCALE
+    assert slot['weight'] == 12.5 and slot['tare'] == 1.5
+    assert slot['connected'] and slot['stable'] and slot['motion'] and not slot['overload']
+    assert slot['unit'] == 'lb'
+    assert slot['updated'] == 100.0
+
+def test_status_slot_and_clear(table):
+    table.write_status(4, KIND_PRINTER, True, status=0x05)
+    slot = table.read(4)
+    assert slot['kind'] == KIND_PRINTER and slot['status'] == 0x05 and slot['connected']
+    table.clear(4)
+    assert table.read(4) is None
+
+def test_every_write_moves_the_sequence_by_two(table):
+    before = table.seq(5)
+    table.write_scale(5, snapshot(1.0))
+    assert table.seq(5) == before + 2
+
+def test_out_of_range_device_is_skipped_and_logged(table, caplog):
+    table.write_scale(16, snapshot(1.0))
+    table.write_scale(16, snapshot(2.0))
+    assert table.read(16) is None
+    assert len([record for record in caplog.records if 'does not fit' in record.message]) == 1
+
+def test_second_mapping_sees_writes(table):
+    other = DeviceStateTable.open(table.path, slots=16)
+    try:
+        table.write_scale(2, snapshot(7.0))
+        assert other.read(2)['weight'] == 7.0
+        generation = table.generation
+        other.bump_generation()
+        assert table.generation == generation + 1
+    finally:
+        other.close()
+
+def test_reopen_with_other_slot_count_starts_fresh(table):
+    table.write_scale(2, snapshot(7.0))
+    resized = DeviceStateTable.open(table.path + '-resized', slots=32)
+    try:
+        assert resized.read(2) is None
+    finally:
+        resized.close()
+
+def test_mailbox_round_trip(table):
+    index, nonce = table.post_command(7, COMMAND_TARE)
+    record = table.read_command(index)
+    assert record['device_id'] == 7 and record['command'] == COMMAND_TARE
+    assert record['state'] == COMMAND_PENDING and record['nonce'] == nonce
+    assert table.commands_posted == 1
+
+    assert table.update_command(index, nonce, COMMAND_DONE, RESULT_OK, 0.2)
+    record = table.read_command(index)
+    assert record['state'] == COMMAND_DONE and record['value'] == 0.2 and record['finished']
+
+def test_stale_nonce_cannot_overwrite_a_reused_record(table):
+    index, nonce = table.post_command(7, COMMAND_TARE)
+    for _ in range(MAILBOX_SIZE):
+        table.post_command(8, COMMAND_TARE)
+    assert not table.update_command(index, nonce, COMMAND_DONE)
+    assert table.read_command(index)['device_id'] == 8
+
+def _write_many(path, count):
+    writer = DeviceStateTable.open(path, slots=16)
+    for i in range(count):
+        writer.write_scale(1, snapshot(float(i), gross=float(i), net=float(i)))
+    writer.close()
+
+def test_reader_never_sees_a_torn_slot(table):
+    writer = multiprocessing.get_context('fork').Process(target=_write_many, args=(table.path, 20000))
+    writer.start()
+    while writer.is_alive():
+        slot = table.read(1)
+        if slot:
+            assert slot['weight'] == slot['gross'] == slot['net']
+    writer.join()
+    assert writer.exitcode == 0
+    assert table.read(1)['weight'] == 19999.0
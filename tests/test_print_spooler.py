@@ -0,0 +1,95 @@
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from app import db
+from app.models.device import Device
+from app.models.print_job import PrintJob
+from app.services.print_spooler import PrintSpooler, JOB_QUEUED, JOB_PRINTING, JOB_DONE, JOB_FAILED
+
+def _dead_pid() -> int:
+    pid = 4_000_000
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid += 1
+
+@pytest.fixture
+def spooler(app, monkeypatch):
+    """PrintSpooler journaling to the test database, with queued jobs captured instead of printed"""
+    queued = []
+    monkeypatch.setattr(PrintSpooler, '_app', app)
+    monkeypatch.setattr(PrintSpooler, '_token', 'test-token')
+    monkeypatch.setattr(PrintSpooler, '_jobs', {})
+    monkeypatch.setattr(PrintSpooler, '_enqueue', classmethod(lambda cls, job: queued.append(job)))
+    yield queued
+
+@pytest.fixture
+def printer(app):
+    device = Device(name='Lane 1', device_type='printer', ip_address='192.0.2.10', is_active=True)
+    db.session.add(device)
+    db.session.commit()
+    return SimpleNamespace(id=device.id, ip_address=device.ip_address, printer_pool=None)
+
+def _journal(printer, job_id, state=JOB_QUEUED, claimed_by=None, claim_token=None, age=0):
+    db.session.add(PrintJob(id=job_id, device_id=printer.id, printer_ip=printer.ip_address, payload=b'x',
+                            state=state, claimed_by=claimed_by, claim_token=claim_token,
+                            created_at=datetime.utcnow() - timedelta(seconds=age)))
+    db.session.commit()
+
+def test_submit_journals_and_queues(spooler, printer):
+    job_id = PrintSpooler.submit(printer, b'receipt', job_id='job-1')
+    assert job_id == 'job-1'
+    assert [job['id'] for job in spooler] == ['job-1']
+    row = PrintJob.query.get('job-1')
+    assert row.state == JOB_QUEUED
+    assert row.claimed_by == os.getpid() and row.claim_token == 'test-token'
+
+def test_resubmitting_a_journaled_id_does_not_print_twice(spooler, printer):
+    PrintSpooler.submit(printer, b'receipt', job_id='job-1')
+    # Another process journaled it; this process has never seen it
+    _journal(printer, 'job-2')
+    assert PrintSpooler.submit(printer, b'receipt', job_id='job-2') == 'job-2'
+    assert [job['id'] for job in spooler] == ['job-1']
+    assert PrintJob.query.count() == 2
+
+def test_recover_adopts_orphans_oldest_first(spooler, printer):
+    dead = _dead_pid()
+    _journal(printer, 'newer', claimed_by=dead, claim_token='old', age=10)
+    _journal(printer, 'older', state=JOB_PRINTING, claimed_by=dead, claim_token='old', age=20)
+    assert PrintSpooler.recover() == 2
+    assert [job['id'] for job in spooler] == ['older', 'newer']
+    for row in PrintJob.query.all():
+        assert row.state == JOB_QUEUED
+        assert row.claimed_by == os.getpid() and row.claim_token == 'test-token'
+
+def test_recover_leaves_live_and_own_jobs_alone(spooler, printer):
+    _journal(printer, 'live', claimed_by=os.getppid(), claim_token='other')
+    _journal(printer, 'mine', claimed_by=os.getpid(), claim_token='test-token')
+    _journal(printer, 'finished', state=JOB_DONE, claimed_by=_dead_pid(), claim_token='old')
+    assert PrintSpooler.recover() == 0
+    assert spooler == []
+
+def test_recover_adopts_jobs_of_an_earlier_process_with_this_pid(spooler, printer):
+    _journal(printer, 'restarted', claimed_by=os.getpid(), claim_token='before-restart')
+    assert PrintSpooler.recover() == 1
+    assert spooler[0]['id'] == 'restarted'
+
+def test_recover_adopts_each_orphan_once(spooler, printer):
+    _journal(printer, 'orphan', claimed_by=_dead_pid(), claim_token='old')
+    assert PrintSpooler.recover() == 1
+    assert PrintSpooler.recover() == 0
+    assert len(spooler) == 1
+
+def test_recover_prunes_old_finished_jobs(spooler, printer):
+    _journal(printer, 'ancient', state=JOB_DONE)
+    _journal(printer, 'recent', state=JOB_FAILED)
+    PrintJob.query.filter_by(id='ancient').update(
+        {'finished_at': datetime.utcnow() - timedelta(days=PrintSpooler.RETENTION_DAYS + 1)})
+    db.session.commit()
+    PrintSpooler.recover()
+    assert {row.id for row in PrintJob.query.all()} == {'recent'}
@@ -0,0 +1,61 @@
+import pytest
+from app.hardware.scale_protocols import PROTOCOLS, FRAMINGS, get_protocol, get_terminator, DEFAULT_PROTOCOL
+
+@pytest.mark.parametrize('name', sorted(PROTOCOLS))
+def test_every_protocol_parses_its_example(name):
+    reading = PROTOCOLS[name].parse(PROTOCOLS[name].example)
+    assert reading is not None
+    assert set(reading) == {'weight', 'gross', 'net', 'tare', 'unit', 'stable', 'motion', 'overload'}
+
+@pytest.mark.parametrize('name', sorted(PROTOCOLS))
+def test_every_protocol_rejects_garbage(name):
+    assert PROTOCOLS[name].parse('no weight here') is None
+
+def test_toledo_status_and_mode():
+    parse = PROTOCOLS['toledo'].parse
+    assert parse('ST,GS,+00012.34,lb')['weight'] == 12.34
+    assert parse('ST,GS,-00012.34,lb')['weight'] == -12.34
+    assert parse('US,GS,+00012.34,lb')['motion']
+    assert not parse('US,GS,+00012.34,lb')['stable']
+    assert parse('OL,GS,+00012.34,lb')['overload']
+    assert parse('ST,NT,+00010.00,kg')['unit'] == 'kg'
+    assert parse('ST,TR,+00002.00,lb')['tare'] == 2.0
+
+def test_toledo_continuous_decimal_point_and_tare():
+    parse = PROTOCOLS['toledo_continuous'].parse
+    # Status word A '#' (0x23) puts the decimal point one place in; B '!' (0x21) marks a net reading
+    reading = parse('\x02#! 001234000100')
+    assert reading['weight'] == pytest.approx(123.4)
+    assert reading['tare'] == pytest.approx(10.0)
+    assert reading['gross'] == pytest.approx(133.4)
+
+def test_cardinal_and_fairbanks_flags():
+    cardinal = PROTOCOLS['cardinal'].parse('   1234.5 lb  N  M')
+    assert cardinal['motion'] and cardinal['net'] == 1234.5
+    fairbanks = PROTOCOLS['fairbanks'].parse('  -12345 LB GR OR')
+    assert fairbanks['weight'] == -12345.0 and fairbanks['overload'] and fairbanks['unit'] == 'lb'
+
+def test_rice_lake_invalid_reading_is_dropped():
+    assert PROTOCOLS['rice_lake'].parse('\x02   12345LGI') is None
+
+def test_numeric_takes_first_number_and_leaves_stability_to_detector():
+    reading = PROTOCOLS['numeric'].parse('W 123.45 lbs')
+    assert reading['weight'] == 123.45
+    assert reading['unit'] == 'lb'
+    assert reading['stable'] is False
+
+def test_units_are_normalized_in_any_case():
+    parse = PROTOCOLS['toledo'].parse
+    assert parse('ST,GS,+1,LBS')['unit'] == 'lb'
+    assert parse('ST,GS,+1,Kg')['unit'] == 'kg'
+    assert parse('ST,GS,+1,')['unit'] == 'lb'
+
+def test_unknown_protocol_falls_back_to_default():
+    assert get_protocol('nonexistent') is PROTOCOLS[DEFAULT_PROTOCOL]
+    assert get_protocol(None) is PROTOCOLS[DEFAULT_PROTOCOL]
+
+def test_terminator_prefers_detected_framing():
+    protocol = PROTOCOLS['toledo_continuous']
+    assert get_terminator(protocol) == b'\r'
+    assert get_terminator(protocol, 'etx') == FRAMINGS['etx']
+    assert get_terminator(protocol, 'unknown') == b'\r'
@@ -0,0 +1,53 @@
+import threading
+from app.services.scale_stability import StabilityDetector
+
+def feed(detector, weights, start=0.0, step=0.1):
+    result = None
+    for i, weight in enumerate(weights):
+        result = detector.add(weight, start + i * step)
+    return result
+
+def test_steady_weight_becomes_stable_after_settle_time():
+    detector = StabilityDetector(settle_time=0.5)
+    # Needs history older than the settle window before it can call anything stable
+    assert feed(detector, [10.0] * 5) is False
+    assert feed(detector, [10.0] * 5, start=0.5) is True
+
+def test_motion_outside_band_is_unstable():
+    detector = StabilityDetector(motion_band=0.5, settle_time=0.5)
+    assert feed(detector, [10.0, 12.0] * 10) is False
+
+def test_small_jitter_inside_band_is_stable():
+    detector = StabilityDetector(motion_band=0.5, max_variance=0.04, settle_time=0.5)
+    assert feed(detector, [10.0, 10.1] * 10) is True
+
+def test_reset_forgets_history():
+    detector = StabilityDetector(settle_time=0.5)
+    assert feed(detector, [10.0] * 10) is True
+    detector.reset()
+    assert detector.stable is False
+    assert detector.add(10.0, 1.0) is False
+
+def test_ring_wraps_without_losing_window():
+    detector = StabilityDetector(settle_time=0.5, capacity=8)
+    assert feed(detector, [10.0] * 50, step=0.1) is True
+
+def test_concurrent_reset_and_add():
+    detector = StabilityDetector(settle_time=0.05)
+    stop = threading.Event()
+
+    def resetter():
+        while not stop.is_set():
+            detector.reset()
+
+    thread = threading.Thread(target=resetter)
+    thread.start()
+    try:
+        for i in range(5000):
+            detector.add(10.0, i * 0.01)
+    finally:
+        stop.set()
+        thread.join()
+    detector.reset()
+    assert detector._head == 0
+    assert feed(detector, [10.0] * 20, step=0.01) is True
@@ -0,0 +1,66 @@
+#!/bin/bash
+
+# Scrap Yard Management System - Upgrade Script
+# Brings an existing installation's database up to the current models without
+# dropping data. setup.sh recreates the database; db.create_all() only adds
+# missing tables, so columns and indexes added to existing tables are applied
+# here. Every statement is idempotent and the script is safe to run repeatedly.
+
+set -e
+
+echo "=== Scrap Yard Management System Upgrade ==="
+
+cd /var/www/scrapyard
+
+echo "Upgrading database schema..."
+sudo -u scrapyard ./venv/bin/python -c "
+from dotenv import load_dotenv
+load_dotenv('/var/www/scrapyard/.env')
+from sqlalchemy import text
+from app import create_app, db
+from app.models.user import User, UserGroup, UserGroupMember
+from app.models.device import Device, DeviceAssignment, CombinedScaleMember
+from app.models.material import Material
+from app.models.customer import Customer
+from app.models.permissions import Permission, GroupPermission
+from app.models.price_source import PriceSource
+from app.models.print_job import PrintJob
+from app.models.receipt_copy import ReceiptCopy
+
+UPGRADES = [
+    # Scale transport, output format and framing. No column default: new rows get tcp/toledo from the
+    # model, while scales that existed before the upgrade keep the socat bridge and the first-number
+    # parsing they had, which the numeric protocol reproduces
+    'ALTER TABLE devices ADD COLUMN IF NOT EXISTS scale_transport VARCHAR(10)',
+    'ALTER TABLE devices ADD COLUMN IF NOT EXISTS scale_protocol VARCHAR(20)',
+    'ALTER TABLE devices ADD COLUMN IF NOT EXISTS scale_framing VARCHAR(10)',
+    \"UPDATE devices SET scale_transport = 'socat' WHERE device_type = 'scale' AND scale_transport IS NULL\",
+    \"UPDATE devices SET scale_protocol = 'numeric' WHERE device_type = 'scale' AND scale_protocol IS NULL\",
+    # Printer pools
+    'ALTER TABLE devices ADD COLUMN IF NOT EXISTS printer_pool VARCHAR(50)',
+    # Print job owner token
+    'ALTER TABLE print_jobs ADD COLUMN IF NOT EXISTS claim_token VARCHAR(32)',
+    # Ticket lookup by transaction
+    'CREATE INDEX IF NOT EXISTS ix_transaction_items_transaction_id ON transaction_items (transaction_id)',
+]
+
+app = create_app()
+with app.app_context():
+    # New tables first, so the statements below can assume every table exists
+    db.create_all()
+    for statement in UPGRADES:
+        db.session.execute(text(statement))
+    db.session.commit()
+print('Schema is up to date')
+"
+
+# Edited in place rather than recopied so the camera proxies the app wrote into the live site survive
+echo "Updating Apache thread budget..."
+if ! grep -q "WSGIDaemonProcess scrapyard .*threads=" /etc/apache2/sites-available/scrapyard.conf; then
+    sudo sed -i 's|^\(\s*WSGIDaemonProcess scrapyard .*\)$|\1 processes=1 threads=64|' /etc/apache2/sites-available/scrapyard.conf
+fi
+
+echo "Restarting services..."
+sudo systemctl restart apache2
+
+echo "=== Upgrade Complete ==="